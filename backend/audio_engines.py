@@ -0,0 +1,86 @@
+import os
+import math
+import logging
+
+logger = logging.getLogger("audio_engines")
+
+# Settings that leave the signal untouched
+NEUTRAL_SETTINGS = {
+    "pitch": 0,
+    "speed": 1.0,
+    "reverb": 0,
+    "echo": 0,
+    "distortion": 0
+}
+
+# Valid range of each parameter (pitch in semitones; the UI slider covers +/-12)
+PARAMETER_RANGES = {
+    "pitch": (-24.0, 24.0),
+    "speed": (0.25, 4.0),
+    "reverb": (0.0, 1.0),
+    "echo": (0.0, 1.0),
+    "distortion": (0.0, 1.0)
+}
+
+def normalize_settings(settings):
+    """Keep known parameters only, as floats clamped to their valid ranges
+    
+    Raises ValueError for values that are not finite numbers.
+    """
+    normalized = {}
+    for name, (low, high) in PARAMETER_RANGES.items():
+        if name not in settings:
+            continue
+        value = float(settings[name])
+        if not math.isfinite(value):
+            raise ValueError(f"{name} must be a finite number, got {value}")
+        normalized[name] = max(low, min(high, value))
+    return normalized
+
+# Engine used when none is requested explicitly
+DEFAULT_ENGINE = os.environ.get("VOICE_MOD_ENGINE", "pyo")
+
+# Seconds an effect stage may sit at its neutral value before it is released
+STAGE_IDLE_TIME = float(os.environ.get("VOICE_MOD_STAGE_IDLE_SECONDS", "30"))
+
+# Pitch shifter implementations: frequency domain (quality) or time domain (latency)
+PITCH_MODES = ("phase_vocoder", "psola")
+DEFAULT_PITCH_MODE = os.environ.get("VOICE_MOD_PITCH_MODE", "phase_vocoder")
+
+def check_pitch_mode(mode):
+    """Validate a pitch mode name, returning the default for None"""
+    mode = mode or DEFAULT_PITCH_MODE
+    if mode not in PITCH_MODES:
+        raise ValueError(f"Unknown pitch mode: {mode} (expected one of {', '.join(PITCH_MODES)})")
+    return mode
+
+# Where an engine's input comes from: the local audio device, or blocks
+# pushed through process_block (audio streamed up by a client)
+AUDIO_INPUTS = ("device", "network")
+
+def check_audio_input(audio_input):
+    """Validate an audio input name, returning "device" for None"""
+    audio_input = audio_input or "device"
+    if audio_input not in AUDIO_INPUTS:
+        raise ValueError(f"Unknown audio input: {audio_input} (expected one of {', '.join(AUDIO_INPUTS)})")
+    return audio_input
+
+ENGINES = ("pyo", "numpy")
+
+def get_engine_class(engine=None):
+    """Return the processor class for an engine name
+
+    Engines are imported lazily so a NumPy-only deployment never needs pyo.
+    """
+    engine = engine or DEFAULT_ENGINE
+    if engine == "pyo":
+        from enhanced_audio_processor import AudioProcessor
+        return AudioProcessor
+    if engine == "numpy":
+        from numpy_engine import NumpyAudioProcessor
+        return NumpyAudioProcessor
+    raise ValueError(f"Unknown audio engine: {engine} (expected one of {', '.join(ENGINES)})")
+
+def create_audio_processor(engine=None, **kwargs):
+    """Create an uninitialized processor for the requested engine"""
+    return get_engine_class(engine)(**kwargs)
@@ -0,0 +1,62 @@
+import io
+import wave
+import logging
+import numpy as np
+
+logger = logging.getLogger("audio_io")
+
+# numpy dtype for each WAV sample width in bytes
+_WAV_DTYPES = {1: np.uint8, 2: np.int16, 4: np.int32}
+
+def to_mono_float32(audio):
+    """Convert an array of samples to mono float32 in [-1, 1]"""
+    audio = np.asarray(audio)
+    if audio.ndim == 2:
+        # Accept both (frames, channels) and (channels, frames)
+        axis = 1 if audio.shape[0] >= audio.shape[1] else 0
+        audio = audio.mean(axis=axis)
+    if audio.dtype.kind in "iu":
+        info = np.iinfo(audio.dtype)
+        offset = (info.max + 1) / 2 if audio.dtype.kind == "u" else 0
+        audio = (audio.astype(np.float32) - offset) / (info.max - offset + 1)
+    return np.ascontiguousarray(audio, dtype=np.float32)
+
+def read_wav(source):
+    """Read a PCM WAV file (path, file object or bytes) into mono float32 samples"""
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    with wave.open(source, "rb") as wav:
+        sr = wav.getframerate()
+        channels = wav.getnchannels()
+        width = wav.getsampwidth()
+        frames = wav.readframes(wav.getnframes())
+
+    if width == 3:
+        # Expand packed 24-bit samples to 32-bit
+        raw = np.frombuffer(frames, dtype=np.uint8).reshape(-1, 3)
+        padded = np.zeros((raw.shape[0], 4), dtype=np.uint8)
+        padded[:, 1:] = raw
+        samples = padded.view("<i4").ravel()
+    elif width in _WAV_DTYPES:
+        samples = np.frombuffer(frames, dtype=_WAV_DTYPES[width])
+    else:
+        raise ValueError(f"Unsupported WAV sample width: {width} bytes")
+
+    if channels > 1:
+        samples = samples.reshape(-1, channels)
+    return to_mono_float32(samples), sr
+
+def write_wav(target, samples, sr):
+    """Write mono float samples to a 16-bit PCM WAV (path or file object)"""
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2")
+    with wave.open(target, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(int(sr))
+        wav.writeframes(pcm.tobytes())
+
+def wav_bytes(samples, sr):
+    """Encode mono float samples as in-memory WAV bytes"""
+    buffer = io.BytesIO()
+    write_wav(buffer, samples, sr)
+    return buffer.getvalue()
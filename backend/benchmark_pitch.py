@@ -0,0 +1,102 @@
+"""Compare the phase vocoder and time-domain (PSOLA) pitch shifters
+
+Runs a harmonic test tone through each shifter of the NumPy engine, block by
+block, and (when pyo is installed) through both pitch modes of the pyo chain
+on an offline server. Reports CPU cost per block, realtime factor and the
+measured latency from the tone onset until the output reaches half its
+peak level, as JSON.
+
+    python benchmark_pitch.py --semitones 5 --block-size 256
+"""
+import sys
+import json
+import time
+import argparse
+import numpy as np
+from numpy_engine import PhaseVocoderPitchShifter
+from time_domain_pitch import PsolaPitchShifter
+
+def test_signal(sr, seconds, frequency=150.0, silence=0.2):
+    """Silence followed by a harmonic tone, returning (samples, onset index)"""
+    t = np.arange(int(seconds * sr)) / sr
+    tone = sum(np.sin(2 * np.pi * frequency * k * t) / k for k in range(1, 6))
+    signal = (0.3 * tone).astype(np.float32)
+    onset = int(silence * sr)
+    signal[:onset] = 0
+    return signal, onset
+
+def onset_latency_ms(output, onset, sr, threshold=0.5):
+    """Delay from the input onset until the output first exceeds threshold * peak"""
+    peak = np.max(np.abs(output[onset:]))
+    if peak == 0:
+        return None
+    first = int(np.argmax(np.abs(output[onset:]) > threshold * peak))
+    return first * 1000.0 / sr
+
+def bench_numpy(shifter, signal, onset, sr, block_size):
+    blocks = signal[:signal.size - signal.size % block_size].reshape(-1, block_size)
+    out = np.zeros(block_size, dtype=np.float32)
+    result = np.empty(blocks.size, dtype=np.float32)
+    start = time.perf_counter()
+    for index, block in enumerate(blocks):
+        shifter.process(block, out)
+        result[index * block_size:(index + 1) * block_size] = out
+    elapsed = time.perf_counter() - start
+    return {
+        "us_per_block": elapsed / len(blocks) * 1e6,
+        "ns_per_sample": elapsed / blocks.size * 1e9,
+        "realtime_factor": (blocks.size / sr) / elapsed,
+        "latency_ms": onset_latency_ms(result, onset, sr)
+    }
+
+def bench_pyo(mode, signal, onset, sr, block_size, semitones):
+    from offline_renderer import OfflineRenderer
+    renderer = OfflineRenderer(sr=sr, buffersize=block_size, tail=0, pitch_mode=mode)
+    start = time.perf_counter()
+    result, _ = renderer.render(signal, sr, {"pitch": semitones})
+    elapsed = time.perf_counter() - start
+    return {
+        "ns_per_sample": elapsed / signal.size * 1e9,
+        "realtime_factor": (signal.size / sr) / elapsed,
+        "latency_ms": onset_latency_ms(result, onset, sr)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--semitones", type=float, default=5.0)
+    parser.add_argument("--sample-rate", type=int, default=44100)
+    parser.add_argument("--block-size", type=int, default=256)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--no-pyo", action="store_true", help="skip the pyo offline renders")
+    args = parser.parse_args()
+
+    sr = args.sample_rate
+    factor = 2 ** (args.semitones / 12.0)
+    signal, onset = test_signal(sr, args.seconds)
+
+    phase_vocoder = PhaseVocoderPitchShifter()
+    psola = PsolaPitchShifter(sr, args.block_size)
+    for shifter in (phase_vocoder, psola):
+        shifter.set_factor(factor)
+    results = {
+        "semitones": args.semitones,
+        "sample_rate": sr,
+        "block_size": args.block_size,
+        "numpy": {
+            "phase_vocoder": bench_numpy(phase_vocoder, signal, onset, sr, args.block_size),
+            "psola": bench_numpy(psola, signal, onset, sr, args.block_size)
+        }
+    }
+
+    if not args.no_pyo:
+        try:
+            results["pyo"] = {mode: bench_pyo(mode, signal, onset, sr, args.block_size, args.semitones)
+                              for mode in ("phase_vocoder", "psola")}
+        except ImportError as e:
+            print(f"Skipping pyo: {e}", file=sys.stderr)
+
+    json.dump(results, sys.stdout, indent=2)
+    print()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""Benchmark every effect stage and the full chain, headless
+
+Pushes standard test signals block by block through each stage on its own
+(the others left at neutral, so they are bypassed), through the whole chain
+and through an all-bypassed chain for the fixed per-block overhead, at every
+combination of buffer size and sample rate. The pyo engine runs on a manual
+server (network audio input), so no sound card is needed; the NumPy engine
+is measured the same way for comparison.
+
+Every case runs in a fresh process so its peak memory is its own. Reports
+CPU cost per block and per sample, the cost net of the bypassed chain,
+realtime factor and peak RSS as JSON; --baseline adds the speedup against
+an earlier run's JSON.
+
+    python benchmark_stages.py --buffer-sizes 64,256,512 --sample-rates 44100,48000 > run.json
+"""
+import os
+import sys
+import json
+import time
+import resource
+import argparse
+import multiprocessing
+import numpy as np
+from latency_profiles import LatencyProfile
+
+# Settings that turn on one stage each; "bypassed" leaves everything neutral
+STAGE_SETTINGS = {
+    "bypassed": {},
+    "speed": {"speed": 0.8},
+    "pitch": {"pitch": 5},
+    "distortion": {"distortion": 0.5},
+    "echo": {"echo": 0.5},
+    "reverb": {"reverb": 0.5},
+    "chain": {"speed": 0.8, "pitch": 5, "distortion": 0.5, "echo": 0.5, "reverb": 0.5}
+}
+
+# What each stage is made of in the pyo chain
+PYO_OBJECTS = {
+    "speed": "TableFill + WSOLA (Python, per block) + TableScan",
+    "pitch": "PVAnal + PVTranspose + PVSynth",
+    "distortion": "Disto",
+    "echo": "Delay",
+    "reverb": "Freeverb"
+}
+
+SIGNALS = ("tone", "noise", "sweep")
+
+# Seconds processed before timing starts, so stages are primed and faded in
+WARMUP_SECONDS = 0.5
+
+def test_signal(name, sr, seconds):
+    """A harmonic 150 Hz tone, seeded white noise or a 50 Hz - 8 kHz log sweep"""
+    t = np.arange(int(seconds * sr)) / sr
+    if name == "tone":
+        signal = sum(np.sin(2 * np.pi * 150 * k * t) / k for k in range(1, 6))
+    elif name == "noise":
+        signal = np.random.default_rng(1234).uniform(-1, 1, t.size)
+    elif name == "sweep":
+        rate = np.log(8000 / 50.0) / seconds
+        signal = np.sin(2 * np.pi * 50 * (np.exp(rate * t) - 1) / rate)
+    else:
+        raise ValueError(f"Unknown signal: {name} (expected one of {', '.join(SIGNALS)})")
+    return (0.3 * signal).astype(np.float32)
+
+def create_engine(engine, sr, block_size, fft_size, overlaps, pitch_mode):
+    profile = LatencyProfile("benchmark", block_size, sr, fft_size, overlaps)
+    if engine == "pyo":
+        from enhanced_audio_processor import AudioProcessor
+        processor = AudioProcessor(profile=profile, pitch_mode=pitch_mode, audio_input="network")
+    else:
+        from numpy_engine import NumpyAudioProcessor
+        processor = NumpyAudioProcessor(profile=profile, pitch_mode=pitch_mode)
+    processor.initialize()
+    if not processor.is_initialized:
+        raise RuntimeError(f"Could not initialize the {engine} engine")
+    return processor
+
+def run_case(case):
+    """Benchmark one engine/stage/signal/sample rate/buffer size combination"""
+    sr, block_size = case["sample_rate"], case["block_size"]
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    processor = create_engine(case["engine"], sr, block_size, case["fft_size"], case["overlaps"],
+                              case["pitch_mode"])
+    processor.apply_settings(STAGE_SETTINGS[case["stage"]])
+
+    signal = test_signal(case["signal"], sr, case["seconds"] + WARMUP_SECONDS)
+    blocks = signal[:signal.size - signal.size % block_size].reshape(-1, block_size)
+    warmup = int(WARMUP_SECONDS * sr / block_size)
+    for block in blocks[:warmup]:
+        processor.process_block(block)
+
+    timed = blocks[warmup:]
+    times = np.empty(len(timed))
+    for index, block in enumerate(timed):
+        start = time.perf_counter()
+        processor.process_block(block)
+        times[index] = time.perf_counter() - start
+
+    processor.cleanup()
+    elapsed = times.sum()
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return dict(case,
+                blocks=len(timed),
+                us_per_block=elapsed / len(timed) * 1e6,
+                p99_us_per_block=float(np.percentile(times, 99) * 1e6),
+                max_us_per_block=float(times.max() * 1e6),
+                ns_per_sample=elapsed / timed.size * 1e9,
+                realtime_factor=(timed.size / sr) / elapsed,
+                peak_rss_kib=peak_rss,
+                rss_growth_kib=peak_rss - rss_before)
+
+def run_isolated(case):
+    # A spawned child per case: ru_maxrss only ever grows within a process
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        return pool.apply(run_case, (case,))
+
+def case_key(result):
+    return tuple(result[name] for name in ("engine", "stage", "signal", "sample_rate", "block_size"))
+
+def add_net_cost(results):
+    """Subtract the bypassed chain's cost from every stage measured under the same conditions"""
+    overhead = {case_key(dict(r, stage="")): r["ns_per_sample"] for r in results if r["stage"] == "bypassed"}
+    for result in results:
+        base = overhead.get(case_key(dict(result, stage="")))
+        if base is not None and result["stage"] != "bypassed":
+            result["net_ns_per_sample"] = result["ns_per_sample"] - base
+
+def add_speedup(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = {case_key(r): r for r in json.load(f)["results"]}
+    for result in results:
+        previous = baseline.get(case_key(result))
+        if previous:
+            result["baseline_ns_per_sample"] = previous["ns_per_sample"]
+            result["speedup"] = previous["ns_per_sample"] / result["ns_per_sample"]
+
+def parse_list(text, kind=str):
+    return [kind(item) for item in text.split(",") if item]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--engines", default="pyo,numpy")
+    parser.add_argument("--stages", default=",".join(STAGE_SETTINGS))
+    parser.add_argument("--signals", default="tone,noise")
+    parser.add_argument("--buffer-sizes", default="64,256,512")
+    parser.add_argument("--sample-rates", default="44100,48000")
+    parser.add_argument("--seconds", type=float, default=3.0, help="timed audio per case")
+    parser.add_argument("--fft-size", type=int, default=1024)
+    parser.add_argument("--overlaps", type=int, default=4)
+    parser.add_argument("--pitch-mode", default="phase_vocoder")
+    parser.add_argument("--in-process", action="store_true",
+                        help="run every case in this process (faster, but peak memory accumulates)")
+    parser.add_argument("--baseline", help="JSON from an earlier run to compare against")
+    args = parser.parse_args()
+
+    # pyo prints its banner and server messages to stdout (also in the
+    # spawned children, which inherit the descriptors): send everything but
+    # the JSON to stderr
+    output = os.fdopen(os.dup(sys.stdout.fileno()), "w")
+    sys.stdout.flush()
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+
+    engines = parse_list(args.engines)
+    if "pyo" in engines:
+        try:
+            import pyo  # noqa: F401
+        except ImportError as e:
+            print(f"Skipping pyo: {e}", file=sys.stderr)
+            engines.remove("pyo")
+
+    stages = parse_list(args.stages)
+    for stage in stages:
+        if stage not in STAGE_SETTINGS:
+            parser.error(f"Unknown stage: {stage} (expected one of {', '.join(STAGE_SETTINGS)})")
+    if "bypassed" not in stages:
+        # Needed for the net cost of the other stages
+        stages.insert(0, "bypassed")
+
+    run = run_case if args.in_process else run_isolated
+    results = []
+    for engine in engines:
+        for sr in parse_list(args.sample_rates, int):
+            for block_size in parse_list(args.buffer_sizes, int):
+                for signal in parse_list(args.signals):
+                    for stage in stages:
+                        case = {"engine": engine, "stage": stage, "signal": signal, "sample_rate": sr,
+                                "block_size": block_size, "seconds": args.seconds, "fft_size": args.fft_size,
+                                "overlaps": args.overlaps, "pitch_mode": args.pitch_mode}
+                        results.append(run(case))
+                        print(f"{engine} {stage} {signal} {sr} Hz / {block_size}: "
+                              f"{results[-1]['ns_per_sample']:.1f} ns/sample", file=sys.stderr)
+
+    add_net_cost(results)
+    if args.baseline:
+        add_speedup(results, args.baseline)
+
+    json.dump({"python": sys.version.split()[0], "pyo_objects": PYO_OBJECTS,
+               "stage_settings": STAGE_SETTINGS, "results": results}, output, indent=2)
+    print(file=output)
+    output.close()
+
+if __name__ == "__main__":
+    main()
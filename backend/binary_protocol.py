@@ -0,0 +1,113 @@
+"""Binary WebSocket framing for audio
+
+Every binary message is a fixed 20-byte header followed by raw PCM:
+
+    magic        2s   b"VM"
+    version      B    PROTOCOL_VERSION
+    frame_type   B    FRAME_* constant
+    flags        B    FLAG_* bits
+    sample_fmt   B    FORMAT_* constant
+    channels     B
+    reserved     B
+    stream_id    I    identifies one clip/stream within a connection
+    sequence     I    frame counter within the stream, starting at 0
+    sample_rate  I
+
+Header fields are big-endian, PCM payloads little-endian. JSON text
+messages stay in use for control only.
+"""
+
+import struct
+from collections import namedtuple
+import numpy as np
+
+MAGIC = b"VM"
+PROTOCOL_VERSION = 1
+
+HEADER = struct.Struct("!2sBBBBBBIII")
+HEADER_SIZE = HEADER.size
+
+# Frame types
+FRAME_TTS_AUDIO = 1
+FRAME_MIC_AUDIO = 2        # client -> server: captured microphone PCM
+FRAME_PROCESSED_AUDIO = 3  # server -> client: that audio after the session's effect chain
+
+# Flags
+FLAG_END_OF_STREAM = 0x01
+
+# Sample formats
+FORMAT_INT16 = 1
+FORMAT_FLOAT32 = 2
+
+SAMPLE_FORMATS = {
+    "int16": FORMAT_INT16,
+    "float32": FORMAT_FLOAT32
+}
+
+_DTYPES = {
+    FORMAT_INT16: np.dtype("<i2"),
+    FORMAT_FLOAT32: np.dtype("<f4")
+}
+
+# Keep individual WebSocket messages comfortably below typical frame limits
+MAX_PAYLOAD_BYTES = 32768
+
+AudioFrame = namedtuple(
+    "AudioFrame",
+    ["frame_type", "flags", "sample_format", "channels", "stream_id", "sequence", "sample_rate", "payload"]
+)
+
+class ProtocolError(Exception):
+    """Raised for binary frames that cannot be decoded"""
+
+
+def pack_frame(payload, stream_id, sequence, sample_rate, sample_format=FORMAT_INT16,
+               frame_type=FRAME_TTS_AUDIO, flags=0, channels=1):
+    """Prefix raw PCM bytes with a frame header"""
+    header = HEADER.pack(MAGIC, PROTOCOL_VERSION, frame_type, flags, sample_format,
+                         channels, 0, stream_id, sequence, sample_rate)
+    return header + bytes(payload)
+
+def unpack_frame(data):
+    """Split a binary message into an AudioFrame; the payload is a zero-copy memoryview"""
+    if len(data) < HEADER_SIZE:
+        raise ProtocolError(f"Frame too short: {len(data)} bytes")
+    (magic, version, frame_type, flags, sample_format,
+     channels, _, stream_id, sequence, sample_rate) = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ProtocolError("Bad frame magic")
+    if version != PROTOCOL_VERSION:
+        raise ProtocolError(f"Unsupported protocol version: {version}")
+    if sample_format not in _DTYPES:
+        raise ProtocolError(f"Unknown sample format: {sample_format}")
+    payload = memoryview(data)[HEADER_SIZE:]
+    return AudioFrame(frame_type, flags, sample_format, channels, stream_id, sequence, sample_rate, payload)
+
+def encode_pcm(samples, sample_format=FORMAT_INT16):
+    """Convert float samples in [-1, 1] to little-endian PCM bytes"""
+    samples = np.asarray(samples, dtype=np.float32)
+    if sample_format == FORMAT_INT16:
+        return (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+    if sample_format == FORMAT_FLOAT32:
+        return samples.astype("<f4", copy=False).tobytes()
+    raise ProtocolError(f"Unknown sample format: {sample_format}")
+
+def decode_pcm(payload, sample_format):
+    """View PCM bytes as a NumPy array without copying"""
+    return np.frombuffer(payload, dtype=_DTYPES[sample_format])
+
+def iter_audio_frames(samples, stream_id, sample_rate, sample_format=FORMAT_INT16,
+                      frame_type=FRAME_TTS_AUDIO, first_sequence=0, end_of_stream=True):
+    """Split a clip into frames no larger than MAX_PAYLOAD_BYTES
+
+    The last frame carries FLAG_END_OF_STREAM when end_of_stream is set.
+    """
+    pcm = encode_pcm(samples, sample_format)
+    width = _DTYPES[sample_format].itemsize
+    step = MAX_PAYLOAD_BYTES - MAX_PAYLOAD_BYTES % width
+    offsets = list(range(0, len(pcm), step)) or [0]
+    for index, offset in enumerate(offsets):
+        last = index == len(offsets) - 1
+        flags = FLAG_END_OF_STREAM if (last and end_of_stream) else 0
+        yield pack_frame(pcm[offset:offset + step], stream_id, first_sequence + index,
+                         sample_rate, sample_format, frame_type, flags)
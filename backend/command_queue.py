@@ -0,0 +1,188 @@
+import itertools
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from audio_engines import normalize_settings, check_pitch_mode
+
+logger = logging.getLogger("audio_parameters")
+
+# Applies batches that arrive while an engine's lifecycle lock is busy (e.g.
+# during a server reboot), so producers never wait for it
+_deferred_applies = ThreadPoolExecutor(max_workers=2, thread_name_prefix="parameters")
+
+class ParameterCommandQueue:
+    """Multi-producer/single-consumer queue of parameter batches
+
+    The event loop pushes one dict per settings message, executor threads
+    push pitch mode and neutral settings when an engine is reset, and the
+    audio thread drains everything at the start of a block. deque.append
+    and deque.popleft are atomic in CPython, so no side ever takes a lock
+    and the audio thread can never block on a producer.
+    """
+
+    def __init__(self):
+        self._queue = deque()
+        self._pushed = itertools.count(1)
+        self.pushed = 0
+        # Only written by the consumer
+        self.drained = 0
+
+    def push(self, batch):
+        """Producer side (any thread): enqueue a dict of parameter values"""
+        self._queue.append(batch)
+        self.pushed = next(self._pushed)
+
+    def drain(self):
+        """Consumer side: merge every pending batch (latest wins), or return None"""
+        merged = None
+        while True:
+            try:
+                batch = self._queue.popleft()
+            except IndexError:
+                break
+            if merged is None:
+                merged = dict(batch)
+            else:
+                merged.update(batch)
+            self.drained += 1
+        return merged
+
+    def __len__(self):
+        return len(self._queue)
+
+
+class ParameterControlMixin:
+    """set_* / apply_settings API shared by the audio engines
+
+    Parameter changes are queued and applied together at the next audio
+    block boundary by _apply_pending_commands, which the engine calls from
+    its audio thread. While no audio is running the queue is drained under
+    the lifecycle lock instead, so the audio thread cannot start consuming
+    concurrently: right away if the lock is free, otherwise on a parameter
+    thread once the lifecycle operation holding it (e.g. a server reboot)
+    is done. Submitting never blocks, whichever thread it comes from.
+    Lifecycle operations that stop the audio call _apply_if_idle() before
+    releasing the lock, so nothing pushed just before is left behind.
+
+    Engines provide _is_audio_running() and _apply_parameter(name, value),
+    and may override _after_parameters_applied().
+    """
+
+    def _init_parameters(self):
+        self.commands = ParameterCommandQueue()
+        self._apply_scheduled = False
+
+    def apply_settings(self, settings):
+        """Queue a batch of settings to be applied atomically; returns the normalized batch"""
+        batch = normalize_settings(settings)
+        if not batch or not self.is_initialized:
+            return batch
+
+        self._submit(batch)
+        return batch
+
+    def _submit(self, batch):
+        self.commands.push(batch)
+        if self._is_audio_running():
+            return
+        if self._lifecycle_lock.acquire(blocking=False):
+            try:
+                self._apply_if_idle()
+            finally:
+                self._lifecycle_lock.release()
+        elif not self._apply_scheduled:
+            self._apply_scheduled = True
+            _deferred_applies.submit(self._apply_deferred)
+
+    def _apply_deferred(self):
+        # Cleared first: a batch pushed after this point schedules another run
+        self._apply_scheduled = False
+        try:
+            with self._lifecycle_lock:
+                self._apply_if_idle()
+        except Exception as e:
+            logger.error(f"Error applying queued parameters: {e}")
+
+    def _apply_if_idle(self):
+        """Drain the queue unless the audio thread is consuming it (lifecycle lock held)"""
+        if self.is_initialized and not self._is_audio_running():
+            self._apply_pending_commands()
+
+    def _apply_pending_commands(self):
+        """Apply everything queued since the last block (audio thread)"""
+        batch = self.commands.drain()
+        if not batch:
+            return
+        for name, value in batch.items():
+            try:
+                self._apply_parameter(name, value)
+            except Exception as e:
+                logger.error(f"Error setting {name}: {e}")
+        self._after_parameters_applied()
+
+    def _restore_parameters(self, values):
+        """Re-apply a full set of values after a rebuild, then anything queued meanwhile"""
+        for name, value in values.items():
+            try:
+                self._apply_parameter(name, value)
+            except Exception as e:
+                logger.error(f"Error setting {name}: {e}")
+        self._after_parameters_applied()
+        self._apply_pending_commands()
+
+    def _after_parameters_applied(self):
+        """Hook for engines that react to a whole batch (e.g. stage bypass)"""
+
+    def set_pitch_mode(self, mode):
+        """Choose the pitch shifter: phase_vocoder or psola (time domain, lower latency)"""
+        mode = check_pitch_mode(mode)
+        if not self.is_initialized:
+            self.pitch_mode = mode
+            return
+        # Swapped at a block boundary like any other parameter
+        self._submit({"pitch_mode": mode})
+        logger.info(f"Pitch mode set to {mode}")
+
+    def set_pitch_shift(self, semitones, mode=None):
+        """Set pitch shift in semitones, optionally switching the pitch shifter"""
+        if not self.is_initialized:
+            return
+
+        if mode is not None:
+            self.set_pitch_mode(mode)
+        semitones = self.apply_settings({"pitch": semitones})["pitch"]
+        # Convert semitones to transposition factor
+        factor = 2 ** (semitones / 12.0)
+        logger.info(f"Pitch shift set to {semitones} semitones (factor: {factor:.2f})")
+
+    def set_speed(self, speed):
+        """Set playback speed (1.0 = normal)"""
+        if not self.is_initialized:
+            return
+
+        speed = self.apply_settings({"speed": speed})["speed"]
+        logger.info(f"Speed set to {speed}")
+
+    def set_reverb(self, amount):
+        """Set reverb amount (0-1)"""
+        if not self.is_initialized:
+            return
+
+        amount = self.apply_settings({"reverb": amount})["reverb"]
+        logger.info(f"Reverb set to {amount}")
+
+    def set_echo(self, amount):
+        """Set echo amount (0-1)"""
+        if not self.is_initialized:
+            return
+
+        amount = self.apply_settings({"echo": amount})["echo"]
+        logger.info(f"Echo set to {amount}")
+
+    def set_distortion(self, amount):
+        """Set distortion amount (0-1)"""
+        if not self.is_initialized:
+            return
+
+        amount = self.apply_settings({"distortion": amount})["distortion"]
+        logger.info(f"Distortion set to {amount}")
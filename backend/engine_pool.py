@@ -0,0 +1,155 @@
+import threading
+import time
+import logging
+from collections import deque
+from audio_engines import create_audio_processor
+
+logger = logging.getLogger("engine_pool")
+
+class EnginePool:
+    """Pool of pre-booted audio engines handed out to new connections
+
+    pool_size engines are booted up front. Whenever the number of idle
+    engines drops below min_idle the pool refills in the background, and
+    engines returned while max_idle engines are already idle are shut down.
+    """
+
+    def __init__(self, factory=create_audio_processor, pool_size=2, min_idle=1, max_idle=4):
+        self.factory = factory
+        self.pool_size = pool_size
+        self.min_idle = min_idle
+        self.max_idle = max(max_idle, min_idle)
+        self.idle = deque()
+        self.checked_out = 0
+        self._lock = threading.Lock()
+        self._refilling = False
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.created = 0
+        self.destroyed = 0
+        self.checkout_latencies = deque(maxlen=1000)
+
+    def _create_engine(self):
+        """Boot a new engine and build its effect graph"""
+        engine = self.factory()
+        engine.initialize()
+        with self._lock:
+            self.created += 1
+        return engine
+
+    def _destroy_engine(self, engine):
+        """Shut an engine down for good"""
+        try:
+            engine.cleanup()
+        except Exception as e:
+            logger.error(f"Error destroying pooled engine: {e}")
+        with self._lock:
+            self.destroyed += 1
+
+    def prewarm(self):
+        """Boot pool_size engines, blocking until they are ready"""
+        target = max(self.pool_size, self.min_idle)
+        while len(self.idle) < target:
+            engine = self._create_engine()
+            with self._lock:
+                self.idle.append(engine)
+        logger.info(f"Engine pool warmed with {len(self.idle)} idle engines")
+
+    def _refill(self):
+        """Top the idle list back up to min_idle"""
+        try:
+            while len(self.idle) < self.min_idle:
+                engine = self._create_engine()
+                with self._lock:
+                    self.idle.append(engine)
+        except Exception as e:
+            logger.error(f"Error refilling engine pool: {e}")
+        finally:
+            self._refilling = False
+
+    def _schedule_refill(self):
+        """Start a background refill if the pool is running low"""
+        with self._lock:
+            if self._refilling or len(self.idle) >= self.min_idle:
+                return
+            self._refilling = True
+        thread = threading.Thread(target=self._refill)
+        thread.daemon = True
+        thread.start()
+
+    def checkout(self):
+        """Hand out an initialized engine, booting one on a pool miss"""
+        start = time.perf_counter()
+        with self._lock:
+            engine = self.idle.popleft() if self.idle else None
+            if engine is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+            self.checked_out += 1
+
+        try:
+            if engine is None:
+                engine = self._create_engine()
+        except Exception:
+            with self._lock:
+                self.checked_out -= 1
+            raise
+
+        latency_ms = (time.perf_counter() - start) * 1000
+        self.checkout_latencies.append(latency_ms)
+        logger.debug(f"Engine checkout took {latency_ms:.2f} ms")
+
+        self._schedule_refill()
+        return engine
+
+    def checkin(self, engine):
+        """Reset an engine to neutral and keep it for the next connection"""
+        with self._lock:
+            self.checked_out -= 1
+
+        try:
+            engine.reset()
+        except Exception as e:
+            logger.error(f"Error resetting engine, discarding it: {e}")
+            self._destroy_engine(engine)
+            return
+
+        with self._lock:
+            if engine.is_initialized and len(self.idle) < self.max_idle:
+                self.idle.append(engine)
+                return
+        self._destroy_engine(engine)
+
+    def shutdown(self):
+        """Shut down every idle engine"""
+        with self._lock:
+            engines = list(self.idle)
+            self.idle.clear()
+        for engine in engines:
+            self._destroy_engine(engine)
+
+    def stats(self):
+        """Return pool metrics as a JSON-serializable dict"""
+        latencies = sorted(self.checkout_latencies)
+
+        def percentile(p):
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))]
+
+        total = self.hits + self.misses
+        return {
+            "idle": len(self.idle),
+            "checked_out": self.checked_out,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "created": self.created,
+            "destroyed": self.destroyed,
+            "checkout_ms_p50": percentile(0.50),
+            "checkout_ms_p95": percentile(0.95),
+            "checkout_ms_max": latencies[-1] if latencies else 0.0
+        }
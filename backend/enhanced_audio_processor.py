@@ -1,20 +1,77 @@
 from pyo import *
 import threading
-import time
+import itertools
 import logging
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from audio_engines import NEUTRAL_SETTINGS, STAGE_IDLE_TIME, check_pitch_mode, check_audio_input
+from lifecycle import AsyncLifecycleMixin
+from command_queue import ParameterControlMixin
+from latency_profiles import get_profile, algorithmic_latency
+from time_stretch import WsolaTimeStretcher
+from time_domain_pitch import PsolaPitchShifter
 
 logger = logging.getLogger("audio_processor")
 
-class AudioProcessor:
+# Crossfade used when a stage is spliced into or out of the signal path
+STAGE_FADE_TIME = 0.05
+
+STAGE_NAMES = ("speed", "pitch", "distortion", "echo", "reverb")
+
+# Ring tables between the pyo graph and the stages that run in Python (blocks)
+RING_TABLE_BLOCKS = 64
+
+# Frees the pyo objects of released stages, which must not happen inside the server callback
+_releaser = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pyo-release")
+
+# pyo puts new objects on whichever server was created (or selected) last in
+# the process, so servers are only created, and objects only created, under this lock
+PYO_SERVER_LOCK = threading.RLock()
+
+@contextmanager
+def on_server(server):
+    """Create the pyo objects of the with-block on server, whatever other servers the process has"""
+    with PYO_SERVER_LOCK:
+        server.setServer()
+        yield
+
+class _TableBuffer:
+    """Exposes a pyo table's samples to NumPy and keeps the table alive meanwhile"""
+
+    def __init__(self, table):
+        # The exported buffer does not reference its table, so hold both
+        self.buffer = np.asarray(table.getBuffer())
+        self.table = table
+        self.__array_interface__ = self.buffer.__array_interface__
+
+def table_view(table):
+    """Writable NumPy view of a pyo table that can safely outlive every other reference to it
+    
+    A plain np.asarray(table.getBuffer()) reads freed memory (and crashes
+    the process when it is released) once the table itself is gone.
+    """
+    return np.asarray(_TableBuffer(table))
+
+class AudioProcessor(ParameterControlMixin, AsyncLifecycleMixin):
     """Enhanced audio processor with additional effects"""
     
-    def __init__(self):
+    def __init__(self, profile=None, pitch_mode=None, stage_idle_time=STAGE_IDLE_TIME, audio_input=None):
         self.server = None
+        # Server buffer size / sample rate and phase vocoder settings
+        self.profile = self.initial_profile = get_profile(profile)
+        self.pitch_mode = self.initial_pitch_mode = check_pitch_mode(pitch_mode)
+        self.audio_input = self.initial_audio_input = check_audio_input(audio_input)
+        self.stage_idle_time = stage_idle_time
         self.is_initialized = False
         self.is_processing = False
         self.is_realtime_processing = False
-        self.processing_thread = None
-        self.realtime_thread = None
+        self._lifecycle_lock = threading.Lock()
+        # pyo objects of released stages, stopped but not yet freed (see _release_stage)
+        self._released = deque()
+        self._init_lifecycle()
+        self._init_parameters()
     
     def initialize(self):
         """Initialize the PyO audio server"""
@@ -22,140 +79,574 @@ class AudioProcessor:
             return
             
         try:
-            # Create audio server
-            self.server = Server(duplex=1).boot()
+            self._boot()
+            self.is_initialized = True
+            logger.info(f"Audio processor initialized ({self.profile.name} profile)")
             
+        except Exception as e:
+            logger.error(f"Error initializing audio processor: {e}")
+    
+    def _boot(self):
+        """Boot a server for the current profile and input and build the graph on it"""
+        with PYO_SERVER_LOCK:
+            self.server = self._create_server().boot()
+            with on_server(self.server):
+                self._build_graph()
+    
+    def _create_server(self):
+        if self.audio_input == "network":
+            # No sound card: every server.process() call computes one block
+            return Server(sr=self.profile.sample_rate, buffersize=self.profile.buffer_size,
+                          audio="manual", duplex=0)
+        return Server(sr=self.profile.sample_rate, buffersize=self.profile.buffer_size, duplex=1)
+    
+    def _build_graph(self):
+        """Create the live input -> effects -> mixer graph on the booted server"""
+        if self.audio_input == "network":
+            # One-block tables: process_block writes the input block, runs the
+            # server for one block and reads the result, with no added delay
+            bs = self.profile.buffer_size
+            self.input_table = DataTable(bs)
+            self.output_table = DataTable(bs)
+            self.input_view = table_view(self.input_table)
+            self.output_view = table_view(self.output_table)
+            self.mic = TableScan(self.input_table)
+        else:
             # Audio input from microphone
             self.mic = Input()
-            
+        self.build_chain(self.mic)
+        if self.audio_input == "network":
+            self.capture = TableFill(self.output, self.output_table)
+            self.server.start()
+        
+        # Mixer to control when audio is processed
+        self.mixer = Mixer(outs=2, chnls=1)
+        self.mixer.addInput(0, self.output)
+        self.mixer.setAmp(0, 0, 0)  # Start with volume at 0
+        self.mixer.setAmp(0, 1, 0)
+        self.mixer.out()
+    
+    def _teardown_graph(self):
+        """Stop and drop every pyo object of the graph, before its server is shut down
+        
+        Shutting a server down under live objects, or letting them be
+        collected whenever the attributes happen to be replaced, leaves
+        streams pointing into a freed server.
+        """
+        for name, stage in self.stages.items():
+            if stage["objects"] is not None:
+                self._release_stage(name)
+        self._free_released()
+        for name in ("mixer", "capture", "output", "mic"):
+            obj = getattr(self, name, None)
+            if obj is not None:
+                obj.stop()
+        self.input_view = self.output_view = None
+        self.mixer = self.capture = self.output = self.output_source = self.source = self.mic = None
+        self.input_table = self.output_table = None
+        self.stages = {}
+        self._deferred = []
+    
+    def process_block(self, block):
+        """Run one pushed block of buffer_size samples through the chain (network input only)
+        
+        The returned array is a view of an internal table that is
+        overwritten by the next call; copy it if it needs to outlive that.
+        """
+        with self._lifecycle_lock:
+            if not self.is_initialized or self.audio_input != "network":
+                raise RuntimeError("process_block needs the network audio input")
+            if block.size != self.input_view.size:
+                raise ValueError(f"Expected {self.input_view.size} samples, got {block.size}")
+            self.input_view[:] = block
+            self.server.process()
+            return self.output_view
+    
+    def set_audio_input(self, audio_input):
+        """Switch between the local input device and blocks pushed through process_block
+        
+        Rebuilds the server like set_profile; blocks, so call it off the event loop.
+        """
+        audio_input = check_audio_input(audio_input)
+        if audio_input == self.audio_input:
+            return
+        if not self.is_initialized:
+            self.audio_input = audio_input
+            return
+        
+        with self._lifecycle_lock:
+            self.audio_input = audio_input
+            self._rebuild()
+        logger.info(f"Switched audio input to {audio_input}")
+    
+    def _rebuild(self):
+        """Replace the server and graph for the current profile and input, keeping parameters
+        
+        Runs under the lifecycle lock, which the event loop never takes:
+        parameter updates only queue (see ParameterControlMixin) and pushed
+        blocks are processed off the loop.
+        """
+        values = dict(self.values)
+        if self.server.getIsStarted():
+            self.server.stop()
+        self._teardown_graph()
+        self.server.shutdown()
+        self._boot()
+        self._restore_parameters(values)
+        self._update_output()
+    
+    def set_profile(self, profile):
+        """Switch latency profile, rebooting the server and rebuilding the graph
+        
+        Parameter values and the processing state survive the switch.
+        Blocks, so call it off the event loop.
+        """
+        profile = get_profile(profile)
+        if profile == self.profile:
+            return
+        if not self.is_initialized:
+            self.profile = profile
+            return
+        
+        with self._lifecycle_lock:
+            self.profile = profile
+            self._rebuild()
+        logger.info(f"Switched to {profile.name} profile")
+    
+    def get_latency(self):
+        """Report the profile and the algorithmic latency of the current chain"""
+        latency = {"pitch": 0, "speed": 0}
+        for name in latency:
+            stage = self.stages[name] if self.is_initialized else None
+            if stage and stage["state"] != "bypassed" and stage["objects"] is not None:
+                latency[name] = stage["latency_samples"]
+        if latency["speed"]:
+            # Slowing down live builds up a backlog on top of the lookahead
+            latency["speed"] += self.stages["speed"]["processor"].backlog
+        graph = self._late_blocks() * self.profile.buffer_size if self.is_initialized else 0
+        return {"pitch_mode": self.pitch_mode,
+                **algorithmic_latency(self.profile, latency["pitch"], latency["speed"], graph)}
+    
+    def build_chain(self, source):
+        """Build the speed -> pitch -> distortion -> echo -> reverb graph on top of source
+        
+        Used for the live microphone path and by the offline renderer, so both
+        run exactly the same effect chain; call it inside on_server(self.server).
+        Stages are only created the first
+        time their amount becomes non-zero and are spliced into the signal
+        path while it stays non-zero (see _update_bypass); a stage left at
+        neutral for stage_idle_time seconds is released again.
+        """
+        # Queued parameter changes and the Python stages run at every block boundary
+        self.server.setCallback(self._on_block)
+        self.source = source
+        self.stages = {}
+        for name in STAGE_NAMES:
+            self.stages[name] = {"name": name, "objects": None, "state": "bypassed", "source": source,
+                                 "replacing": False, "bypassed_blocks": 0, "idle_blocks": 0}
+        self.values = dict(NEUTRAL_SETTINGS)
+        self._deferred = []
+        self._block_count = 0
+        self.stages_created = 0
+        self.stages_released = 0
+        # pyo computes objects in creation order (see _late_blocks)
+        self._creation_order = itertools.count()
+        
+        # Final output, crossfaded whenever the path changes
+        self.output = InputFader(source)
+        self.output_source = source
+        self.output_order = next(self._creation_order)
+        return self.output
+    
+    def _create_stage(self, name):
+        """Allocate the pyo objects of one stage, fed from the chain source"""
+        # Stages are created long after the graph, when other engines may own newer servers
+        with on_server(self.server):
+            self._build_stage(name)
+    
+    def _build_stage(self, name):
+        stage = self.stages[name]
+        source = self.source
+        if name == "speed":
+            # WSOLA runs in Python (see _create_python_stage)
+            bs = self.server.getBufferSize()
+            self._create_python_stage(stage, WsolaTimeStretcher(self.server.getSamplingRate(), block_size=bs))
+            stage["latency_samples"] = stage["processor"].lookahead + bs
+            stage["latency_blocks"] = stage["latency_samples"] // bs + 1
+        elif name == "pitch" and self.pitch_mode == "psola":
+            # pyo has no PSOLA, so the NumPy engine's shifter runs in Python
+            bs = self.server.getBufferSize()
+            self._create_python_stage(stage, PsolaPitchShifter(self.server.getSamplingRate(), bs))
+            stage["latency_samples"] = stage["processor"].latency + bs
+        elif name == "pitch":
             # Phase vocoder for pitch shifting
-            self.pv = PVAnal(self.mic)
-            self.transp = PVTranspose(self.pv, transpo=1.0)
-            
-            # Speed control
-            #self.speed_control = Control(time=0.1, init=1.0).play()
-            
-            # Distortion effect
-            self.dist = Disto(self.transp, drive=0, slope=0.5)
-            
-            # Create delay line for echo
-            self.delay = Delay(self.dist, delay=0.25, feedback=0)
-            
-            # Create reverb
-            self.reverb = Freeverb(self.delay, size=0.8, damp=0.5, bal=0)
-            
-            # Final output
-            self.output = self.reverb
-            
-            # Mixer to control when audio is processed
-            self.mixer = Mixer(outs=2, chnls=1)
-            self.mixer.addInput(0, self.output)
-            self.mixer.setAmp(0, 0, 0)  # Start with volume at 0
+            stage["input"] = InputFader(source)
+            pv = PVAnal(stage["input"], size=self.profile.fft_size, overlaps=self.profile.overlaps)
+            stage["transpose"] = PVTranspose(pv, transpo=1.0)
+            stage["output"] = PVSynth(stage["transpose"])
+            stage["objects"] = [stage["input"], pv, stage["transpose"], stage["output"]]
+            stage["latency_samples"] = pv.size
+        if name == "pitch":
+            stage["mode"] = self.pitch_mode
+            stage["latency_blocks"] = stage["latency_samples"] // self.server.getBufferSize() + 1
+        elif name == "distortion":
+            stage["input"] = stage["output"] = Disto(source, drive=0, slope=0.5)
+            stage["objects"] = [stage["output"]]
+        elif name == "echo":
+            # Dry signal plus a recursive delay line (mul and feedback follow the amount)
+            stage["input"] = InputFader(source)
+            stage["delay"] = Delay(stage["input"], delay=0.25, feedback=0, mul=0)
+            stage["output"] = stage["input"] + stage["delay"]
+            stage["objects"] = [stage["input"], stage["delay"], stage["output"]]
+        elif name == "reverb":
+            stage["input"] = stage["output"] = Freeverb(source, size=0.8, damp=0.5, bal=0)
+            stage["objects"] = [stage["output"]]
+        stage["source"] = source
+        stage["order"] = next(self._creation_order)
+        self._configure_stage(name)
+        self.stages_created += 1
+        logger.debug(f"Created {name} stage")
+    
+    def _create_python_stage(self, stage, processor):
+        """Route a stage through a Python block processor (anything with process(block, out))
+        
+        The server callback reads the last input block out of one ring table
+        and writes the processed block into another one that is scanned in
+        step with it (see _run_python_stage).
+        """
+        size = RING_TABLE_BLOCKS * self.server.getBufferSize()
+        stage["input"] = InputFader(stage["source"])
+        stage["input_table"] = DataTable(size)
+        stage["output_table"] = DataTable(size)
+        stage["input_view"] = table_view(stage["input_table"])
+        stage["output_view"] = table_view(stage["output_table"])
+        fill = TableFill(stage["input"], stage["input_table"])
+        stage["output"] = TableScan(stage["output_table"])
+        stage["objects"] = [stage["input"], fill, stage["output"]]
+        stage["processor"] = processor
+        stage["blocks"] = 0
+    
+    def _release_stage(self, name):
+        """Stop a bypassed stage and hand its pyo objects over to be freed
+        
+        This runs inside the server callback, where freeing pyo objects
+        crashes the server, so the objects are only stopped here and
+        dropped later on the release thread (or by _teardown_graph).
+        """
+        stage = self.stages[name]
+        for obj in stage["objects"]:
+            obj.stop()
+        self._released.append([stage.pop(key) for key in
+                               ("input_view", "output_view", "processor", "input", "output", "transpose",
+                                "delay", "objects", "input_table", "output_table") if key in stage])
+        stage["objects"] = None
+        self.stages_released += 1
+        _releaser.submit(self._free_released_locked)
+        logger.debug(f"Released idle {name} stage")
+    
+    def _free_released(self):
+        """Drop the objects of released stages (never call this from the server callback)"""
+        while True:
+            try:
+                objects = self._released.popleft()
+            except IndexError:
+                return
+            objects.clear()
+    
+    def _free_released_locked(self):
+        with self._lifecycle_lock:
+            self._free_released()
+    
+    def release_idle_stages(self):
+        """Release every bypassed stage right away (e.g. when the engine goes back to the pool)"""
+        for name, stage in self.stages.items():
+            if stage["state"] == "bypassed" and stage["objects"] is not None:
+                self._release_stage(name)
+    
+    def _configure_stage(self, name):
+        """Push the current value of a parameter into its stage"""
+        stage = self.stages[name]
+        value = self.values[name]
+        if name == "speed":
+            stage["processor"].set_speed(value)
+        elif name == "pitch" and stage["mode"] == "psola":
+            stage["processor"].set_factor(2 ** (value / 12.0))
+        elif name == "pitch":
+            stage["transpose"].setTranspo(2 ** (value / 12.0))
+        elif name == "reverb":
+            stage["output"].setBal(value)
+        elif name == "echo":
+            # Scale to avoid feedback loops
+            stage["delay"].setFeedback(value * 0.8)
+            stage["delay"].setMul(value * 0.8)
+        elif name == "distortion":
+            stage["output"].setDrive(value * 0.9)  # Scale to avoid extreme distortion
+    
+    def _on_block(self):
+        """Server callback, run by the audio thread at every block boundary"""
+        self._block_count += 1
+        self._apply_pending_commands()
+        
+        if self._deferred:
+            due = [action for action in self._deferred if action[0] <= self._block_count]
+            if due:
+                self._deferred = [action for action in self._deferred if action[0] > self._block_count]
+                for _, action in due:
+                    action()
+        
+        for name, stage in self.stages.items():
+            if stage["state"] != "bypassed" and "processor" in stage:
+                self._run_python_stage(stage)
+            elif stage["state"] == "bypassed":
+                stage["bypassed_blocks"] += 1
+                if stage["objects"] is not None:
+                    stage["idle_blocks"] += 1
+                    if stage["idle_blocks"] >= self._idle_blocks():
+                        self._release_stage(name)
+    
+    def _run_python_stage(self, stage):
+        """Process the block a Python stage's TableFill wrote last
+        
+        The tables started together with the block counter, so block k of the
+        input sits at k * bs in the input ring and the output written at
+        (k + 1) * bs is scanned during the coming block: one block of delay.
+        """
+        block = stage["blocks"]
+        stage["blocks"] += 1
+        if block == 0:
+            return
+        bs = self.server.getBufferSize()
+        size = stage["input_view"].size
+        start = (block - 1) * bs % size
+        target = block * bs % size
+        stage["processor"].process(stage["input_view"][start:start + bs],
+                                   stage["output_view"][target:target + bs])
+    
+    def _schedule(self, blocks, action):
+        """Run action after a number of blocks, or right away while no audio is running"""
+        if self._is_audio_running():
+            self._deferred.append((self._block_count + blocks, action))
+        else:
+            action()
+    
+    def _after_parameters_applied(self):
+        self._update_bypass()
+    
+    def _update_bypass(self):
+        """Splice stages in or out of the signal path to match their amounts"""
+        active = {
+            "speed": self.values["speed"] != 1.0,
+            "pitch": self.values["pitch"] != 0,
+            "distortion": self.values["distortion"] > 0,
+            "echo": self.values["echo"] > 0,
+            "reverb": self.values["reverb"] > 0
+        }
+        changed = False
+        for name, stage in self.stages.items():
+            if stage["replacing"]:
+                continue
+            if active[name] and stage["state"] in ("bypassed", "stopping"):
+                if stage["objects"] is None:
+                    self._create_stage(name)
+                elif stage["state"] == "bypassed":
+                    for obj in stage["objects"]:
+                        obj.play()
+                    if "processor" in stage:
+                        # The ring tables restart at index 0 together with the counter
+                        stage["blocks"] = 0
+                        stage["processor"].reset()
+                # Let the stage fill its analysis buffers before it is heard
+                stage["state"] = "priming"
+                changed = True
+                self._schedule(stage.get("latency_blocks", 0), lambda stage=stage: self._finish_priming(stage))
+            elif not active[name] and stage["state"] in ("active", "priming"):
+                was_active = stage["state"] == "active"
+                stage["state"] = "stopping"
+                changed = changed or was_active
+                self._schedule(self._fade_blocks(), lambda stage=stage: self._finish_stopping(stage))
+        if changed:
+            self._rewire()
+    
+    def _finish_priming(self, stage):
+        if stage["state"] == "priming":
+            stage["state"] = "active"
+            self._rewire()
+    
+    def _finish_stopping(self, stage):
+        if stage["state"] == "stopping":
+            stage["state"] = "bypassed"
+            stage["idle_blocks"] = 0
+            for obj in stage["objects"]:
+                obj.stop()
+            if stage["replacing"]:
+                stage["replacing"] = False
+                self._release_stage(stage["name"])
+                self._update_bypass()
+    
+    def _replace_stage(self, name):
+        """Rebuild a stage with new settings, fading the old one out first if it is in use"""
+        stage = self.stages[name]
+        if stage["objects"] is None:
+            return
+        if stage["state"] == "bypassed":
+            self._release_stage(name)
+            return
+        was_active = stage["state"] == "active"
+        stage["replacing"] = True
+        if stage["state"] != "stopping":
+            stage["state"] = "stopping"
+            if was_active:
+                self._rewire()
+            self._schedule(self._fade_blocks(), lambda stage=stage: self._finish_stopping(stage))
+    
+    def _fade_blocks(self):
+        return int(STAGE_FADE_TIME * self.server.getSamplingRate() / self.server.getBufferSize()) + 1
+    
+    def _idle_blocks(self):
+        return int(self.stage_idle_time * self.server.getSamplingRate() / self.server.getBufferSize())
+    
+    def _rewire(self):
+        """Route the signal through the active stages, crossfading every changed connection
+        
+        Priming stages are fed from the signal path but not heard yet.
+        """
+        previous = self.source
+        for stage in self.stages.values():
+            if stage["state"] not in ("active", "priming"):
+                continue
+            if stage["source"] is not previous:
+                stage["input"].setInput(previous, fadetime=STAGE_FADE_TIME)
+                stage["source"] = previous
+            if stage["state"] == "active":
+                previous = stage["output"]
+        if self.output_source is not previous:
+            self.output.setInput(previous, fadetime=STAGE_FADE_TIME)
+            self.output_source = previous
+    
+    def _late_blocks(self):
+        """Blocks the heard path loses to pyo's processing order
+        
+        pyo computes objects in the order they were created, so an object
+        reading one created after it gets that object's previous block.
+        Stages are created lazily, after the output fader and after any
+        stage that already existed, and each such link adds a block.
+        """
+        late = 0
+        previous = -1  # The chain source exists before the chain
+        for stage in self.stages.values():
+            if stage["state"] == "active":
+                late += previous > stage["order"]
+                previous = stage["order"]
+        return late + (previous > self.output_order)
+    
+    def get_stage_states(self):
+        """Report whether each effect stage is in the signal path"""
+        if not self.is_initialized:
+            return {}
+        return {
+            name: {"state": stage["state"], "allocated": stage["objects"] is not None,
+                   "bypassed_blocks": stage["bypassed_blocks"]}
+            for name, stage in self.stages.items()
+        }
+    
+    def _update_output(self):
+        """Start or stop the server and open or close the mixer to match the active modes"""
+        if self.audio_input == "network":
+            # The manual server stays started; blocks only run when they are pushed
+            return
+        if self.is_processing or self.is_realtime_processing:
+            if not self.server.getIsStarted():
+                self.server.start()
+            self.mixer.setAmp(0, 0, 1)
+            self.mixer.setAmp(0, 1, 1)
+        else:
+            self.mixer.setAmp(0, 0, 0)
             self.mixer.setAmp(0, 1, 0)
-            self.mixer.out()
-            
-            self.is_initialized = True
-            logger.info("Audio processor initialized")
-            
-        except Exception as e:
-            logger.error(f"Error initializing audio processor: {e}")
+            if self.server.getIsStarted():
+                self.server.stop()
+            # The audio thread no longer drains the queue
+            self._apply_if_idle()
     
     def start_processing(self):
         """Start audio processing"""
         if not self.is_initialized:
             self.initialize()
             
-        if self.is_processing:
-            return
+        with self._lifecycle_lock:
+            if self.is_processing:
+                return
             
-        def process_thread():
+            # pyo runs the audio in its own thread; we only flip the output on
+            self.is_processing = True
             try:
-                self.server.start()
-                # Fade in the volume
-                self.mixer.setAmp(0, 0, 1)
-                self.mixer.setAmp(0, 1, 1)
-                
-                # Keep processing until stopped
-                while self.is_processing:
-                    time.sleep(0.1)
-                    
-                # Fade out when stopped
-                self.mixer.setAmp(0, 0, 0)
-                self.mixer.setAmp(0, 1, 0)
-                self.server.stop()
-                
+                self._update_output()
             except Exception as e:
-                logger.error(f"Error in audio processing thread: {e}")
-        
-        self.is_processing = True
-        self.processing_thread = threading.Thread(target=process_thread)
-        self.processing_thread.daemon = True
-        self.processing_thread.start()
+                self.is_processing = False
+                logger.error(f"Error starting audio processing: {e}")
+                return
         logger.info("Audio processing started")
     
     def stop_processing(self):
         """Stop audio processing"""
-        if self.is_processing:
+        with self._lifecycle_lock:
+            if not self.is_processing:
+                return
             self.is_processing = False
-            if self.processing_thread:
-                self.processing_thread.join(1.0)  # Wait for thread to finish
-            logger.info("Audio processing stopped")
+            try:
+                self._update_output()
+            except Exception as e:
+                logger.error(f"Error stopping audio processing: {e}")
+        logger.info("Audio processing stopped")
     
     def start_realtime_processing(self):
         """Start real-time audio processing for external applications"""
         if not self.is_initialized:
             self.initialize()
             
-        if self.is_realtime_processing:
-            return
+        with self._lifecycle_lock:
+            if self.is_realtime_processing:
+                return
+            
+            # Create virtual audio devices for routing
+            logger.info("Setting up virtual audio devices for real-time processing")
             
-        def realtime_thread():
+            # In a real implementation, this would create virtual audio devices
+            # and route audio between applications
+            
+            self.is_realtime_processing = True
             try:
-                # Create virtual audio devices for routing
-                logger.info("Setting up virtual audio devices for real-time processing")
-                
-                # In a real implementation, this would create virtual audio devices
-                # and route audio between applications
-                
-                self.server.start()
-                # Set up audio routing
-                self.mixer.setAmp(0, 0, 1)
-                self.mixer.setAmp(0, 1, 1)
-                
-                # Keep processing until stopped
-                while self.is_realtime_processing:
-                    time.sleep(0.1)
-                    
-                # Clean up when stopped
-                self.mixer.setAmp(0, 0, 0)
-                self.mixer.setAmp(0, 1, 0)
-                self.server.stop()
-                
+                self._update_output()
             except Exception as e:
-                logger.error(f"Error in real-time processing thread: {e}")
-        
-        self.is_realtime_processing = True
-        self.realtime_thread = threading.Thread(target=realtime_thread)
-        self.realtime_thread.daemon = True
-        self.realtime_thread.start()
+                self.is_realtime_processing = False
+                logger.error(f"Error starting real-time processing: {e}")
+                return
         logger.info("Real-time audio processing started")
     
     def stop_realtime_processing(self):
         """Stop real-time audio processing"""
-        if self.is_realtime_processing:
+        with self._lifecycle_lock:
+            if not self.is_realtime_processing:
+                return
             self.is_realtime_processing = False
-            if self.realtime_thread:
-                self.realtime_thread.join(1.0)  # Wait for thread to finish
-            logger.info("Real-time audio processing stopped")
+            try:
+                self._update_output()
+            except Exception as e:
+                logger.error(f"Error stopping real-time processing: {e}")
+        logger.info("Real-time audio processing stopped")
     
     def cleanup(self):
         """Clean up resources"""
         self.stop_processing()
         self.stop_realtime_processing()
         
-        if self.server and self.server.getIsStarted():
+        if self.server:
             try:
-                self.server.stop()
+                if self.server.getIsStarted():
+                    self.server.stop()
+                if self.is_initialized:
+                    self._teardown_graph()
+                # Release this processor's own server so sessions don't leak
+                self.server.shutdown()
                 self.server = None
             except Exception as e:
                 logger.error(f"Error stopping server: {e}")
@@ -163,66 +654,38 @@ class AudioProcessor:
         self.is_initialized = False
         logger.info("Audio processor cleaned up")
     
-    def set_pitch_shift(self, semitones):
-        """Set pitch shift in semitones"""
-        if not self.is_initialized:
-            return
-            
-        try:
-            # Convert semitones to transposition factor
-            factor = 2 ** (semitones / 12.0)
-            self.transp.transpo.setValue(factor)
-            logger.info(f"Pitch shift set to {semitones} semitones (factor: {factor:.2f})")
-        except Exception as e:
-            logger.error(f"Error setting pitch shift: {e}")
-    
-    def set_speed(self, speed):
-        """Set playback speed (1.0 = normal)"""
-        if not self.is_initialized:
-            return
-            
-        try:
-            self.speed_control.setValue(speed)
-            logger.info(f"Speed set to {speed}")
-        except Exception as e:
-            logger.error(f"Error setting speed: {e}")
-    
-    def set_reverb(self, amount):
-        """Set reverb amount (0-1)"""
+    def reset(self):
+        """Stop processing and return every effect to neutral, keeping the server booted"""
+        self.stop_processing()
+        self.stop_realtime_processing()
+        
         if not self.is_initialized:
             return
             
-        try:
-            # Ensure amount is between 0-1
-            amount = max(0, min(1, amount))
-            self.reverb.bal.setValue(amount)
-            logger.info(f"Reverb set to {amount}")
-        except Exception as e:
-            logger.error(f"Error setting reverb: {e}")
+        self.mixer.setAmp(0, 0, 0)
+        self.mixer.setAmp(0, 1, 0)
+        self.apply_settings(NEUTRAL_SETTINGS)
+        with self._lifecycle_lock:
+            # Neutral may have been queued behind a lifecycle operation
+            self._apply_if_idle()
+            self.release_idle_stages()
+        # Pooled engines go back to the profile, pitch mode and input they were created with
+        self.set_pitch_mode(self.initial_pitch_mode)
+        self.set_profile(self.initial_profile)
+        self.set_audio_input(self.initial_audio_input)
+        logger.info("Audio processor reset to neutral settings")
     
-    def set_echo(self, amount):
-        """Set echo amount (0-1)"""
-        if not self.is_initialized:
-            return
-            
-        try:
-            # Ensure amount is between 0-1
-            amount = max(0, min(1, amount))
-            self.delay.feedback.setValue(amount * 0.8)  # Scale to avoid feedback loops
-            logger.info(f"Echo set to {amount}")
-        except Exception as e:
-            logger.error(f"Error setting echo: {e}")
+    def _is_audio_running(self):
+        return self.server is not None and self.server.getIsStarted()
     
-    def set_distortion(self, amount):
-        """Set distortion amount (0-1)"""
-        if not self.is_initialized:
+    def _apply_parameter(self, name, value):
+        """Push one normalized parameter into the pyo graph (audio thread)"""
+        if name == "pitch_mode":
+            if value != self.pitch_mode:
+                self.pitch_mode = value
+                self._replace_stage("pitch")
             return
-            
-        try:
-            # Ensure amount is between 0-1
-            amount = max(0, min(1, amount))
-            self.dist.drive.setValue(amount * 0.9)  # Scale to avoid extreme distortion
-            logger.info(f"Distortion set to {amount}")
-        except Exception as e:
-            logger.error(f"Error setting distortion: {e}")
-
+        self.values[name] = value
+        if self.stages[name]["objects"] is not None:
+            # Stages that do not exist yet pick the value up when they are created
+            self._configure_stage(name)
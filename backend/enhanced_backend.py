@@ -4,26 +4,113 @@ import websockets
 import sys
 import os
 import logging
-from enhanced_audio_processor import AudioProcessor
-from tts_engine import TTSEngine
-
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+import time
+from collections import defaultdict, deque
+import binary_protocol
+from audio_engines import DEFAULT_ENGINE, PITCH_MODES
+from engine_pool import EnginePool
+from latency_profiles import PROFILES
+from network_audio import NetworkAudioStream
+from lifecycle import STOP_LATENCY_BUDGET_MS
+from log_pipeline import configure_logging
+from metrics import Counter, Gauge, Histogram, REGISTRY, start_metrics_server
+from session_manager import SessionManager, SessionLimitError
+from worker_supervisor import WorkerSupervisor
+from tts_engine import to_base64_wav
+from tts_cache import TTSCache
+from tts_worker_pool import TTSWorkerPool, TTSQueueFullError, TTSSynthesisError
+
+# Set up logging: queued to a writer thread, rate limited per call site
+# (VOICE_MOD_LOG_LEVEL, VOICE_MOD_LOG_FORMAT=text|json, VOICE_MOD_LOG_RATE, ...)
+configure_logging()
 logger = logging.getLogger("voice_modulator_backend")
 
-# Initialize audio processor and TTS engine
-audio_processor = AudioProcessor()
-tts_engine = TTSEngine()
+# Maximum concurrent sessions (0 = unlimited)
+MAX_SESSIONS = int(os.environ.get("VOICE_MOD_MAX_SESSIONS", "0"))
+
+# How often coalesced modulator updates are applied to a session's engine
+SETTINGS_TICK_MS = float(os.environ.get("VOICE_MOD_SETTINGS_TICK_MS", "10"))
+
+# Warm pool of pre-booted audio engines
+POOL_SIZE = int(os.environ.get("VOICE_MOD_POOL_SIZE", "2"))
+POOL_MIN_IDLE = int(os.environ.get("VOICE_MOD_POOL_MIN_IDLE", "1"))
+POOL_MAX_IDLE = int(os.environ.get("VOICE_MOD_POOL_MAX_IDLE", "4"))
+
+# Audio worker processes sessions are sharded across, one per core by default
+# (0 = run every engine in this process)
+AUDIO_WORKERS = int(os.environ.get("VOICE_MOD_WORKERS", str(os.cpu_count() or 1)))
+
+# Default jitter buffer target for microphone audio streamed up by clients
+NETWORK_LATENCY_MS = float(os.environ.get("VOICE_MOD_NETWORK_LATENCY_MS", "60"))
+
+# Prometheus-style metrics at http://METRICS_HOST:METRICS_PORT/metrics (port 0 disables it)
+METRICS_HOST = os.environ.get("VOICE_MOD_METRICS_HOST", "localhost")
+METRICS_PORT = int(os.environ.get("VOICE_MOD_METRICS_PORT", "9108"))
+
+# TTS synthesis runs in a worker pool, off the event loop
+TTS_EXECUTOR = os.environ.get("VOICE_MOD_TTS_EXECUTOR", "thread")  # thread or process
+TTS_WORKERS = int(os.environ.get("VOICE_MOD_TTS_WORKERS", "2"))
+TTS_MAX_PENDING = int(os.environ.get("VOICE_MOD_TTS_MAX_PENDING", "16"))
+TTS_TIMEOUT = float(os.environ.get("VOICE_MOD_TTS_TIMEOUT", "30"))
+
+# TTS result cache: in-memory LRU over an on-disk store (empty dir disables the disk tier)
+TTS_CACHE_BYTES = int(os.environ.get("VOICE_MOD_TTS_CACHE_BYTES", str(64 * 1024 * 1024)))
+TTS_CACHE_DIR = os.environ.get("VOICE_MOD_TTS_CACHE_DIR",
+                               os.path.join(os.path.dirname(os.path.abspath(__file__)), "tts_cache"))
+TTS_CACHE_DISK_BYTES = int(os.environ.get("VOICE_MOD_TTS_CACHE_DISK_BYTES", str(512 * 1024 * 1024)))
+
+# Shared services, created by start_services() in the server process only:
+# worker processes are spawned and re-import this module, and must not
+# build engine pools and TTS pools of their own
+engine_pool = session_manager = tts_cache = tts_pool = None
+
+def start_services():
+    """Create the engine pool, session manager and TTS pool"""
+    global engine_pool, session_manager, tts_cache, tts_pool
+    # Every connection gets its own effect chain; the TTS workers are shared
+    if AUDIO_WORKERS > 0:
+        # Engines live in worker processes; the pool sizes are split between them
+        engine_pool = WorkerSupervisor(workers=AUDIO_WORKERS, pool_size=POOL_SIZE,
+                                       min_idle=POOL_MIN_IDLE, max_idle=POOL_MAX_IDLE)
+    else:
+        engine_pool = EnginePool(pool_size=POOL_SIZE, min_idle=POOL_MIN_IDLE, max_idle=POOL_MAX_IDLE)
+    session_manager = SessionManager(engine_pool=engine_pool, max_sessions=MAX_SESSIONS,
+                                     settings_interval=SETTINGS_TICK_MS / 1000.0)
+    tts_cache = TTSCache(max_memory_bytes=TTS_CACHE_BYTES, disk_dir=TTS_CACHE_DIR,
+                         max_disk_bytes=TTS_CACHE_DISK_BYTES)
+    tts_pool = TTSWorkerPool(mode=TTS_EXECUTOR, max_workers=TTS_WORKERS,
+                             max_pending=TTS_MAX_PENDING, timeout=TTS_TIMEOUT, cache=tts_cache)
 
 # Store connected clients
 clients = set()
 
+# Recent stop acknowledgement latencies across all sessions
+stop_latencies_ms = deque(maxlen=1000)
+
+# Recent handling times per message type (and action), plus whole TTS requests
+message_latencies_ms = defaultdict(lambda: deque(maxlen=1000))
+
+# Message types and actions the server handles; anything else is counted as "other"
+MESSAGE_ACTIONS = {
+    "modulator": (),
+    "tts": ("play",),
+    "recording": ("start", "stop"),
+    "realtime": ("start", "stop"),
+    "network_audio": ("start", "stop"),
+    "system": ("get_audio_devices", "set_audio_devices", "negotiate", "set_profile", "set_pitch_mode",
+               "get_session_stats", "get_stats")
+}
+
+CONNECTIONS = Counter("voice_mod_connections_total", "WebSocket connections accepted")
+CONNECTIONS_REJECTED = Counter("voice_mod_connections_rejected_total",
+                               "WebSocket connections turned away at the session limit")
+CONNECTIONS_ACTIVE = Gauge("voice_mod_connections_active", "Open WebSocket connections")
+MESSAGES = Counter("voice_mod_messages_total", "Messages received", ["type", "action"])
+MESSAGE_SECONDS = Histogram("voice_mod_message_seconds", "Time spent handling a message", ["type", "action"])
+TTS_SECONDS = Histogram("voice_mod_tts_seconds", "Time to synthesize and send a TTS request", ["mode"])
+TTS_BYTES = Counter("voice_mod_tts_bytes_total", "TTS audio bytes sent to clients", ["mode"])
+TTS_REQUESTS = Counter("voice_mod_tts_requests_total", "TTS requests by outcome", ["result"])
+
 # Mock audio devices for testing
 mock_audio_devices = {
     "inputs": [
@@ -43,54 +130,84 @@ async def handle_client(websocket, path):
     client_id = id(websocket)
     logger.info(f"New client connected: {client_id}")
     clients.add(websocket)
+    CONNECTIONS.inc()
+    CONNECTIONS_ACTIVE.inc()
+    session = None
     
     try:
+        # Give this connection its own isolated effect chain
+        # Checkout may boot an engine on a pool miss, so keep it off the event loop
+        loop = asyncio.get_running_loop()
+        try:
+            session = await loop.run_in_executor(None, session_manager.create_session, client_id)
+        except SessionLimitError as e:
+            logger.warning(f"Rejecting client {client_id}: {e}")
+            CONNECTIONS_REJECTED.inc()
+            await websocket.send(json.dumps({"error": str(e)}))
+            return
+        audio_processor = session.audio_processor
+        logger.info(f"Audio processor initialized for client: {client_id}")
+        
         # Send connection confirmation
         await websocket.send(json.dumps({"status": "connected"}))
         
-        # Initialize audio processor
-        audio_processor.initialize()
-        logger.info(f"Audio processor initialized for client: {client_id}")
-        
         # Process incoming messages
         async for message in websocket:
+            labels = None
             try:
+                if isinstance(message, bytes):
+                    MESSAGES.labels("binary", "").inc()
+                    await handle_binary_frame(message, websocket, session)
+                    continue
+                
                 data = json.loads(message)
                 message_type = data.get('type', '')
-                logger.info(f"Received message type: {message_type} from client: {client_id}")
+                received_at = time.perf_counter()
+                labels = message_labels(message_type, data.get('action'))
+                logger.debug(f"Received message type: {message_type} from client: {client_id}")
                 
                 if message_type == 'modulator':
                     settings = data.get('settings', {})
-                    await handle_modulator_settings(settings, client_id)
+                    await handle_modulator_settings(settings, session)
                     
                 elif message_type == 'tts':
                     action = data.get('action', '')
                     if action == 'play':
                         settings = data.get('settings', {})
-                        await handle_tts_request(settings, websocket, client_id)
+                        # Run in the background so this client's other messages keep flowing
+                        session.start_task(handle_tts_request(settings, websocket, session))
                         
                 elif message_type == 'recording':
                     action = data.get('action', '')
                     if action == 'start':
-                        audio_processor.start_processing()
+                        await audio_processor.start_processing_async()
                         await websocket.send(json.dumps({"status": "recording_started"}))
                         logger.info(f"Recording started for client: {client_id}")
                     elif action == 'stop':
-                        audio_processor.stop_processing()
-                        await websocket.send(json.dumps({"status": "recording_stopped"}))
-                        logger.info(f"Recording stopped for client: {client_id}")
+                        stop_latency_ms = await audio_processor.stop_processing_async()
+                        stop_latencies_ms.append(stop_latency_ms)
+                        await websocket.send(json.dumps({"status": "recording_stopped", "stop_latency_ms": stop_latency_ms}))
+                        logger.info(f"Recording stopped for client: {client_id} ({stop_latency_ms:.1f} ms)")
                 
                 elif message_type == 'realtime':
                     action = data.get('action', '')
                     if action == 'start':
                         # Start real-time audio processing for external apps
-                        audio_processor.start_realtime_processing()
+                        await audio_processor.start_realtime_processing_async()
                         await websocket.send(json.dumps({"status": "realtime_started"}))
                         logger.info(f"Real-time processing started for client: {client_id}")
                     elif action == 'stop':
-                        audio_processor.stop_realtime_processing()
-                        await websocket.send(json.dumps({"status": "realtime_stopped"}))
-                        logger.info(f"Real-time processing stopped for client: {client_id}")
+                        stop_latency_ms = await audio_processor.stop_realtime_processing_async()
+                        stop_latencies_ms.append(stop_latency_ms)
+                        await websocket.send(json.dumps({"status": "realtime_stopped", "stop_latency_ms": stop_latency_ms}))
+                        logger.info(f"Real-time processing stopped for client: {client_id} ({stop_latency_ms:.1f} ms)")
+                
+                elif message_type == 'network_audio':
+                    action = data.get('action', '')
+                    if action == 'start':
+                        await handle_network_audio_start(data, websocket, session)
+                    elif action == 'stop':
+                        await handle_network_audio_stop(websocket, session)
                 
                 elif message_type == 'system':
                     action = data.get('action', '')
@@ -108,26 +225,218 @@ async def handle_client(websocket, path):
                         input_device = devices.get('input', '')
                         output_device = devices.get('output', '')
                         logger.info(f"Set audio devices for client {client_id}: input={input_device}, output={output_device}")
+                    elif action == 'negotiate':
+                        await handle_negotiate(data, websocket, session)
+                    elif action == 'set_profile':
+                        await handle_set_profile(data, websocket, session)
+                    elif action == 'set_pitch_mode':
+                        await handle_set_pitch_mode(data, websocket, session)
+                    elif action == 'get_session_stats':
+                        # Engines in worker processes answer over IPC, so ask off the event loop
+                        stages, latency = await loop.run_in_executor(
+                            None, lambda: (audio_processor.get_stage_states(), audio_processor.get_latency()))
+                        await websocket.send(json.dumps({
+                            "type": "session_stats",
+                            "settings": session.settings_coalescer.stats(),
+                            "applied_settings": session.settings_coalescer.applied,
+                            "stages": stages,
+                            "latency": latency,
+                            "network_audio": session.network_audio.stats() if session.network_audio else None
+                        }))
+                    elif action == 'get_stats':
+                        stats = await loop.run_in_executor(None, get_server_stats)
+                        await websocket.send(json.dumps(stats))
                         
+            except binary_protocol.ProtocolError as e:
+                logger.error(f"Invalid binary frame from client {client_id}: {e}")
+                await websocket.send(json.dumps({"error": f"Invalid binary frame: {e}"}))
             except json.JSONDecodeError as e:
                 logger.error(f"Invalid JSON from client {client_id}: {e}")
                 await websocket.send(json.dumps({"error": "Invalid JSON"}))
             except Exception as e:
                 logger.error(f"Error processing message from client {client_id}: {e}")
                 await websocket.send(json.dumps({"error": f"Server error: {str(e)}"}))
+            finally:
+                # Failed messages count too, with the time it took to fail
+                if labels is not None:
+                    elapsed = time.perf_counter() - received_at
+                    MESSAGES.labels(*labels).inc()
+                    MESSAGE_SECONDS.labels(*labels).observe(elapsed)
+                    message_latencies_ms[".".join(label for label in labels if label)].append(elapsed * 1000)
                 
     except websockets.exceptions.ConnectionClosed as e:
         logger.info(f"Client {client_id} disconnected: {e}")
     except Exception as e:
         logger.error(f"Unexpected error with client {client_id}: {e}")
     finally:
-        clients.remove(websocket)
-        # Cleanup resources
-        audio_processor.cleanup()
+        clients.discard(websocket)
+        CONNECTIONS_ACTIVE.dec()
+        # Drop any TTS work still queued for this client
+        if session is not None:
+            session.cancel_tasks()
+            if session.network_audio is not None:
+                session.network_audio.cancel()
+        # Cleanup only this client's resources; resetting the engine may block on the driver
+        await asyncio.get_running_loop().run_in_executor(None, session_manager.close_session, client_id)
         logger.info(f"Cleaned up resources for client: {client_id}")
 
-async def handle_modulator_settings(settings, client_id):
-    """Update audio processor with new modulation settings"""
+def message_labels(message_type, action):
+    """(type, action) metric labels; the names come from the client, so unknown ones are folded"""
+    if message_type not in MESSAGE_ACTIONS:
+        return "other", ""
+    if not action:
+        return message_type, ""
+    return message_type, action if action in MESSAGE_ACTIONS[message_type] else "other"
+
+def collect_session_metrics():
+    """Per-session CPU time and network audio xrun counters, read at scrape time"""
+    sessions = [session for session in list(session_manager.sessions.values()) if session is not None]
+    cpu = [({"session": session.session_id}, session.cpu_seconds()) for session in sessions]
+    streams = [(session.session_id, session.network_audio.stats()) for session in sessions
+               if session.network_audio is not None]
+    yield ("voice_mod_session_cpu_seconds_total", "counter",
+           "CPU time spent on a session's settings updates and streamed audio blocks "
+           "(DSP of audio from the server's own input device is not included)", cpu)
+    yield ("voice_mod_sessions", "gauge", "Open sessions", [({}, len(sessions))])
+    jitter_counters = (("underruns", "Jitter buffer underruns (ran dry and rebuffered)"),
+                       ("late", "Packets that arrived after their playout time"),
+                       ("lost", "Packets given up on and concealed"),
+                       ("concealed_samples", "Samples filled in by loss concealment"))
+    for name, documentation in jitter_counters:
+        yield (f"voice_mod_network_audio_{name}_total", "counter", documentation,
+               [({"session": session_id}, stats["jitter_buffer"][name]) for session_id, stats in streams])
+    yield ("voice_mod_network_audio_late_ticks_total", "counter", "Audio clock ticks that ran late",
+           [({"session": session_id}, stats["late_ticks"]) for session_id, stats in streams])
+    yield ("voice_mod_network_audio_resyncs_total", "counter", "Audio clock resyncs after falling too far behind",
+           [({"session": session_id}, stats["resyncs"]) for session_id, stats in streams])
+    rings = [(session_id, direction, stats["rings"][direction]) for session_id, stats in streams if "rings" in stats
+             for direction in ("input", "output")]
+    for name in ("overruns", "underruns"):
+        yield (f"voice_mod_audio_ring_{name}_total", "counter", f"Shared-memory audio ring {name}",
+               [({"session": session_id, "ring": direction}, ring[name]) for session_id, direction, ring in rings])
+
+REGISTRY.add_collector(collect_session_metrics)
+
+def get_server_stats():
+    """Collect operational metrics for the stats endpoint"""
+    return {
+        "type": "server_stats",
+        "engine": DEFAULT_ENGINE,
+        "sessions": len(session_manager),
+        "settings": session_manager.settings_stats(),
+        "engine_pool": engine_pool.stats(),
+        "tts_pool": tts_pool.stats(),
+        "tts_cache": tts_cache.stats(),
+        "stop_latency_ms": summarize_latencies(stop_latencies_ms),
+        "stop_latency_budget_ms": STOP_LATENCY_BUDGET_MS,
+        "message_latency_ms": {key: summarize_latencies(values) for key, values in list(message_latencies_ms.items())}
+    }
+
+def summarize_latencies(values):
+    """Return p50/p95/p99/max of a collection of latencies"""
+    ordered = sorted(values)
+    if not ordered:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    return {
+        "p50": ordered[int(0.50 * (len(ordered) - 1))],
+        "p95": ordered[int(0.95 * (len(ordered) - 1))],
+        "p99": ordered[int(0.99 * (len(ordered) - 1))],
+        "max": ordered[-1]
+    }
+
+async def handle_negotiate(data, websocket, session):
+    """Switch the connection to binary audio frames if the client asks for them"""
+    sample_format = data.get('sample_format', 'int16')
+    if data.get('binary_audio') and sample_format in binary_protocol.SAMPLE_FORMATS:
+        session.binary_audio = True
+        session.sample_format = binary_protocol.SAMPLE_FORMATS[sample_format]
+    else:
+        session.binary_audio = False
+        session.sample_format = None
+    
+    await websocket.send(json.dumps({
+        "type": "protocol",
+        "binary_audio": session.binary_audio,
+        "version": binary_protocol.PROTOCOL_VERSION,
+        "header_size": binary_protocol.HEADER_SIZE,
+        "sample_format": sample_format if session.binary_audio else None,
+        "profiles": list(PROFILES),
+        "pitch_modes": list(PITCH_MODES)
+    }))
+    logger.info(f"Client {session.session_id} negotiated binary_audio={session.binary_audio}")
+
+async def handle_set_profile(data, websocket, session):
+    """Switch the session's engine to another latency profile and report its latency"""
+    profile = data.get('profile', '')
+    if profile not in PROFILES:
+        await websocket.send(json.dumps({"error": f"Unknown profile: {profile}", "profiles": list(PROFILES)}))
+        return
+    
+    # Rebooting the audio server blocks, so it runs off the event loop
+    loop = asyncio.get_running_loop()
+    if session.network_audio is not None:
+        # The stream pauses and resizes its buffers for the new block size
+        await session.network_audio.set_profile(profile)
+    else:
+        await loop.run_in_executor(None, session.audio_processor.set_profile, profile)
+    latency = await loop.run_in_executor(None, session.audio_processor.get_latency)
+    reply = {"type": "profile", **latency}
+    if session.network_audio is not None:
+        reply["network_audio"] = session.network_audio.describe()
+    await websocket.send(json.dumps(reply))
+    logger.info(f"Client {session.session_id} switched to {profile} profile ({latency['latency_ms']:.1f} ms)")
+
+async def handle_set_pitch_mode(data, websocket, session):
+    """Switch the session's pitch shifter (phase vocoder or time-domain PSOLA)"""
+    mode = data.get('pitch_mode', '')
+    if mode not in PITCH_MODES:
+        await websocket.send(json.dumps({"error": f"Unknown pitch mode: {mode}", "pitch_modes": list(PITCH_MODES)}))
+        return
+    
+    session.audio_processor.set_pitch_mode(mode)
+    await websocket.send(json.dumps({"type": "pitch_mode", "pitch_mode": mode}))
+
+async def handle_binary_frame(message, websocket, session):
+    """Handle an inbound binary audio frame"""
+    frame = binary_protocol.unpack_frame(message)
+    if frame.frame_type != binary_protocol.FRAME_MIC_AUDIO:
+        raise binary_protocol.ProtocolError(f"Unexpected frame type: {frame.frame_type}")
+    if session.network_audio is None:
+        raise binary_protocol.ProtocolError("Microphone audio received before network_audio start")
+    session.network_audio.on_frame(frame)
+
+async def handle_network_audio_start(data, websocket, session):
+    """Process microphone audio streamed up by the client instead of a local input device
+    
+    The client sends FRAME_MIC_AUDIO frames at the announced sample rate and
+    gets FRAME_PROCESSED_AUDIO frames back on the announced stream id.
+    """
+    if not session.binary_audio:
+        await websocket.send(json.dumps({"error": "Negotiate binary_audio before streaming microphone audio"}))
+        return
+    previous = session.end_network_audio()
+    if previous is not None:
+        await previous.stop()
+    
+    latency_ms = float(data.get('latency_ms', NETWORK_LATENCY_MS))
+    stream = NetworkAudioStream(session.audio_processor, websocket.send, session.new_stream_id(),
+                                session.sample_format, latency_ms)
+    await stream.start()
+    session.network_audio = stream
+    await websocket.send(json.dumps({"status": "network_audio_started", **stream.describe()}))
+
+async def handle_network_audio_stop(websocket, session):
+    """Stop the network stream and return the engine to its input device"""
+    stream = session.end_network_audio()
+    if stream is None:
+        await websocket.send(json.dumps({"status": "network_audio_stopped"}))
+        return
+    await stream.stop()
+    await websocket.send(json.dumps({"status": "network_audio_stopped", **stream.stats()}))
+
+async def handle_modulator_settings(settings, session):
+    """Update the session's audio processor with new modulation settings"""
+    client_id = session.session_id
     try:
         pitch = float(settings.get('pitch', 0))
         speed = float(settings.get('speed', 1.0))
@@ -135,18 +444,23 @@ async def handle_modulator_settings(settings, client_id):
         echo = float(settings.get('echo', 0))
         distortion = float(settings.get('distortion', 0))
         
-        audio_processor.set_pitch_shift(pitch)
-        audio_processor.set_speed(speed)
-        audio_processor.set_reverb(reverb)
-        audio_processor.set_echo(echo)
-        audio_processor.set_distortion(distortion)
+        session.settings = {
+            "pitch": pitch, "speed": speed, "reverb": reverb,
+            "echo": echo, "distortion": distortion
+        }
+        # Latest-wins coalescing; only changed parameters reach the engine on the next tick
+        session.settings_coalescer.submit(session.settings)
         
-        logger.info(f"Updated settings for client {client_id}: pitch={pitch}, speed={speed}, reverb={reverb}, echo={echo}, distortion={distortion}")
+        logger.debug(f"Received settings for client {client_id}: pitch={pitch}, speed={speed}, reverb={reverb}, echo={echo}, distortion={distortion}")
     except Exception as e:
         logger.error(f"Error updating modulator settings for client {client_id}: {e}")
 
-async def handle_tts_request(settings, websocket, client_id):
+async def handle_tts_request(settings, websocket, session):
     """Process text-to-speech request"""
+    client_id = session.session_id
+    started = time.perf_counter()
+    mode = "stream" if settings.get('stream') else "binary" if session.binary_audio else "json"
+    result_label = "error"
     try:
         text = settings.get('text', '')
         voice = settings.get('voice', 'default')
@@ -155,42 +469,149 @@ async def handle_tts_request(settings, websocket, client_id):
         volume = float(settings.get('volume', 1.0))
         
         if not text:
+            result_label = "empty"
             await websocket.send(json.dumps({"error": "No text provided"}))
             return
         
         logger.info(f"Generating TTS for client {client_id}: voice={voice}, text='{text[:30]}...'")
         
+        if settings.get('stream'):
+            if await send_tts_stream(text, voice, pitch, speed, volume, websocket, session):
+                result_label = "ok"
+            return
+        
+        if session.binary_audio:
+            if await send_tts_binary(text, voice, pitch, speed, volume, websocket, session):
+                result_label = "ok"
+            return
+        
         # Generate speech
-        audio_data = tts_engine.generate_speech(text, voice, pitch, speed, volume)
+        result = await tts_pool.synthesize(text, voice, pitch, speed, volume)
         
-        if audio_data:
+        if result:
             # Send the audio data back to the client
-            await websocket.send(json.dumps({
+            message = json.dumps({
                 "type": "tts_audio",
-                "audio_data": audio_data
-            }))
+                "audio_data": to_base64_wav(*result)
+            })
+            await websocket.send(message)
+            TTS_BYTES.labels("json").inc(len(message))
+            result_label = "ok"
             logger.info(f"TTS completed for client {client_id}")
         else:
             await websocket.send(json.dumps({"error": "Failed to generate speech"}))
             logger.error(f"TTS generation failed for client {client_id}")
+    except TTSQueueFullError as e:
+        result_label = "busy"
+        logger.warning(f"Rejected TTS request for client {client_id}: {e}")
+        await websocket.send(json.dumps({"error": f"TTS busy: {str(e)}"}))
+    except asyncio.TimeoutError:
+        result_label = "timeout"
+        logger.error(f"TTS request timed out for client {client_id}")
+        await websocket.send(json.dumps({"error": "TTS timed out"}))
+    except asyncio.CancelledError:
+        result_label = "cancelled"
+        logger.info(f"TTS request cancelled for client {client_id}")
+        raise
     except Exception as e:
         logger.error(f"Error processing TTS request for client {client_id}: {e}")
         await websocket.send(json.dumps({"error": f"TTS error: {str(e)}"}))
+    finally:
+        elapsed = time.perf_counter() - started
+        message_latencies_ms["tts.complete"].append(elapsed * 1000)
+        TTS_SECONDS.labels(mode).observe(elapsed)
+        TTS_REQUESTS.labels(result_label).inc()
+
+async def send_tts_binary(text, voice, pitch, speed, volume, websocket, session):
+    """Send TTS audio as raw PCM binary frames, bypassing base64 and JSON; returns False on failure"""
+    client_id = session.session_id
+    result = await tts_pool.synthesize(text, voice, pitch, speed, volume)
+    if result is None:
+        await websocket.send(json.dumps({"error": "Failed to generate speech"}))
+        logger.error(f"TTS generation failed for client {client_id}")
+        return False
+    
+    samples, sample_rate = result
+    stream_id = session.new_stream_id()
+    for frame in binary_protocol.iter_audio_frames(samples, stream_id, sample_rate, session.sample_format):
+        await websocket.send(frame)
+        TTS_BYTES.labels("binary").inc(len(frame))
+    logger.info(f"TTS completed for client {client_id} (binary stream {stream_id})")
+    return True
+
+async def send_tts_stream(text, voice, pitch, speed, volume, websocket, session):
+    """Push TTS audio segment by segment so playback can start before synthesis finishes
+    
+    Binary clients get frames on one stream id with consecutive sequence numbers and
+    an empty FLAG_END_OF_STREAM frame at the end; JSON clients get tts_audio_chunk
+    messages followed by tts_audio_end. If a segment fails, both get an error
+    carrying the stream id instead of the end marker; returns False then.
+    """
+    client_id = session.session_id
+    stream_id = session.new_stream_id()
+    sequence = 0
+    sample_rate = 0
+    
+    try:
+        async for samples, sample_rate in tts_pool.stream(text, voice, pitch, speed, volume):
+            if session.binary_audio:
+                for frame in binary_protocol.iter_audio_frames(samples, stream_id, sample_rate, session.sample_format,
+                                                               first_sequence=sequence, end_of_stream=False):
+                    await websocket.send(frame)
+                    TTS_BYTES.labels("stream").inc(len(frame))
+                    sequence += 1
+            else:
+                message = json.dumps({
+                    "type": "tts_audio_chunk",
+                    "stream_id": stream_id,
+                    "sequence": sequence,
+                    "audio_data": to_base64_wav(samples, sample_rate)
+                })
+                await websocket.send(message)
+                TTS_BYTES.labels("stream").inc(len(message))
+                sequence += 1
+    except TTSSynthesisError as e:
+        await websocket.send(json.dumps({"error": f"Failed to generate speech: {e}", "stream_id": stream_id,
+                                         "chunks": sequence}))
+        logger.error(f"TTS stream {stream_id} failed for client {client_id} after {sequence} chunks: {e}")
+        return False
+    
+    if session.binary_audio:
+        await websocket.send(binary_protocol.pack_frame(b"", stream_id, sequence, sample_rate, session.sample_format,
+                                                        flags=binary_protocol.FLAG_END_OF_STREAM))
+    else:
+        await websocket.send(json.dumps({"type": "tts_audio_end", "stream_id": stream_id, "chunks": sequence}))
+    logger.info(f"TTS stream {stream_id} completed for client {client_id} ({sequence} chunks)")
+    return True
 
 async def main():
     """Run the WebSocket server"""
     host = "localhost"
     port = 8765
     
-    logger.info(f"Starting audio processing server on ws://{host}:{port}")
+    logger.info(f"Starting audio processing server on ws://{host}:{port} with the {DEFAULT_ENGINE} engine")
+    start_services()
+    metrics_server = None
     
     try:
+        # Boot the warm pool before accepting connections
+        await asyncio.get_running_loop().run_in_executor(None, engine_pool.prewarm)
+        
+        if METRICS_PORT:
+            metrics_server = await start_metrics_server(METRICS_HOST, METRICS_PORT)
+        
         async with websockets.serve(handle_client, host, port):
             logger.info(f"Server started successfully")
             await asyncio.Future()  # Run forever
     except Exception as e:
         logger.error(f"Error starting server: {e}")
         sys.exit(1)
+    finally:
+        if metrics_server is not None:
+            metrics_server.close()
+            await metrics_server.wait_closed()
+        session_manager.close_all()
+        tts_pool.shutdown()
 
 if __name__ == "__main__":
     try:
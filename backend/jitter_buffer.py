@@ -0,0 +1,310 @@
+import time
+import numpy as np
+
+# Weight of each new packet in the transit delay mean/variance estimates
+JITTER_SMOOTHING = 1 / 16.0
+
+# Standard deviations of transit delay the target depth covers
+JITTER_MARGIN = 4.0
+
+# Seconds of concealment before it has faded to silence
+CONCEALMENT_FADE_TIME = 0.08
+
+# Samples over which concealment and real audio are crossfaded
+CROSSFADE_SAMPLES = 32
+
+# Seconds over which the buffer level is averaged before playout adjusts it
+LEVEL_SMOOTHING_TIME = 0.5
+
+class _Concealer:
+    """Continues the last pitch period of a signal, fading out, for packet-loss concealment"""
+
+    def __init__(self, sample_rate):
+        self.sample_rate = sample_rate
+        self.min_period = sample_rate // 500
+        self.max_period = sample_rate // 70
+        # Newest audio of the signal being concealed
+        self.history = np.zeros(2 * self.max_period, dtype=np.float32)
+        self.fade_samples = int(CONCEALMENT_FADE_TIME * sample_rate)
+        self.crossfade = np.linspace(0, 1, CROSSFADE_SAMPLES, dtype=np.float32)
+        self.template = None
+        self.position = 0
+
+    @property
+    def active(self):
+        return self.template is not None
+
+    def remember(self, samples):
+        n = min(len(samples), self.history.size)
+        if n == 0:
+            return
+        self.history[:-n] = self.history[n:]
+        self.history[-n:] = samples[-n:]
+
+    def _estimate_period(self):
+        """Pitch period of the recent audio by autocorrelation, or a 10 ms fallback"""
+        segment = self.history - self.history.mean()
+        energy = np.dot(segment, segment)
+        if energy < 1e-8:
+            return self.sample_rate // 100
+        size = 1 << int(np.ceil(np.log2(2 * segment.size)))
+        spectrum = np.fft.rfft(segment, size)
+        correlation = np.fft.irfft(spectrum.real ** 2 + spectrum.imag ** 2, size)
+        lags = correlation[self.min_period:self.max_period]
+        peak = int(np.argmax(lags))
+        if lags[peak] < 0.3 * correlation[0]:
+            return self.sample_rate // 100
+        return self.min_period + peak
+
+    def conceal(self, count):
+        """Return count samples continuing the signal; the first call picks the period"""
+        if self.template is None:
+            self.template = self.history[-self._estimate_period():].copy()
+            self.position = 0
+        elapsed = self.position + np.arange(count)
+        gain = np.clip(1 - elapsed / self.fade_samples, 0, 1).astype(np.float32)
+        self.position += count
+        return self.template[elapsed % self.template.size] * gain
+
+    def resume(self, samples):
+        """Crossfade from the ongoing concealment into real audio (in place) and end it"""
+        if self.template is None:
+            return
+        n = min(CROSSFADE_SAMPLES, len(samples))
+        tail = self.conceal(n)
+        samples[:n] = tail * (1 - self.crossfade[:n]) + samples[:n] * self.crossfade[:n]
+        self.template = None
+
+
+class JitterBuffer:
+    """Adaptive jitter buffer for audio packets from a client
+
+    Packets are keyed by their sequence number and moved into a sample FIFO
+    in order; late packets are dropped. Every arrival updates running
+    estimates of the mean and variance of the packet transit delay (arrival
+    time minus the packet's media time, so a perfectly steady stream has
+    zero variance), and the target depth follows the variance: it grows at
+    once when the network gets worse and shrinks slowly when it calms down.
+    Playout holds the buffer near the target by concealing a block when it
+    is far below and skipping a crossfaded slice when it is far above.
+
+    Gaps are concealed instead of played as silence. A missing packet is
+    given up on when playout reaches it while later packets are waiting, and
+    both lost packets and underruns are filled by repeating the last pitch
+    period with a fade, crossfaded back into real audio when it returns.
+    """
+
+    def __init__(self, block_size, target_depth, sample_rate=44100, min_depth=None, max_depth=None):
+        self.block_size = block_size
+        self.sample_rate = sample_rate
+        self.min_depth = min_depth or block_size
+        self.max_depth = max_depth or max(8 * int(target_depth), sample_rate // 2)
+        self.target_depth = min(max(int(target_depth), self.min_depth), self.max_depth)
+        self.fifo = np.zeros(self.max_depth + 2 * block_size, dtype=np.float32)
+        self.fill = 0
+        self.packets = {}
+        self.pending_samples = 0
+        self.next_sequence = None
+        self.playing = False
+        self.started = False
+        self.crossfade = np.linspace(0, 1, CROSSFADE_SAMPLES, dtype=np.float32)
+        # Smoothed buffer level; single jitter spikes must not trigger stretching or skipping
+        self.level = 0.0
+        self.level_smoothing = min(1.0, block_size / (LEVEL_SMOOTHING_TIME * sample_rate))
+
+        # Transit delay statistics, in seconds
+        self.first_sequence = self.first_arrival = None
+        self.transit_mean = 0.0
+        self.transit_variance = 0.0
+        self.packet_length = 0
+
+        # Lost packets continue the queued audio, underruns the played audio
+        self.gap_concealer = _Concealer(sample_rate)
+        self.playout_concealer = _Concealer(sample_rate)
+
+        # Metrics
+        self.received = 0
+        self.late = 0
+        self.lost = 0
+        self.underruns = 0
+        self.concealed_samples = 0
+        self.dropped_samples = 0
+        self.grown = 0
+        self.shrunk = 0
+
+    @property
+    def depth(self):
+        """Samples buffered and ready to play, in order"""
+        return self.fill
+
+    @property
+    def jitter(self):
+        """Standard deviation of the packet transit delay, in seconds"""
+        return self.transit_variance ** 0.5
+
+    def push(self, sequence, samples, arrival=None):
+        """Add one packet; samples are copied. arrival defaults to now (monotonic seconds)"""
+        self.received += 1
+        arrival = time.monotonic() if arrival is None else arrival
+        if self.next_sequence is None:
+            self.next_sequence = self.first_sequence = sequence
+            self.first_arrival = arrival
+        if sequence < self.next_sequence or sequence in self.packets:
+            self.late += 1
+            return
+
+        self._update_target(sequence, len(samples), arrival)
+        self.packets[sequence] = np.array(samples, dtype=np.float32)
+        self.pending_samples += len(samples)
+        self._drain()
+
+    def _update_target(self, sequence, length, arrival):
+        """Track the mean and variance of transit delay and adapt the target depth"""
+        self.packet_length = length
+        media_time = (sequence - self.first_sequence) * length / self.sample_rate
+        transit = arrival - self.first_arrival - media_time
+        deviation = transit - self.transit_mean
+        self.transit_mean += JITTER_SMOOTHING * deviation
+        self.transit_variance += JITTER_SMOOTHING * (deviation * deviation - self.transit_variance)
+
+        # Cover the jitter, one packet and one block of clock granularity
+        wanted = int(JITTER_MARGIN * self.jitter * self.sample_rate) + length + self.block_size
+        wanted = min(max(wanted, self.min_depth), self.max_depth)
+        if wanted > self.target_depth:
+            self.target_depth = wanted
+            self.grown += 1
+        elif wanted < self.target_depth:
+            # Shrink slowly so one calm stretch does not throw the headroom away
+            self.target_depth -= max(1, (self.target_depth - wanted) // 64)
+
+    def _drain(self, give_up=False):
+        """Move every packet that is next in line into the FIFO
+
+        A missing packet holds the rest back until give_up is passed (playout
+        is about to run dry) or target_depth samples of later audio are waiting;
+        then it is counted as lost and concealed.
+        """
+        while self.packets:
+            if self.next_sequence not in self.packets:
+                if not give_up and self.pending_samples < self.target_depth:
+                    return
+                missing = int(min(self.packets) - self.next_sequence)
+                self.lost += missing
+                self._append(self._conceal(self.gap_concealer, missing * self.packet_length))
+                self.next_sequence += missing
+            samples = self.packets.pop(self.next_sequence)
+            self.pending_samples -= len(samples)
+            self.next_sequence += 1
+            self.gap_concealer.resume(samples)
+            self._append(samples)
+
+    def _append(self, samples):
+        n = len(samples)
+        if n > self.max_depth:
+            samples = samples[-self.max_depth:]
+            self.dropped_samples += n - self.max_depth
+            n = self.max_depth
+        overflow = self.fill + n - self.max_depth
+        if overflow > 0:
+            self._discard(overflow)
+            self.dropped_samples += overflow
+        self.fifo[self.fill:self.fill + n] = samples
+        self.fill += n
+        self.gap_concealer.remember(samples)
+
+    def _discard(self, count):
+        self.fifo[:self.fill - count] = self.fifo[count:self.fill]
+        self.fill -= count
+
+    def _conceal(self, concealer, count):
+        samples = concealer.conceal(count)
+        # Only count what is still audible; after the fade it is plain silence
+        self.concealed_samples += max(0, min(count, concealer.fade_samples - concealer.position + count))
+        return samples
+
+    def pop(self, out):
+        """Fill out with the next block; returns False if any of it was concealment or silence"""
+        n = out.size
+        if not self.playing and self.fill >= self.target_depth:
+            self.playing = self.started = True
+            self.level = float(self.fill)
+
+        if not self.playing:
+            # Buffering: silence at the start, concealment fading out after an underrun
+            out[:] = self._conceal(self.playout_concealer, n) if self.started else 0
+            return False
+
+        if self.fill < n and self.packets:
+            # Later packets are here but the next one is not: it is lost
+            self._drain(give_up=True)
+
+        if self.fill < n:
+            # Ran dry: conceal the rest and rebuffer up to a higher target
+            available = self.fill
+            out[:available] = self.fifo[:available]
+            self.fill = 0
+            self.playout_concealer.remember(out[:available])
+            out[available:] = self._conceal(self.playout_concealer, n - available)
+            self.underruns += 1
+            self.playing = False
+            if self.target_depth < self.max_depth:
+                self.target_depth = min(self.target_depth + n, self.max_depth)
+                self.grown += 1
+            return False
+
+        # Packets waiting behind a gap count towards the latency too
+        buffered = self.fill + self.pending_samples
+        self.level += self.level_smoothing * (buffered - self.level)
+        if self.level + 2 * n < self.target_depth:
+            # The target has grown past what is buffered: stretch by one block
+            out[:] = self._conceal(self.playout_concealer, n)
+            self.level += n
+            return False
+
+        if self.level > self.target_depth + 2 * n and self.fill > 2 * n:
+            # Too much buffered: skip a crossfaded slice to bring the latency back down
+            skip = min(n // 4, int(self.level) - self.target_depth - n)
+            head = self.fifo[:CROSSFADE_SAMPLES].copy()
+            self._discard(skip)
+            self.fifo[:CROSSFADE_SAMPLES] = head * (1 - self.crossfade) + self.fifo[:CROSSFADE_SAMPLES] * self.crossfade
+            self.dropped_samples += skip
+            self.level -= skip
+            self.shrunk += 1
+
+        out[:] = self.fifo[:n]
+        self._discard(n)
+        self.playout_concealer.resume(out)
+        self.playout_concealer.remember(out)
+        return True
+
+    def reset(self):
+        """Forget every buffered packet, sample and statistic"""
+        self.fill = 0
+        self.packets = {}
+        self.pending_samples = 0
+        self.next_sequence = self.first_sequence = self.first_arrival = None
+        self.playing = self.started = False
+        self.level = 0.0
+        self.transit_mean = self.transit_variance = 0.0
+        self.gap_concealer = _Concealer(self.sample_rate)
+        self.playout_concealer = _Concealer(self.sample_rate)
+
+    def stats(self):
+        """Return buffer state and counters as a JSON-serializable dict"""
+        return {
+            "depth": self.fill,
+            "depth_ms": self.fill * 1000.0 / self.sample_rate,
+            "queued_out_of_order": self.pending_samples,
+            "target_depth": self.target_depth,
+            "target_ms": self.target_depth * 1000.0 / self.sample_rate,
+            "jitter_ms": float(self.jitter * 1000.0),
+            "playing": self.playing,
+            "received": self.received,
+            "late": self.late,
+            "lost": self.lost,
+            "underruns": self.underruns,
+            "concealed_samples": int(self.concealed_samples),
+            "dropped_samples": self.dropped_samples,
+            "grown": self.grown,
+            "shrunk": self.shrunk
+        }
@@ -0,0 +1,52 @@
+import os
+from collections import namedtuple
+
+# Audio I/O and phase vocoder settings that trade latency against quality
+LatencyProfile = namedtuple("LatencyProfile", "name buffer_size sample_rate fft_size overlaps")
+
+PROFILES = {
+    "ultra-low-latency": LatencyProfile("ultra-low-latency", 64, 48000, 256, 4),
+    "balanced": LatencyProfile("balanced", 256, 44100, 1024, 4),
+    "high-quality": LatencyProfile("high-quality", 512, 48000, 2048, 8)
+}
+
+# Profile used when a session does not pick one
+DEFAULT_PROFILE = os.environ.get("VOICE_MOD_PROFILE", "balanced")
+
+def get_profile(profile=None):
+    """Resolve a profile name (or pass a LatencyProfile through)"""
+    if isinstance(profile, LatencyProfile):
+        return profile
+    name = profile or DEFAULT_PROFILE
+    if name not in PROFILES:
+        raise ValueError(f"Unknown latency profile: {name} (expected one of {', '.join(PROFILES)})")
+    return PROFILES[name]
+
+def algorithmic_latency(profile, pitch_latency=0, speed_latency=0, graph_latency=0):
+    """Describe a profile and its algorithmic latency as a JSON-serializable dict
+
+    One input and one output buffer are always in the path; the pitch
+    stage adds pitch_latency samples while it is in use (fft_size for the
+    phase vocoder), and the speed stage speed_latency samples (its
+    lookahead plus any backlog built up by slowing down). graph_latency is
+    what the engine's graph adds between stages (whole blocks, for pyo
+    objects computed after the ones they feed). Device and network latency
+    come on top of this.
+    """
+    profile = get_profile(profile)
+    io_ms = 2 * profile.buffer_size * 1000.0 / profile.sample_rate
+    pitch_ms = pitch_latency * 1000.0 / profile.sample_rate
+    speed_ms = speed_latency * 1000.0 / profile.sample_rate
+    graph_ms = graph_latency * 1000.0 / profile.sample_rate
+    return {
+        "profile": profile.name,
+        "buffer_size": profile.buffer_size,
+        "sample_rate": profile.sample_rate,
+        "fft_size": profile.fft_size,
+        "overlaps": profile.overlaps,
+        "io_latency_ms": io_ms,
+        "pitch_latency_ms": pitch_ms,
+        "speed_latency_ms": speed_ms,
+        "graph_latency_ms": graph_ms,
+        "latency_ms": io_ms + pitch_ms + speed_ms + graph_ms
+    }
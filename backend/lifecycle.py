@@ -0,0 +1,56 @@
+import asyncio
+import time
+import logging
+from collections import deque
+
+logger = logging.getLogger("lifecycle")
+
+# Upper bound we promise for acknowledging a stop request
+STOP_LATENCY_BUDGET_MS = 250.0
+
+class AsyncLifecycleMixin:
+    """Awaitable start/stop for audio processors
+
+    The synchronous start_*/stop_* methods are event driven (no polling
+    threads), but stopping a server can still block on the audio driver, so
+    the coroutines run them on an executor thread and the event loop keeps
+    serving other clients. Stop acknowledgement latency is recorded in
+    stop_latencies_ms so it can be checked against STOP_LATENCY_BUDGET_MS.
+    """
+
+    stop_timeout = 1.0
+
+    def _init_lifecycle(self):
+        self.stop_latencies_ms = deque(maxlen=256)
+
+    async def _run_lifecycle(self, method):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, method)
+
+    async def _stop_and_measure(self, method):
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._run_lifecycle(method), self.stop_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Stop did not complete within {self.stop_timeout:.1f}s, finishing in background")
+        latency_ms = (time.perf_counter() - start) * 1000
+        self.stop_latencies_ms.append(latency_ms)
+        if latency_ms > STOP_LATENCY_BUDGET_MS:
+            logger.warning(f"Stop acknowledged after {latency_ms:.1f} ms (budget {STOP_LATENCY_BUDGET_MS:.0f} ms)")
+        return latency_ms
+
+    async def start_processing_async(self):
+        """Start audio processing without blocking the event loop"""
+        await self._run_lifecycle(self.start_processing)
+
+    async def stop_processing_async(self):
+        """Stop audio processing, returning the acknowledgement latency in ms"""
+        return await self._stop_and_measure(self.stop_processing)
+
+    async def start_realtime_processing_async(self):
+        """Start real-time processing without blocking the event loop"""
+        await self._run_lifecycle(self.start_realtime_processing)
+
+    async def stop_realtime_processing_async(self):
+        """Stop real-time processing, returning the acknowledgement latency in ms"""
+        return await self._stop_and_measure(self.stop_realtime_processing)
@@ -0,0 +1,303 @@
+"""Synthetic WebSocket load generator for the backend
+
+Spins up N simulated clients against a running server. Each one picks its
+next action from a weighted message mix at a Poisson rate:
+
+  modulator  a slider storm: a burst of modulator messages with the values
+             walking, spaced like UI drag events (no reply is expected, so
+             the time each send takes is recorded: it grows with backpressure)
+  tts        a tts play request, timed until its audio has fully arrived
+  recording  recording start or stop (alternating), timed until the reply
+  stats      get_session_stats, timed until the reply
+
+Clients can also reconnect every --churn seconds on average, to measure
+what connecting costs (session checkout, engine pool misses) under load.
+The report has client-side p50/p95/p99 latency and error rates per action,
+connection times and failures, and the server's own view from get_stats
+(per-message handling times, pools, coalescing counters) taken over a
+separate control connection before and after the run, as JSON.
+
+    python load_test.py --clients 200 --duration 60 --rate 2 --mix modulator=8,tts=1,recording=1,stats=1
+"""
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+from collections import defaultdict, deque
+import websockets
+import binary_protocol
+
+ACTIONS = ("modulator", "tts", "recording", "stats")
+
+TTS_TEXTS = ("Hello there", "Testing the voice modulator under load",
+             "The quick brown fox jumps over the lazy dog")
+
+# Replies that complete each kind of request
+REPLY_KINDS = {
+    "recording_started": "recording", "recording_stopped": "recording",
+    "session_stats": "stats", "tts_audio": "tts", "tts_audio_end": "tts"
+}
+
+def percentiles(values):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    pick = lambda q: ordered[int(q * (len(ordered) - 1))]
+    return {"count": len(ordered), "p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99), "max": ordered[-1]}
+
+class Metrics:
+    """Client-side samples shared by every simulated client"""
+
+    def __init__(self):
+        self.latencies_ms = defaultdict(list)
+        self.sent = defaultdict(int)
+        self.errors = defaultdict(int)
+        self.timeouts = defaultdict(int)
+        self.connect_ms = []
+        self.close_ms = []
+        self.connections = 0
+        self.connect_failures = 0
+        self.disconnects = 0
+
+    def report(self):
+        actions = {}
+        for action in ACTIONS:
+            sent = self.sent[action]
+            failed = self.errors[action] + self.timeouts[action]
+            actions[action] = {
+                "sent": sent,
+                "errors": self.errors[action],
+                "timeouts": self.timeouts[action],
+                "error_rate": failed / sent if sent else 0.0,
+                "latency_ms": percentiles(self.latencies_ms[action])
+            }
+        attempts = self.connections + self.connect_failures
+        return {
+            "actions": actions,
+            "unmatched_errors": self.errors["unmatched"],
+            "connections": {
+                "attempts": attempts,
+                "failures": self.connect_failures,
+                "failure_rate": self.connect_failures / attempts if attempts else 0.0,
+                "unexpected_disconnects": self.disconnects,
+                "connect_ms": percentiles(self.connect_ms),
+                "close_ms": percentiles(self.close_ms)
+            }
+        }
+
+
+class SimulatedClient:
+    """One connection sending a random mix of messages and matching the replies"""
+
+    def __init__(self, index, args, metrics, deadline):
+        self.index = index
+        self.args = args
+        self.metrics = metrics
+        self.deadline = deadline
+        self.rng = random.Random(args.seed + index)
+        self.weights = [args.mix.get(action, 0) for action in ACTIONS]
+        # Requests waiting for their reply, oldest first: (kind, started, future)
+        self.pending = deque()
+        self.recording = False
+        self.settings = {"pitch": 0.0, "speed": 1.0, "reverb": 0.0, "echo": 0.0, "distortion": 0.0}
+
+    async def run(self):
+        while time.monotonic() < self.deadline:
+            lifetime = self.rng.expovariate(1.0 / self.args.churn) if self.args.churn else None
+            if not await self._session(lifetime):
+                # Back off a little after a failed connection
+                await asyncio.sleep(self.rng.uniform(0.5, 1.5))
+
+    async def _session(self, lifetime):
+        started = time.perf_counter()
+        try:
+            websocket = await asyncio.wait_for(websockets.connect(self.args.url, max_size=None), self.args.timeout)
+            hello = json.loads(await asyncio.wait_for(websocket.recv(), self.args.timeout))
+        except Exception:
+            self.metrics.connect_failures += 1
+            return False
+        if hello.get("status") != "connected":
+            # e.g. the session limit was hit
+            self.metrics.connect_failures += 1
+            await websocket.close()
+            return False
+        self.metrics.connections += 1
+        self.metrics.connect_ms.append((time.perf_counter() - started) * 1000)
+
+        receiver = asyncio.ensure_future(self._receive(websocket))
+        try:
+            if self.args.binary:
+                await self._request(websocket, "negotiate", {"type": "system", "action": "negotiate",
+                                                             "binary_audio": True, "sample_format": "int16"})
+            end = self.deadline if lifetime is None else min(self.deadline, time.monotonic() + lifetime)
+            while time.monotonic() < end and not receiver.done():
+                await asyncio.sleep(min(self.rng.expovariate(self.args.rate), max(0.0, end - time.monotonic())))
+                if time.monotonic() >= end:
+                    break
+                action = self.rng.choices(ACTIONS, self.weights)[0]
+                await getattr(self, f"_send_{action}")(websocket)
+            if receiver.done():
+                # The server closed the connection
+                self.metrics.disconnects += 1
+            await self._drain()
+        except (websockets.exceptions.ConnectionClosed, asyncio.TimeoutError):
+            self.metrics.disconnects += 1
+        finally:
+            started = time.perf_counter()
+            await websocket.close()
+            self.metrics.close_ms.append((time.perf_counter() - started) * 1000)
+            receiver.cancel()
+            self._fail_pending(self.metrics.timeouts)
+        return True
+
+    async def _request(self, websocket, kind, message):
+        """Send a message that gets a reply; the receiver completes it"""
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((kind, time.perf_counter(), future))
+        if kind in ACTIONS:
+            self.metrics.sent[kind] += 1
+        await websocket.send(json.dumps(message))
+        if kind == "negotiate":
+            await asyncio.wait_for(future, self.args.timeout)
+
+    async def _send_modulator(self, websocket):
+        for _ in range(self.args.storm_size):
+            name = self.rng.choice(list(self.settings))
+            low, high = {"pitch": (-12, 12), "speed": (0.5, 2.0)}.get(name, (0.0, 1.0))
+            value = self.settings[name] + self.rng.uniform(-0.1, 0.1) * (high - low)
+            self.settings[name] = min(high, max(low, value))
+            started = time.perf_counter()
+            await websocket.send(json.dumps({"type": "modulator", "settings": self.settings}))
+            self.metrics.latencies_ms["modulator"].append((time.perf_counter() - started) * 1000)
+            self.metrics.sent["modulator"] += 1
+            await asyncio.sleep(self.args.storm_interval / 1000.0)
+
+    async def _send_tts(self, websocket):
+        await self._request(websocket, "tts", {"type": "tts", "action": "play", "settings": {
+            "text": self.rng.choice(TTS_TEXTS), "voice": "default", "stream": self.args.tts_stream}})
+
+    async def _send_recording(self, websocket):
+        self.recording = not self.recording
+        await self._request(websocket, "recording",
+                            {"type": "recording", "action": "start" if self.recording else "stop"})
+
+    async def _send_stats(self, websocket):
+        await self._request(websocket, "stats", {"type": "system", "action": "get_session_stats"})
+
+    async def _receive(self, websocket):
+        async for message in websocket:
+            if isinstance(message, bytes):
+                frame = binary_protocol.unpack_frame(message)
+                if frame.flags & binary_protocol.FLAG_END_OF_STREAM:
+                    self._complete("tts")
+                continue
+            data = json.loads(message)
+            if "error" in data:
+                self._complete(None, error=True)
+            elif data.get("type") == "protocol":
+                self._complete("negotiate")
+            else:
+                kind = REPLY_KINDS.get(data.get("type") or data.get("status"))
+                if kind:
+                    self._complete(kind)
+
+    def _complete(self, kind, error=False):
+        """Resolve the oldest pending request of a kind (any kind for errors, which carry none)"""
+        for entry in self.pending:
+            if kind is None or entry[0] == kind:
+                self.pending.remove(entry)
+                kind, started, future = entry
+                if error:
+                    self.metrics.errors[kind] += 1
+                elif kind in ACTIONS:
+                    self.metrics.latencies_ms[kind].append((time.perf_counter() - started) * 1000)
+                if not future.done():
+                    future.set_result(None)
+                return
+        if error:
+            # e.g. a rejected modulator message, which had no reply to wait for
+            self.metrics.errors["unmatched"] += 1
+
+    async def _drain(self):
+        """Give outstanding requests until the timeout to finish"""
+        end = time.perf_counter() + self.args.timeout
+        while self.pending and time.perf_counter() < end:
+            await asyncio.sleep(0.05)
+
+    def _fail_pending(self, counter):
+        while self.pending:
+            kind, _, future = self.pending.popleft()
+            counter[kind] += 1
+            future.cancel()
+
+
+async def server_stats(url, timeout):
+    """The server's get_stats reply, over a connection of its own"""
+    try:
+        async with websockets.connect(url, max_size=None) as websocket:
+            await asyncio.wait_for(websocket.recv(), timeout)
+            await websocket.send(json.dumps({"type": "system", "action": "get_stats"}))
+            while True:
+                data = json.loads(await asyncio.wait_for(websocket.recv(), timeout))
+                if data.get("type") == "server_stats":
+                    return data
+    except Exception as e:
+        print(f"Could not get server stats: {e}", file=sys.stderr)
+        return None
+
+async def run(args):
+    before = await server_stats(args.url, args.timeout)
+    metrics = Metrics()
+    started = time.monotonic()
+    deadline = started + args.duration
+    clients = []
+    for index in range(args.clients):
+        client = SimulatedClient(index, args, metrics, deadline)
+        clients.append(asyncio.ensure_future(client.run()))
+        # Spread the connects over the ramp-up
+        if args.ramp:
+            await asyncio.sleep(args.ramp / args.clients)
+    await asyncio.gather(*clients)
+    after = await server_stats(args.url, args.timeout)
+    return {
+        "config": {name: value for name, value in vars(args).items()},
+        "elapsed_s": time.monotonic() - started,
+        "client": metrics.report(),
+        "server": {"before": before, "after": after}
+    }
+
+def parse_mix(text):
+    mix = {}
+    for item in text.split(","):
+        name, _, weight = item.partition("=")
+        if name not in ACTIONS:
+            raise argparse.ArgumentTypeError(f"Unknown action: {name} (expected one of {', '.join(ACTIONS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="ws://localhost:8765")
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    parser.add_argument("--ramp", type=float, default=5.0, help="seconds over which clients connect")
+    parser.add_argument("--rate", type=float, default=1.0, help="actions per second per client")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("modulator=8,tts=1,recording=1,stats=1"))
+    parser.add_argument("--storm-size", type=int, default=20, help="modulator messages per storm")
+    parser.add_argument("--storm-interval", type=float, default=16.0, help="ms between storm messages")
+    parser.add_argument("--tts-stream", action="store_true", help="ask for segment-by-segment TTS")
+    parser.add_argument("--binary", action="store_true", help="negotiate binary audio frames")
+    parser.add_argument("--churn", type=float, default=0.0,
+                        help="mean seconds a client stays connected before reconnecting (0 = never)")
+    parser.add_argument("--timeout", type=float, default=30.0, help="seconds to wait for a reply")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+if __name__ == "__main__":
+    main()
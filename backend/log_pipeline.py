@@ -0,0 +1,160 @@
+import os
+import sys
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+# Level of the root logger
+LOG_LEVEL = os.environ.get("VOICE_MOD_LOG_LEVEL", "INFO").upper()
+
+# "text" for the classic one-line format, "json" for one JSON object per line
+LOG_FORMAT = os.environ.get("VOICE_MOD_LOG_FORMAT", "text")
+
+# Records per second each call site may emit, with bursts of up to LOG_BURST (0 = no limit)
+LOG_RATE = float(os.environ.get("VOICE_MOD_LOG_RATE", "5"))
+LOG_BURST = float(os.environ.get("VOICE_MOD_LOG_BURST", "20"))
+
+# Over the limit, still let one in LOG_SAMPLE records through (0 = drop them all)
+LOG_SAMPLE = int(os.environ.get("VOICE_MOD_LOG_SAMPLE", "100"))
+
+# Records waiting for the writer thread; beyond this new ones are dropped instead of blocking
+LOG_QUEUE_SIZE = int(os.environ.get("VOICE_MOD_LOG_QUEUE_SIZE", "10000"))
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+class RateLimitFilter(logging.Filter):
+    """Token bucket per call site (file and line), with sampling beyond it
+
+    A log line inside a per-message or per-update path otherwise produces
+    as many records as the client sends messages. Every call site gets
+    rate records per second with bursts of burst; past that only one in
+    sample records passes. The next record that passes carries the number
+    dropped since in its suppressed attribute. Errors and worse always pass.
+    """
+
+    def __init__(self, rate=LOG_RATE, burst=LOG_BURST, sample=LOG_SAMPLE):
+        super().__init__()
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.sample = sample
+        self.sites = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if self.rate <= 0 or record.levelno >= logging.ERROR:
+            return True
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            site = self.sites.get(key)
+            if site is None:
+                # [tokens, last refill, dropped since the last record that passed]
+                site = self.sites[key] = [self.burst, now, 0]
+            site[0] = min(self.burst, site[0] + (now - site[1]) * self.rate)
+            site[1] = now
+            if site[0] >= 1:
+                site[0] -= 1
+            elif not (self.sample and site[2] % self.sample == self.sample - 1):
+                site[2] += 1
+                return False
+            record.suppressed, site[2] = site[2], 0
+        return True
+
+
+class TextFormatter(logging.Formatter):
+    """The classic format, noting how many records of the call site were suppressed"""
+
+    def format(self, record):
+        message = super().format(record)
+        suppressed = getattr(record, "suppressed", 0)
+        return f"{message} [{suppressed} similar suppressed]" if suppressed else message
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, for log shippers"""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "timestamp": record.created,
+            "level": record.levelname,
+            "logger": record.name,
+            "process": record.processName,
+            "site": f"{record.module}:{record.lineno}",
+            "message": record.getMessage()
+        }
+        if getattr(record, "suppressed", 0):
+            entry["suppressed"] = record.suppressed
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry)
+
+
+class _DroppingQueueHandler(QueueHandler):
+    """Never blocks the caller: a full queue drops the record and counts it"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Only merge the arguments into the message; the listener's handler
+        # formats (and the JSON formatter needs the record's fields intact)
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_listener = None
+
+def configure_logging(level=None, log_format=None, process_name=None):
+    """Route all logging through a queue to a writer thread, rate limited per call site
+
+    Callers on the event loop or the audio control path only enqueue a
+    record; formatting and the write to stdout happen on the listener's
+    thread. Replaces any configuration made before, so worker processes
+    can call it again after their re-imported main module configured one.
+    """
+    global _listener
+    text_format = TEXT_FORMAT
+    if process_name:
+        import multiprocessing
+        multiprocessing.current_process().name = process_name
+        text_format = f'%(asctime)s - {process_name} - %(name)s - %(levelname)s - %(message)s'
+
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter() if (log_format or LOG_FORMAT) == "json" else TextFormatter(text_format))
+    handler = _DroppingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    handler.addFilter(RateLimitFilter())
+
+    previous, _listener = _listener, QueueListener(handler.queue, output)
+    _listener.start()
+    logging.basicConfig(level=level or LOG_LEVEL, handlers=[handler], force=True)
+    if previous is not None:
+        previous.stop()
+    return handler
+
+def _flush():
+    """Write out whatever is still queued and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+atexit.register(_flush)
@@ -0,0 +1,251 @@
+"""Measure the input-to-output latency of the processing path
+
+Injects a click train into one of three paths, captures what comes out and
+finds each click's delay by cross-correlating the output against it:
+
+  engine   blocks pushed straight through process_block (pyo on a manual
+           server, or the NumPy engine): the latency of the chain itself
+  offline  the pyo offline renderer, as used for recordings and TTS
+  stream   a NetworkAudioStream fed with microphone frames in real time,
+           with optional simulated network jitter: jitter buffer, clock and
+           chain together, measured in wall-clock time
+
+Each stage is measured on its own, with its amount set just off neutral so
+it is in the path without audibly changing the clicks, and the full chain
+with all of them. Stage latency is reported net of the all-bypassed path,
+next to the algorithmic latency the engine reports. Every run shifts the
+click train by a different fraction of a block; the JSON holds the
+distribution over all clicks of all runs, per profile.
+
+    python measure_latency.py --path engine --engine numpy --profiles balanced,ultra-low-latency --runs 5
+"""
+import os
+import sys
+import json
+import asyncio
+import argparse
+import numpy as np
+import binary_protocol
+from latency_profiles import PROFILES, get_profile
+
+# Amounts that keep a stage in the path while leaving clicks recognizable.
+# A speed just above 1.0 has no backlog to drain, so it plays at 1.0 too.
+STAGE_SETTINGS = {
+    "bypassed": {},
+    "speed": {"speed": 1.001},
+    "pitch": {"pitch": 0.01},
+    "distortion": {"distortion": 0.01},
+    "echo": {"echo": 0.01},
+    "reverb": {"reverb": 0.01},
+}
+STAGE_SETTINGS["chain"] = {name: value for settings in STAGE_SETTINGS.values() for name, value in settings.items()}
+
+# Longest delay searched for, in seconds
+MAX_LATENCY = 0.5
+
+# Clicks are this far apart on average, +/- a quarter of it; even the
+# shortest gap must exceed MAX_LATENCY so each click has a single match
+CLICK_SPACING = 0.75
+
+# Samples sent per simulated microphone frame (10 ms at 44.1 kHz)
+STREAM_FRAME_SAMPLES = 441
+
+def click_train(sr, seconds, offset, seed):
+    """Short Hann-windowed clicks at irregular intervals, returning (signal, click indices)"""
+    rng = np.random.default_rng(seed)
+    signal = np.zeros(int(seconds * sr), dtype=np.float32)
+    click = np.hanning(16).astype(np.float32) * np.where(np.arange(16) % 2, -0.8, 0.8).astype(np.float32)
+    positions = []
+    position = int(0.1 * sr) + offset
+    while position + int(MAX_LATENCY * sr) + click.size < signal.size:
+        signal[position:position + click.size] = click
+        positions.append(position)
+        position += int(CLICK_SPACING * sr * rng.uniform(0.75, 1.25))
+    return signal, positions
+
+def click_delays(signal, output, positions, sr):
+    """Delay of every click in samples, by cross-correlation over MAX_LATENCY"""
+    window = int(0.01 * sr)
+    search = int(MAX_LATENCY * sr)
+    delays = []
+    for position in positions:
+        template = signal[position:position + window]
+        segment = output[position:position + search + window]
+        if segment.size < template.size:
+            continue
+        correlation = np.abs(np.correlate(segment, template, mode="valid"))
+        if correlation.max() <= 1e-6:
+            continue
+        delays.append(int(np.argmax(correlation)))
+    return delays
+
+def create_engine(engine, profile, pitch_mode):
+    if engine == "pyo":
+        from enhanced_audio_processor import AudioProcessor
+        processor = AudioProcessor(profile=profile, pitch_mode=pitch_mode, audio_input="network")
+    else:
+        from numpy_engine import NumpyAudioProcessor
+        processor = NumpyAudioProcessor(profile=profile, pitch_mode=pitch_mode)
+    processor.initialize()
+    if not processor.is_initialized:
+        raise RuntimeError(f"Could not initialize the {engine} engine")
+    return processor
+
+def reported_latency_ms(processor):
+    # Device I/O buffers are not in the measured path, so only count the stages
+    latency = processor.get_latency()
+    return latency["pitch_latency_ms"] + latency["speed_latency_ms"] + latency["graph_latency_ms"]
+
+def run_engine(args, profile, settings, signal):
+    processor = create_engine(args.engine, profile, args.pitch_mode)
+    processor.apply_settings(settings)
+    bs = profile.buffer_size
+    output = np.zeros(signal.size - signal.size % bs, dtype=np.float32)
+    for start in range(0, output.size, bs):
+        output[start:start + bs] = processor.process_block(signal[start:start + bs])
+    reported = reported_latency_ms(processor)
+    processor.cleanup()
+    return output, 0.0, reported
+
+def run_offline(args, profile, settings, signal):
+    from offline_renderer import OfflineRenderer
+    renderer = OfflineRenderer(profile=profile.name, tail=0, pitch_mode=args.pitch_mode)
+    output, _ = renderer.render(signal, profile.sample_rate, settings)
+    return output, 0.0, None
+
+async def run_stream(args, profile, settings, signal):
+    from network_audio import NetworkAudioStream
+    processor = create_engine(args.engine, profile, args.pitch_mode)
+    processor.apply_settings(settings)
+    sr = profile.sample_rate
+    fmt = binary_protocol.FORMAT_FLOAT32
+    received = []
+
+    async def send(frame):
+        received.append(binary_protocol.unpack_frame(frame))
+
+    stream = NetworkAudioStream(processor, send, 1, fmt, args.stream_latency_ms)
+    await stream.start()
+    loop = asyncio.get_running_loop()
+    clock_start = loop.time()
+    rng = np.random.default_rng(args.seed)
+
+    async def deliver(frame, delay):
+        await asyncio.sleep(delay)
+        stream.on_frame(binary_protocol.unpack_frame(frame))
+
+    # Each frame leaves once its samples are captured, plus simulated network delay
+    capture_start = loop.time()
+    deliveries = []
+    for sequence, start in enumerate(range(0, signal.size, STREAM_FRAME_SAMPLES)):
+        chunk = signal[start:start + STREAM_FRAME_SAMPLES]
+        due = capture_start + (start + chunk.size) / sr
+        await asyncio.sleep(max(0.0, due - loop.time()))
+        frame = binary_protocol.pack_frame(binary_protocol.encode_pcm(chunk, fmt), 1, sequence, sr, fmt,
+                                           frame_type=binary_protocol.FRAME_MIC_AUDIO)
+        delay = abs(rng.normal(0, args.jitter_ms / 1000.0)) if args.jitter_ms else 0.0
+        deliveries.append(asyncio.ensure_future(deliver(frame, delay)))
+    await asyncio.sleep(MAX_LATENCY)
+    await asyncio.gather(*deliveries)
+    stats = stream.stats()
+    await stream.stop()
+    processor.cleanup()
+
+    output = np.concatenate([binary_protocol.decode_pcm(frame.payload, frame.sample_format)
+                             for frame in sorted(received, key=lambda frame: frame.sequence)])
+    # Output sample k plays k / sr after the clock started, input sample s
+    # was captured s / sr after capture_start
+    return output, (clock_start - capture_start) * 1000.0, stats
+
+def summarize(delays_ms):
+    values = np.asarray(delays_ms)
+    if values.size == 0:
+        return None
+    return {
+        "clicks": int(values.size),
+        "mean": float(values.mean()),
+        "std": float(values.std()),
+        "min": float(values.min()),
+        "p50": float(np.percentile(values, 50)),
+        "p95": float(np.percentile(values, 95)),
+        "p99": float(np.percentile(values, 99)),
+        "max": float(values.max())
+    }
+
+def measure(args, profile, stage):
+    sr = profile.sample_rate
+    delays_ms = []
+    extra = []
+    for run in range(args.runs):
+        # Shift the train by a different fraction of a block every run
+        offset = run * profile.buffer_size // max(args.runs, 1)
+        signal, positions = click_train(sr, args.seconds, offset, args.seed + run)
+        settings = STAGE_SETTINGS[stage]
+        if args.path == "engine":
+            output, shift_ms, info = run_engine(args, profile, settings, signal)
+        elif args.path == "offline":
+            output, shift_ms, info = run_offline(args, profile, settings, signal)
+        else:
+            output, shift_ms, info = asyncio.run(run_stream(args, profile, settings, signal))
+        delays_ms += [delay * 1000.0 / sr + shift_ms for delay in click_delays(signal, output, positions, sr)]
+        if info is not None:
+            extra.append(info)
+
+    result = {"profile": profile.name, "stage": stage, "runs": args.runs, "latency_ms": summarize(delays_ms)}
+    if args.path == "engine" and extra:
+        result["reported_ms"] = extra[-1]
+    elif args.path == "stream" and extra:
+        result["jitter_buffer"] = [info["jitter_buffer"] for info in extra]
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--path", choices=("engine", "offline", "stream"), default="engine")
+    parser.add_argument("--engine", choices=("pyo", "numpy"), default="pyo",
+                        help="engine for the engine and stream paths")
+    parser.add_argument("--profiles", default=",".join(PROFILES))
+    parser.add_argument("--stages", default=",".join(STAGE_SETTINGS))
+    parser.add_argument("--pitch-mode", default="phase_vocoder")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--seconds", type=float, default=6.0, help="length of each click train")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="simulated network jitter (stream path)")
+    parser.add_argument("--stream-latency-ms", type=float, default=60.0,
+                        help="initial jitter buffer target (stream path)")
+    args = parser.parse_args()
+
+    # pyo prints its banner and server messages to stdout: keep it for the JSON
+    output = os.fdopen(os.dup(sys.stdout.fileno()), "w")
+    sys.stdout.flush()
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+
+    stages = args.stages.split(",")
+    if "bypassed" not in stages:
+        # Needed for the net latency of the other stages
+        stages.insert(0, "bypassed")
+
+    results = []
+    for name in args.profiles.split(","):
+        profile = get_profile(name)
+        bypassed = None
+        for stage in stages:
+            if stage not in STAGE_SETTINGS:
+                parser.error(f"Unknown stage: {stage} (expected one of {', '.join(STAGE_SETTINGS)})")
+            result = measure(args, profile, stage)
+            if stage == "bypassed" and result["latency_ms"]:
+                bypassed = result["latency_ms"]["p50"]
+            elif bypassed is not None and result["latency_ms"]:
+                result["net_ms"] = result["latency_ms"]["p50"] - bypassed
+            results.append(result)
+            summary = result["latency_ms"]
+            print(f"{profile.name} {stage}: " + (f"{summary['p50']:.2f} ms median over {summary['clicks']} clicks"
+                                                  if summary else "no clicks found"), file=sys.stderr)
+
+    json.dump({"path": args.path, "engine": None if args.path == "offline" else args.engine,
+               "pitch_mode": args.pitch_mode, "jitter_ms": args.jitter_ms, "stage_settings": STAGE_SETTINGS,
+               "results": results}, output, indent=2)
+    print(file=output)
+    output.close()
+
+if __name__ == "__main__":
+    main()
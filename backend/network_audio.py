@@ -0,0 +1,221 @@
+import asyncio
+import time
+import logging
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+import binary_protocol
+from jitter_buffer import JitterBuffer
+from metrics import Histogram
+
+logger = logging.getLogger("network_audio")
+
+AUDIO_BLOCK_SECONDS = Histogram(
+    "voice_mod_audio_block_seconds",
+    "CPU time spent running one streamed audio block through a session's engine",
+    ["engine"])
+
+# Ticks the clock may fall behind before it gives up catching up and resyncs
+MAX_CATCH_UP_BLOCKS = 8
+
+class NetworkAudioStream:
+    """Runs microphone audio streamed up by a client through its session's chain and back
+
+    Inbound FRAME_MIC_AUDIO frames go into an adaptive jitter buffer that
+    starts at latency_ms. A clock task on the event loop takes one block per
+    block period out of it, runs it through the engine and sends the result back
+    as a FRAME_PROCESSED_AUDIO frame with consecutive sequence numbers. A tick
+    that wakes up late takes every block that is due at once.
+
+    Engines in this process run process_block on the stream's own thread, so
+    their DSP never stalls the event loop nor waits behind other work on the
+    default executor; engines in a worker process are fed through their
+    shared-memory rings, which adds one block of latency because a block's
+    result is collected on the following tick.
+    """
+
+    def __init__(self, engine, send, stream_id, sample_format, latency_ms=60.0):
+        self.engine = engine
+        self.send = send
+        self.stream_id = stream_id
+        self.sample_format = sample_format
+        self.latency_ms = latency_ms
+        self.remote = hasattr(engine, "open_audio_stream")
+        self.task = None
+        self.rings = None
+        self.sequence = 0
+        # One thread keeps the blocks in order and off the default executor
+        self.executor = None if self.remote else ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix=f"network-audio-{stream_id}")
+
+        # Metrics
+        self.blocks = 0
+        self.late_ticks = 0
+        self.resyncs = 0
+        # Engine CPU time for this stream's blocks, wherever the engine runs
+        self.cpu_seconds = 0.0
+        self._busy_ns = 0
+
+    async def start(self):
+        """Switch the engine to pushed input and start the clock"""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.engine.set_audio_input, "network")
+        await self._configure()
+        self.task = asyncio.ensure_future(self._run())
+        logger.info(f"Network audio stream {self.stream_id} started "
+                    f"({self.sample_rate} Hz, {self.block_size} samples, {self.latency_ms:.0f} ms target)")
+
+    async def _configure(self):
+        """Size the buffers for the engine's current sample rate and block size"""
+        loop = asyncio.get_running_loop()
+        latency = await loop.run_in_executor(None, self.engine.get_latency)
+        self.sample_rate = latency["sample_rate"]
+        self.block_size = latency["buffer_size"]
+        # latency_ms is where the adaptive jitter buffer starts; it then follows the network
+        self.jitter = JitterBuffer(self.block_size, self.latency_ms * self.sample_rate / 1000.0, self.sample_rate)
+        if self.remote:
+            self.rings = await loop.run_in_executor(None, self.engine.open_audio_stream, self.block_size)
+            self.processed = np.zeros(self.block_size, dtype=np.float32)
+            self._busy_ns = self.rings[1].busy_ns
+
+    async def _stop_clock(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def set_profile(self, profile):
+        """Switch the engine's profile, pausing the stream while the server is rebuilt"""
+        await self._stop_clock()
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(None, self.engine.set_profile, profile)
+        finally:
+            await self._configure()
+            self.task = asyncio.ensure_future(self._run())
+
+    def cancel(self):
+        """Stop the clock without waiting, e.g. when the connection is gone"""
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+        self._shutdown_executor()
+
+    def _shutdown_executor(self):
+        if self.executor is not None:
+            # A block still running finishes on its own
+            self.executor.shutdown(wait=False)
+
+    async def stop(self):
+        """Stop the clock and give the engine its device input back"""
+        await self._stop_clock()
+        self._shutdown_executor()
+        loop = asyncio.get_running_loop()
+        if self.remote:
+            await loop.run_in_executor(None, self.engine.close_audio_stream)
+            self.rings = None
+        await loop.run_in_executor(None, self.engine.set_audio_input, "device")
+        logger.info(f"Network audio stream {self.stream_id} stopped after {self.blocks} blocks")
+
+    def on_frame(self, frame):
+        """Queue one inbound microphone frame"""
+        if frame.sample_rate != self.sample_rate:
+            raise binary_protocol.ProtocolError(
+                f"Expected {self.sample_rate} Hz microphone audio, got {frame.sample_rate} Hz")
+        samples = binary_protocol.decode_pcm(frame.payload, frame.sample_format)
+        if frame.sample_format == binary_protocol.FORMAT_INT16:
+            samples = samples / np.float32(32768)
+        if frame.channels > 1:
+            samples = samples.reshape(-1, frame.channels).mean(axis=1)
+        self.jitter.push(frame.sequence, samples)
+
+    def _process_local(self, blocks):
+        """Run blocks through an engine in this process (stream thread)"""
+        processed = np.empty_like(blocks)
+        for index, block in enumerate(blocks):
+            cpu = time.thread_time()
+            # The engine reuses its output buffer for the next block
+            processed[index] = self.engine.process_block(block)
+            elapsed = time.thread_time() - cpu
+            AUDIO_BLOCK_SECONDS.labels("local").observe(elapsed)
+            self.cpu_seconds += elapsed
+        return processed
+
+    async def _process(self, count):
+        """Run the next count blocks through the engine, returning the processed blocks"""
+        blocks = np.empty((count, self.block_size), dtype=np.float32)
+        for block in blocks:
+            self.jitter.pop(block)
+        if not self.remote:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, self._process_local, blocks)
+        processed = np.empty_like(blocks)
+        for index, block in enumerate(blocks):
+            # Collect the previous block's result before handing over the next one
+            if self.rings[1].read(self.processed):
+                # The worker accounts its DSP time in the output ring
+                busy_ns = self.rings[1].busy_ns
+                elapsed = (busy_ns - self._busy_ns) / 1e9
+                self._busy_ns = busy_ns
+                AUDIO_BLOCK_SECONDS.labels("worker").observe(elapsed)
+                self.cpu_seconds += elapsed
+            self.rings[0].write(block)
+            processed[index] = self.processed
+        return processed
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        period = self.block_size / self.sample_rate
+        deadline = loop.time()
+        while True:
+            deadline += period
+            delay = deadline - loop.time()
+            due = 1
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                # Every block whose deadline has passed goes out in this tick
+                due += int(-delay / period)
+                if due > MAX_CATCH_UP_BLOCKS:
+                    # Too far behind to catch up without a burst: restart the clock from now
+                    self.resyncs += 1
+                    deadline = loop.time()
+                    due = 1
+                else:
+                    self.late_ticks += 1
+                    deadline += (due - 1) * period
+
+            try:
+                processed = await self._process(due)
+            except Exception as e:
+                logger.error(f"Error processing network audio block: {e}")
+                continue
+            for block in processed:
+                frame = binary_protocol.pack_frame(
+                    binary_protocol.encode_pcm(block, self.sample_format), self.stream_id, self.sequence,
+                    self.sample_rate, self.sample_format, frame_type=binary_protocol.FRAME_PROCESSED_AUDIO)
+                self.sequence = (self.sequence + 1) % 2**32
+                self.blocks += 1
+                try:
+                    await self.send(frame)
+                except Exception as e:
+                    logger.info(f"Network audio stream {self.stream_id} ended: {e}")
+                    return
+
+    def describe(self):
+        """Stream parameters the client needs, as a JSON-serializable dict"""
+        return {
+            "stream_id": self.stream_id,
+            "sample_rate": self.sample_rate,
+            "block_size": self.block_size,
+            "latency_ms": self.latency_ms
+        }
+
+    def stats(self):
+        """Return stream counters as a JSON-serializable dict"""
+        stats = dict(self.describe(), blocks=self.blocks, late_ticks=self.late_ticks,
+                     resyncs=self.resyncs, cpu_seconds=self.cpu_seconds, jitter_buffer=self.jitter.stats())
+        if self.rings is not None:
+            stats["rings"] = {"input": self.rings[0].stats(), "output": self.rings[1].stats()}
+        return stats
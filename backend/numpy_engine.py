@@ -0,0 +1,641 @@
+import threading
+import logging
+import numpy as np
+from audio_engines import NEUTRAL_SETTINGS, STAGE_IDLE_TIME, check_pitch_mode, check_audio_input
+from lifecycle import AsyncLifecycleMixin
+from command_queue import ParameterControlMixin
+from latency_profiles import get_profile, algorithmic_latency
+from time_domain_pitch import PsolaPitchShifter
+from time_stretch import WsolaTimeStretcher, time_stretch
+
+logger = logging.getLogger("numpy_engine")
+
+class PhaseVocoderPitchShifter:
+    """Streaming phase-vocoder pitch shifter (the NumPy counterpart of PVAnal/PVTranspose)
+
+    Works on any block size: input is gathered into hops of fft_size // overlaps
+    samples and every complete hop produces one analysis/synthesis frame.
+    Algorithmic latency is fft_size samples.
+    """
+
+    def __init__(self, fft_size=1024, overlaps=4):
+        self.fft_size = fft_size
+        self.overlaps = overlaps
+        self.hop = fft_size // overlaps
+
+        bins = fft_size // 2 + 1
+        # Periodic Hann window; analysis and synthesis windows overlap-add to 3/8 * overlaps
+        self.window = (0.5 - 0.5 * np.cos(2 * np.pi * np.arange(fft_size) / fft_size)).astype(np.float32)
+        self.synthesis_window = self.window / (0.375 * overlaps)
+        self.bin_index = np.arange(bins, dtype=np.float64)
+        self.bin_advance = self.bin_index * (2 * np.pi * self.hop / fft_size)
+
+        self.in_buffer = np.zeros(fft_size, dtype=np.float32)
+        self.out_accum = np.zeros(fft_size, dtype=np.float32)
+        self.out_queue = np.zeros(self.hop, dtype=np.float32)
+        self.frame = np.zeros(fft_size, dtype=np.float32)
+        self.last_phase = np.zeros(bins)
+        self.sum_phase = np.zeros(bins)
+        self.syn_magnitude = np.zeros(bins)
+        self.syn_frequency = np.zeros(bins)
+        self.syn_spectrum = np.zeros(bins, dtype=np.complex128)
+        # Per-frame work arrays, so only the FFTs allocate
+        self.magnitude = np.zeros(bins)
+        self.phase = np.zeros(bins)
+        self.true_bins = np.zeros(bins)
+        self.fill = 0
+        self.set_factor(1.0)
+
+    @property
+    def latency(self):
+        return self.fft_size
+
+    def set_factor(self, factor):
+        """Precompute where every analysis bin lands (block boundary, not per frame)"""
+        self.factor = float(factor)
+        bins = self.bin_index.size
+        target = (self.bin_index * self.factor).astype(np.int64)
+        self.source_bins = np.flatnonzero(target < bins)
+        target = target[self.source_bins]
+        # target is sorted, so bins landing on the same one form runs: their
+        # magnitudes are summed and the frequency of the last one is kept
+        starts = np.flatnonzero(np.diff(target, prepend=-1))
+        self.run_starts = starts
+        self.run_targets = target[starts]
+        self.run_last = self.source_bins[np.append(starts[1:], self.source_bins.size) - 1]
+        self.source_magnitude = np.zeros(self.source_bins.size)
+        self.run_magnitude = np.zeros(starts.size)
+        self.run_frequency = np.zeros(starts.size)
+
+    def reset(self):
+        """Forget all analysis and synthesis history"""
+        for buffer in (self.in_buffer, self.out_accum, self.out_queue, self.last_phase, self.sum_phase):
+            buffer.fill(0)
+        self.fill = 0
+
+    def _process_frame(self):
+        np.multiply(self.in_buffer, self.window, out=self.frame)
+        spectrum = np.fft.rfft(self.frame)
+        np.abs(spectrum, out=self.magnitude)
+        np.arctan2(spectrum.imag, spectrum.real, out=self.phase)
+
+        # Phase difference -> deviation from the bin centre -> true frequency in bins
+        true_bins = self.true_bins
+        np.subtract(self.phase, self.last_phase, out=true_bins)
+        self.last_phase[:] = self.phase
+        true_bins -= self.bin_advance
+        true_bins += np.pi
+        np.mod(true_bins, 2 * np.pi, out=true_bins)
+        true_bins -= np.pi
+        true_bins *= self.overlaps / (2 * np.pi)
+        true_bins += self.bin_index
+
+        # Move every analysis bin to its transposed position
+        self.syn_magnitude.fill(0)
+        self.syn_frequency.fill(0)
+        if self.run_starts.size:
+            np.take(self.magnitude, self.source_bins, out=self.source_magnitude)
+            np.add.reduceat(self.source_magnitude, self.run_starts, out=self.run_magnitude)
+            self.syn_magnitude[self.run_targets] = self.run_magnitude
+            np.take(true_bins, self.run_last, out=self.run_frequency)
+            self.run_frequency *= self.factor
+            self.syn_frequency[self.run_targets] = self.run_frequency
+
+        # Accumulate synthesis phase and resynthesize
+        self.syn_frequency *= 2 * np.pi / self.overlaps
+        self.sum_phase += self.syn_frequency
+        np.cos(self.sum_phase, out=self.syn_spectrum.real)
+        np.sin(self.sum_phase, out=self.syn_spectrum.imag)
+        self.syn_spectrum *= self.syn_magnitude
+        frame = np.fft.irfft(self.syn_spectrum, self.fft_size)
+        frame *= self.synthesis_window
+        self.out_accum += frame
+
+        # Emit one hop, slide the analysis and synthesis buffers
+        self.out_queue[:] = self.out_accum[:self.hop]
+        self.out_accum[:-self.hop] = self.out_accum[self.hop:]
+        self.out_accum[-self.hop:] = 0
+        self.in_buffer[:-self.hop] = self.in_buffer[self.hop:]
+
+    def process(self, block, out):
+        position = 0
+        tail = self.fft_size - self.hop
+        while position < block.size:
+            take = min(self.hop - self.fill, block.size - position)
+            self.in_buffer[tail + self.fill:tail + self.fill + take] = block[position:position + take]
+            out[position:position + take] = self.out_queue[self.fill:self.fill + take]
+            self.fill += take
+            position += take
+            if self.fill == self.hop:
+                self._process_frame()
+                self.fill = 0
+
+
+class DistortionStage:
+    """Memoryless waveshaper matching pyo Disto's drive curve"""
+
+    def __init__(self, block_size):
+        self.drive = 0.0
+        self.scratch = np.zeros(block_size, dtype=np.float32)
+
+    def set_drive(self, drive):
+        self.drive = min(float(drive), 0.999)
+
+    def reset(self):
+        pass
+
+    def process(self, block, out):
+        if self.drive <= 0:
+            out[:] = block
+            return
+        k = 2 * self.drive / (1 - self.drive)
+        scratch = self.scratch[:block.size]
+        np.abs(block, out=scratch)
+        scratch *= k
+        scratch += 1
+        np.multiply(block, 1 + k, out=out)
+        out /= scratch
+
+
+class EchoStage:
+    """Dry signal plus a recursive delay line, like the pyo chain's Delay
+
+    d[n] = x[n - delay] + feedback * d[n - delay], y[n] = x[n] + mix * d[n].
+    The delay is longer than a block, so each block only reads samples that
+    were written by earlier blocks and the recursion vectorizes.
+    """
+
+    def __init__(self, sr, block_size, delay=0.25):
+        self.length = max(int(delay * sr), block_size)
+        # Holds x + feedback * d, i.e. what d reads back one delay later
+        self.line = np.zeros(self.length, dtype=np.float32)
+        self.delayed = np.zeros(block_size, dtype=np.float32)
+        self.position = 0
+        self.feedback = 0.0
+        self.mix = 0.0
+
+    def set_amount(self, amount):
+        """Feedback and wet level together, as the pyo chain sets them"""
+        self.feedback = self.mix = float(amount)
+
+    def reset(self):
+        self.line.fill(0)
+        self.position = 0
+
+    def process(self, block, out):
+        n = block.size
+        first = min(n, self.length - self.position)
+        delayed = self.delayed[:n]
+        delayed[:first] = self.line[self.position:self.position + first]
+        delayed[first:] = self.line[:n - first]
+
+        np.multiply(delayed, self.feedback, out=out)
+        out += block
+        self.line[self.position:self.position + first] = out[:first]
+        self.line[:n - first] = out[first:n]
+        self.position = (self.position + n) % self.length
+
+        np.multiply(delayed, self.mix, out=out)
+        out += block
+
+
+class ReverbStage:
+    """Uniformly partitioned convolution reverb with a synthetic decaying impulse response
+
+    size and damp mirror the Freeverb parameters used by the pyo chain; bal
+    is the wet/dry balance (0 = dry). Each block costs one FFT, one inverse
+    FFT and a single multiply-accumulate over all partitions.
+    """
+
+    def __init__(self, sr, block_size, size=0.8, damp=0.5, seed=1234):
+        self.block_size = block_size
+        self.bal = 0.0
+
+        impulse = self._impulse_response(sr, size, damp, seed)
+        partitions = -(-impulse.size // block_size)
+        padded = np.zeros(partitions * block_size, dtype=np.float32)
+        padded[:impulse.size] = impulse
+        segments = padded.reshape(partitions, block_size)
+        self.filters = np.fft.rfft(segments, n=2 * block_size, axis=1).astype(np.complex64)
+
+        bins = block_size + 1
+        # Frequency-domain delay line stored twice so the newest-first view is a plain slice
+        self.delay_line = np.zeros((2 * partitions, bins), dtype=np.complex64)
+        self.products = np.zeros((partitions, bins), dtype=np.complex64)
+        self.partitions = partitions
+        self.head = 0
+        self.input_window = np.zeros(2 * block_size, dtype=np.float32)
+        self.wet = np.zeros(block_size, dtype=np.float32)
+
+    @staticmethod
+    def _impulse_response(sr, size, damp, seed):
+        """Exponentially decaying noise, low-passed according to damp"""
+        rt60 = 0.3 + 2.0 * size
+        length = int(rt60 * sr)
+        t = np.arange(length) / sr
+        noise = np.random.default_rng(seed).standard_normal(length)
+        impulse = noise * np.exp(-6.91 * t / rt60)
+
+        spectrum = np.fft.rfft(impulse)
+        freqs = np.fft.rfftfreq(length, 1 / sr)
+        cutoff = 2000 + (1 - damp) * 14000
+        spectrum /= np.sqrt(1 + (freqs / cutoff) ** 4)
+        impulse = np.fft.irfft(spectrum, length)
+        return (impulse / np.sqrt(np.sum(impulse ** 2))).astype(np.float32)
+
+    def set_bal(self, bal):
+        self.bal = float(bal)
+
+    def reset(self):
+        self.delay_line.fill(0)
+        self.input_window.fill(0)
+
+    def process(self, block, out):
+        b = self.block_size
+        self.input_window[:b] = self.input_window[b:]
+        self.input_window[b:] = block
+
+        self.head = (self.head - 1) % self.partitions
+        spectrum = np.fft.rfft(self.input_window)
+        self.delay_line[self.head] = spectrum
+        self.delay_line[self.head + self.partitions] = spectrum
+        recent = self.delay_line[self.head:self.head + self.partitions]
+        np.multiply(recent, self.filters, out=self.products)
+        accumulated = self.products.sum(axis=0)
+        self.wet[:] = np.fft.irfft(accumulated, 2 * b)[b:]
+
+        np.multiply(block, 1 - self.bal, out=out)
+        self.wet *= self.bal
+        out += self.wet
+
+
+class StageSlot:
+    """One position in the chain, its bypass state and its (lazily created) stage
+
+    States: bypassed (skipped entirely), priming (running but not heard, until
+    the stage's latency has been filled), fading_in / fading_out (crossfaded
+    against the dry signal over one block) and active. The stage object only
+    exists once the parameter first leaves neutral, and is dropped again
+    after idle_blocks blocks in the bypassed state.
+    """
+
+    def __init__(self, name, factory, block_size, idle_blocks):
+        self.name = name
+        self.factory = factory
+        self.block_size = block_size
+        self.idle_blocks = idle_blocks
+        self.stage = None
+        self.state = "bypassed"
+        self.replacing = False
+        self.remaining = 0
+        self.idle = 0
+        self.bypassed_blocks = 0
+        self.created = 0
+        self.released = 0
+
+    def update(self, active):
+        """Move towards the state the parameter value calls for"""
+        if active:
+            if self.state == "bypassed":
+                self.idle = 0
+                if self.stage is None:
+                    self.stage = self.factory()
+                    self.created += 1
+                else:
+                    self.stage.reset()
+                self.remaining = -(-getattr(self.stage, "latency", 0) // self.block_size)
+                self.state = "priming" if self.remaining else "fading_in"
+            elif self.state == "fading_out" and not self.replacing:
+                # Still fully audible, so it can simply stay in the path
+                self.state = "active"
+        elif self.state in ("active", "fading_in"):
+            self.state = "fading_out" if self.state == "active" else "bypassed"
+        elif self.state == "priming":
+            self.state = "bypassed"
+
+    def tick_bypassed(self):
+        """Count one skipped block, releasing the stage once it has been idle long enough"""
+        self.bypassed_blocks += 1
+        if self.stage is not None:
+            self.idle += 1
+            if self.idle >= self.idle_blocks:
+                self.release()
+
+    def release(self):
+        self.stage = None
+        self.released += 1
+
+    def replace(self):
+        """Drop the current stage so the next update creates a new one, fading out first if audible"""
+        if self.state in ("active", "fading_out"):
+            self.state = "fading_out"
+            self.replacing = True
+        elif self.stage is not None:
+            self.state = "bypassed"
+            self.release()
+
+    def finish_fade_out(self):
+        """The stage has been faded out; returns True if it was being replaced"""
+        self.state = "bypassed"
+        if not self.replacing:
+            return False
+        self.replacing = False
+        self.release()
+        return True
+
+
+class NumpyAudioProcessor(ParameterControlMixin, AsyncLifecycleMixin):
+    """Pure-NumPy block-based engine with the same setter API as AudioProcessor
+
+    There is no audio server: callers push fixed-size blocks through
+    process_block() (or whole buffers through process()), which makes the
+    engine usable headless, introspectable and easy to benchmark. Stages
+    whose amount is zero are skipped and cost nothing.
+    """
+
+    def __init__(self, sr=None, block_size=None, profile=None, pitch_mode=None, stage_idle_time=STAGE_IDLE_TIME,
+                 audio_input=None):
+        # sr and block_size override the profile's sample rate and buffer size
+        self.profile = self.initial_profile = get_profile(profile)
+        self.pitch_mode = self.initial_pitch_mode = check_pitch_mode(pitch_mode)
+        # Blocks are always pushed in; kept for API parity with AudioProcessor
+        self.audio_input = self.initial_audio_input = check_audio_input(audio_input)
+        self.sr = sr or self.profile.sample_rate
+        self.block_size = block_size or self.profile.buffer_size
+        self.stage_idle_time = stage_idle_time
+        self.is_initialized = False
+        self.is_processing = False
+        self.is_realtime_processing = False
+        self._lifecycle_lock = threading.Lock()
+        self._init_lifecycle()
+        self._init_parameters()
+
+    def initialize(self):
+        """Allocate the block buffers; effect stages are created on first use"""
+        if self.is_initialized:
+            return
+
+        try:
+            self.values = dict(NEUTRAL_SETTINGS)
+            self._allocate()
+            self.is_initialized = True
+            logger.info(f"NumPy audio processor initialized ({self.profile.name} profile)")
+
+        except Exception as e:
+            logger.error(f"Error initializing NumPy audio processor: {e}")
+
+    def _allocate(self):
+        idle_blocks = int(self.stage_idle_time * self.sr / self.block_size)
+        self.slots = {name: StageSlot(name, lambda name=name: self._create_stage(name),
+                                      self.block_size, idle_blocks)
+                      for name in ("speed", "pitch", "distortion", "echo", "reverb")}
+
+        # Ping-pong buffers so stages never allocate per block, plus a
+        # scratch buffer for the output of priming stages
+        self.buffers = [np.zeros(self.block_size, dtype=np.float32) for _ in range(2)]
+        self.scratch = np.zeros(self.block_size, dtype=np.float32)
+        self.fade_in = (np.arange(1, self.block_size + 1) / self.block_size).astype(np.float32)
+        self.fade_out = 1 - self.fade_in
+
+    def set_profile(self, profile):
+        """Switch latency profile, reallocating every buffer for the new block size
+
+        Waits for a block in progress to finish; parameter values and the
+        processing state survive the switch.
+        """
+        profile = get_profile(profile)
+        if profile == self.profile:
+            return
+        with self._lifecycle_lock:
+            self.profile = profile
+            self.sr = profile.sample_rate
+            self.block_size = profile.buffer_size
+            if self.is_initialized:
+                self._allocate()
+                self._restore_parameters(dict(self.values))
+        logger.info(f"Switched to {profile.name} profile")
+
+    def set_audio_input(self, audio_input):
+        """Record the input source; this engine only ever processes pushed blocks"""
+        self.audio_input = check_audio_input(audio_input)
+
+    def get_latency(self):
+        """Report the profile and the algorithmic latency of the current chain"""
+        latency = {"pitch": 0, "speed": 0}
+        for name in latency:
+            slot = self.slots.get(name) if self.is_initialized else None
+            if slot and slot.state != "bypassed" and slot.stage:
+                latency[name] = slot.stage.latency
+        return {"pitch_mode": self.pitch_mode,
+                **algorithmic_latency(self.profile, latency["pitch"], latency["speed"])}
+
+    def process_block(self, block, live_speed=True):
+        """Run one block of block_size samples through the chain
+
+        The returned array is an internal buffer that is overwritten by the
+        next call; copy it if it needs to outlive that. live_speed=False skips
+        the speed stage, for input that has already been time-stretched.
+        """
+        if not self.is_initialized:
+            self.initialize()
+        # Held per block so set_profile and queued parameters never run in the middle of one
+        with self._lifecycle_lock:
+            return self._process_block(block, live_speed)
+
+    def _process_block(self, block, live_speed):
+        if block.size != self.block_size:
+            raise ValueError(f"Expected {self.block_size} samples, got {block.size}")
+
+        # Block boundary: apply every parameter change queued since the last block
+        self._apply_pending_commands()
+
+        source = np.asarray(block, dtype=np.float32)
+        current = 0
+        replaced = False
+        for slot in self.slots.values():
+            if slot.name == "speed" and not live_speed:
+                continue
+            if slot.state == "bypassed":
+                slot.tick_bypassed()
+                continue
+
+            if slot.state == "priming":
+                slot.stage.process(source, self.scratch)
+                slot.remaining -= 1
+                if slot.remaining <= 0:
+                    slot.state = "fading_in"
+                continue
+
+            target = self.buffers[current]
+            slot.stage.process(source, target)
+            if slot.state == "fading_in":
+                # target = source + ramp * (target - source)
+                target -= source
+                target *= self.fade_in
+                target += source
+                slot.state = "active"
+            elif slot.state == "fading_out":
+                target -= source
+                target *= self.fade_out
+                target += source
+                replaced = slot.finish_fade_out() or replaced
+            source = target
+            current = 1 - current
+
+        if replaced:
+            # Bring the replacement stage in from the next block
+            self._update_slots()
+        return source
+
+    def process(self, audio):
+        """Process a whole buffer, returning a new array of length len(audio) / speed
+
+        The whole buffer is available, so it is time-stretched up front
+        rather than through the live speed stage and its bounded backlog.
+        """
+        if not self.is_initialized:
+            self.initialize()
+        audio = time_stretch(audio, self.values["speed"], self.sr)
+        n = audio.size
+        padded = np.zeros(-(-n // self.block_size) * self.block_size, dtype=np.float32)
+        padded[:n] = audio
+        result = np.empty_like(padded)
+        for start in range(0, padded.size, self.block_size):
+            end = start + self.block_size
+            result[start:end] = self.process_block(padded[start:end], live_speed=False)
+        return result[:n]
+
+    def start_processing(self):
+        """Mark the engine as processing; audio is pushed in by the caller"""
+        if not self.is_initialized:
+            self.initialize()
+        with self._lifecycle_lock:
+            self.is_processing = True
+        logger.info("Audio processing started")
+
+    def stop_processing(self):
+        """Stop audio processing"""
+        with self._lifecycle_lock:
+            if not self.is_processing:
+                return
+            self.is_processing = False
+            self._apply_if_idle()
+        logger.info("Audio processing stopped")
+
+    def start_realtime_processing(self):
+        """Mark the engine as processing for external applications"""
+        if not self.is_initialized:
+            self.initialize()
+        with self._lifecycle_lock:
+            self.is_realtime_processing = True
+        logger.info("Real-time audio processing started")
+
+    def stop_realtime_processing(self):
+        """Stop real-time audio processing"""
+        with self._lifecycle_lock:
+            if not self.is_realtime_processing:
+                return
+            self.is_realtime_processing = False
+            self._apply_if_idle()
+        logger.info("Real-time audio processing stopped")
+
+    def cleanup(self):
+        """Release every stage buffer"""
+        self.stop_processing()
+        self.stop_realtime_processing()
+        self.slots = {}
+        self.is_initialized = False
+        logger.info("NumPy audio processor cleaned up")
+
+    def reset(self):
+        """Stop processing and return every effect to neutral"""
+        self.stop_processing()
+        self.stop_realtime_processing()
+        if self.is_initialized:
+            self.apply_settings(NEUTRAL_SETTINGS)
+            with self._lifecycle_lock:
+                # Neutral may have been queued behind a block or a lifecycle operation
+                self._apply_if_idle()
+                self.release_idle_stages()
+            # Pooled engines go back to the profile, pitch mode and input they were created with
+            self.set_pitch_mode(self.initial_pitch_mode)
+            self.set_profile(self.initial_profile)
+            self.set_audio_input(self.initial_audio_input)
+            logger.info("NumPy audio processor reset to neutral settings")
+
+    def _is_audio_running(self):
+        return self.is_processing or self.is_realtime_processing
+
+    def _after_parameters_applied(self):
+        self._update_slots()
+        if not self._is_audio_running():
+            # Nothing is playing, so there is nothing to fade out
+            for slot in self.slots.values():
+                if slot.state == "fading_out":
+                    slot.finish_fade_out()
+            self._update_slots()
+
+    def _update_slots(self):
+        values = self.values
+        self.slots["speed"].update(values["speed"] != 1.0)
+        self.slots["pitch"].update(values["pitch"] != 0)
+        self.slots["distortion"].update(values["distortion"] > 0)
+        self.slots["echo"].update(values["echo"] > 0)
+        self.slots["reverb"].update(values["reverb"] > 0)
+
+    def _create_stage(self, name):
+        """Allocate one effect stage, configured with the current parameter value"""
+        if name == "speed":
+            stage = WsolaTimeStretcher(self.sr, block_size=self.block_size)
+        elif name == "pitch" and self.pitch_mode == "psola":
+            stage = PsolaPitchShifter(self.sr, self.block_size)
+        elif name == "pitch":
+            stage = PhaseVocoderPitchShifter(self.profile.fft_size, self.profile.overlaps)
+        elif name == "distortion":
+            stage = DistortionStage(self.block_size)
+        elif name == "echo":
+            stage = EchoStage(self.sr, self.block_size)
+        else:
+            stage = ReverbStage(self.sr, self.block_size)
+        self._configure_stage(name, stage)
+        logger.debug(f"Created {name} stage")
+        return stage
+
+    def _configure_stage(self, name, stage):
+        value = self.values[name]
+        if name == "speed":
+            stage.set_speed(value)
+        elif name == "pitch":
+            stage.set_factor(2 ** (value / 12.0))
+        elif name == "reverb":
+            stage.set_bal(value)
+        elif name == "echo":
+            stage.set_amount(value * 0.8)  # Scale to avoid feedback loops
+        elif name == "distortion":
+            stage.set_drive(value * 0.9)  # Scale to avoid extreme distortion
+
+    def release_idle_stages(self):
+        """Release every bypassed stage right away (e.g. when the engine goes back to the pool)"""
+        for slot in self.slots.values():
+            if slot.state == "bypassed" and slot.stage is not None:
+                slot.release()
+
+    def get_stage_states(self):
+        """Report whether each effect stage is in the signal path"""
+        if not self.is_initialized:
+            return {}
+        return {name: {"state": slot.state, "allocated": slot.stage is not None,
+                       "bypassed_blocks": slot.bypassed_blocks}
+                for name, slot in self.slots.items()}
+
+    def _apply_parameter(self, name, value):
+        """Push one normalized parameter into the stages (block boundary)"""
+        if name == "pitch_mode":
+            if value != self.pitch_mode:
+                self.pitch_mode = value
+                self.slots["pitch"].replace()
+            return
+        self.values[name] = value
+        if self.slots[name].stage is not None:
+            # Stages that do not exist yet pick the value up when they are created
+            self._configure_stage(name, self.slots[name].stage)
@@ -0,0 +1,99 @@
+import os
+import time
+import tempfile
+import threading
+import logging
+import numpy as np
+from pyo import Server, DataTable, NewTable, TableRead, TableRec
+from enhanced_audio_processor import AudioProcessor, PYO_SERVER_LOCK, on_server
+from audio_io import read_wav, write_wav, to_mono_float32
+from latency_profiles import get_profile
+from time_stretch import time_stretch
+
+logger = logging.getLogger("offline_renderer")
+
+class OfflineRenderer:
+    """Renders audio through the effect chain as fast as the CPU allows
+
+    Each render boots a pyo server in offline mode, so no sound card is
+    needed and the graph is computed faster than realtime. The chain is
+    built by AudioProcessor.build_chain, the same code the live path uses.
+    """
+
+    def __init__(self, sr=44100, buffersize=256, tail=0.5, profile=None, pitch_mode=None):
+        self.sr = sr
+        # A profile sets the block size and the phase vocoder FFT size/overlaps
+        self.profile = get_profile(profile)
+        self.buffersize = self.profile.buffer_size if profile else buffersize
+        self.pitch_mode = pitch_mode
+        self.tail = tail  # Seconds rendered after the input ends (echo/reverb tails)
+        # Renders through this renderer run one at a time. This does not
+        # shield live engines from the offline server: every pyo server and
+        # object in the process is created under PYO_SERVER_LOCK instead
+        self._lock = threading.Lock()
+
+    def render(self, audio, sr=None, settings=None):
+        """Process an array of samples and return (processed float32 array, sample rate)"""
+        samples = to_mono_float32(audio)
+        sr = int(sr or self.sr)
+        if samples.size == 0:
+            return samples, sr
+
+        # All input is available up front, so speed simply changes the length
+        # instead of going through the live stage's bounded backlog
+        settings = dict(settings or {})
+        speed = float(settings.pop("speed", 1.0))
+        if speed != 1.0:
+            samples = time_stretch(samples, speed, sr)
+
+        total = samples.size + int(self.tail * sr)
+        duration = total / sr
+
+        fd, scratch_path = tempfile.mkstemp(suffix=".wav")
+        os.close(fd)
+        with self._lock:
+            with PYO_SERVER_LOCK:
+                server = Server(audio="offline", nchnls=1, duplex=0, sr=sr, buffersize=self.buffersize)
+            try:
+                # Live engines in this process select their own servers meanwhile
+                with on_server(server):
+                    server.boot()
+
+                    # Feed the input from a table instead of the microphone
+                    source_table = DataTable(size=samples.size)
+                    np.asarray(source_table.getBuffer())[:] = samples
+                    player = TableRead(source_table, freq=source_table.getRate(), loop=0).play()
+
+                    processor = AudioProcessor(profile=self.profile, pitch_mode=self.pitch_mode)
+                    processor.server = server
+                    output = processor.build_chain(player)
+                    processor.is_initialized = True
+                    if settings:
+                        processor.apply_settings(settings)
+
+                    # Capture the output into a table we can read back without touching disk
+                    result_table = NewTable(length=duration, chnls=1)
+                    recorder = TableRec(output, result_table).play()
+
+                server.recordOptions(dur=duration, filename=scratch_path)
+                start = time.perf_counter()
+                server.start()  # Blocks until the offline render has finished
+                elapsed = time.perf_counter() - start
+
+                result = np.array(result_table.getBuffer(), dtype=np.float32)[:total]
+                del recorder, processor, player
+            finally:
+                server.shutdown()
+                os.remove(scratch_path)
+
+        speedup = duration / elapsed if elapsed > 0 else float("inf")
+        logger.info(f"Rendered {duration:.2f}s offline in {elapsed:.3f}s ({speedup:.1f}x realtime)")
+        return result, sr
+
+    def render_file(self, input_path, settings=None, output_path=None):
+        """Process a WAV file, optionally writing the result to output_path"""
+        samples, sr = read_wav(input_path)
+        result, sr = self.render(samples, sr, settings)
+        if output_path:
+            write_wav(output_path, result, sr)
+        return result, sr
@@ -0,0 +1,148 @@
+import asyncio
+import threading
+import time
+import logging
+from engine_pool import EnginePool
+from settings_coalescer import SettingsCoalescer
+
+logger = logging.getLogger("session_manager")
+
+class SessionLimitError(Exception):
+    """Raised when the server is already hosting the maximum number of sessions"""
+
+
+class Session:
+    """State owned by a single WebSocket connection"""
+
+    def __init__(self, session_id, audio_processor, settings_interval=0.01):
+        self.session_id = session_id
+        self.audio_processor = audio_processor
+        self.settings_coalescer = SettingsCoalescer(self._apply_settings, settings_interval)
+        self.created_at = time.time()
+        # Last settings received from the client, kept for diagnostics
+        self.settings = {}
+        # Audio transport negotiated with the client (JSON/base64 until upgraded)
+        self.binary_audio = False
+        self.sample_format = None
+        self._next_stream_id = 1
+        # Microphone audio streamed up by the client (NetworkAudioStream), if any
+        self.network_audio = None
+        # Engine CPU time of network audio streams that have already ended
+        self.ended_streams_cpu_seconds = 0.0
+        # Background work (e.g. TTS) cancelled when the connection goes away
+        self.tasks = set()
+
+    def new_stream_id(self):
+        """Allocate an id for a new outgoing audio stream"""
+        stream_id = self._next_stream_id
+        self._next_stream_id = (self._next_stream_id + 1) % 2**32 or 1
+        return stream_id
+
+    def _apply_settings(self, changed):
+        """Hand a coalesced batch of changed settings to the engine"""
+        self.audio_processor.apply_settings(changed)
+        logger.debug(f"Applied settings for session {self.session_id}: {changed}")
+
+    def end_network_audio(self):
+        """Detach the network audio stream, returning it (or None) for the caller to stop"""
+        stream, self.network_audio = self.network_audio, None
+        if stream is not None:
+            self.ended_streams_cpu_seconds += stream.cpu_seconds
+        return stream
+
+    def cpu_seconds(self):
+        """CPU time spent on this session's settings updates and streamed audio blocks
+
+        Engines driven by a sound card run in the audio server's own thread
+        and are not included.
+        """
+        stream = self.network_audio.cpu_seconds if self.network_audio is not None else 0.0
+        return self.settings_coalescer.cpu_seconds + self.ended_streams_cpu_seconds + stream
+
+    def start_task(self, coro):
+        """Run a coroutine in the background, tied to this session's lifetime"""
+        task = asyncio.ensure_future(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    def cancel_tasks(self):
+        """Cancel every background task still running for this session"""
+        for task in list(self.tasks):
+            task.cancel()
+
+
+class SessionManager:
+    """Gives every connection its own isolated effect chain"""
+
+    def __init__(self, engine_pool=None, max_sessions=0, settings_interval=0.01):
+        # Without a configured pool every session boots its own engine
+        self.engine_pool = engine_pool or EnginePool(pool_size=0, min_idle=0, max_idle=0)
+        self.max_sessions = max_sessions  # 0 = unlimited
+        self.settings_interval = settings_interval
+        self.sessions = {}
+        # Coalescer counters of sessions that have already closed
+        self.closed_settings_stats = {}
+        self._lock = threading.Lock()
+
+    def create_session(self, session_id):
+        """Create a session around an engine checked out from the pool"""
+        with self._lock:
+            if session_id in self.sessions:
+                return self.sessions[session_id]
+            if self.max_sessions and len(self.sessions) >= self.max_sessions:
+                raise SessionLimitError(f"Session limit reached ({self.max_sessions})")
+            # Reserve the slot before the (possibly slow) checkout
+            self.sessions[session_id] = None
+
+        try:
+            session = Session(session_id, self.engine_pool.checkout(), self.settings_interval)
+        except Exception:
+            with self._lock:
+                self.sessions.pop(session_id, None)
+            raise
+
+        with self._lock:
+            self.sessions[session_id] = session
+        logger.info(f"Session {session_id} created ({len(self.sessions)} active)")
+        return session
+
+    def get_session(self, session_id):
+        """Return the session for a connection, or None"""
+        return self.sessions.get(session_id)
+
+    def close_session(self, session_id):
+        """Close one session without touching any other connection's chain"""
+        with self._lock:
+            session = self.sessions.pop(session_id, None)
+
+        if session is None:
+            return
+        session.settings_coalescer.close()
+        with self._lock:
+            for name, value in session.settings_coalescer.stats().items():
+                self.closed_settings_stats[name] = self.closed_settings_stats.get(name, 0) + value
+        # Hand the engine back for reuse instead of shutting it down
+        self.engine_pool.checkin(session.audio_processor)
+        logger.info(f"Session {session_id} closed ({len(self.sessions)} active)")
+
+    def close_all(self):
+        """Close every session, e.g. on server shutdown"""
+        with self._lock:
+            session_ids = list(self.sessions)
+        for session_id in session_ids:
+            self.close_session(session_id)
+        self.engine_pool.shutdown()
+
+    def settings_stats(self):
+        """Sum settings coalescing counters over open and closed sessions"""
+        with self._lock:
+            totals = dict(self.closed_settings_stats)
+            sessions = [session for session in self.sessions.values() if session is not None]
+        for session in sessions:
+            for name, value in session.settings_coalescer.stats().items():
+                totals[name] = totals.get(name, 0) + value
+        return totals
+
+    def __len__(self):
+        return len(self.sessions)
@@ -0,0 +1,86 @@
+import asyncio
+import time
+import logging
+from audio_engines import NEUTRAL_SETTINGS, normalize_settings
+from metrics import Histogram
+
+logger = logging.getLogger("settings_coalescer")
+
+SETTINGS_APPLY_SECONDS = Histogram(
+    "voice_mod_settings_apply_seconds",
+    "Time from the first coalesced modulator update until it was handed to the engine")
+
+class SettingsCoalescer:
+    """Coalesces bursty modulator updates for one session
+
+    Every received message is merged into a pending dict (latest value
+    wins). Once per interval the pending values are diffed against what the
+    engine already has and only the parameters that actually changed are
+    handed to apply, as a single batch. apply runs on the event loop, so it
+    must only queue the batch (engines' apply_settings never waits for the
+    audio thread or a server reboot; remote engines send one message).
+    """
+
+    def __init__(self, apply, interval=0.01, applied=None):
+        self.apply = apply
+        self.interval = interval
+        # The engine starts neutral when it is checked out of the pool
+        self.applied = dict(NEUTRAL_SETTINGS if applied is None else applied)
+        self.pending = {}
+        self._handle = None
+        self._pending_since = None
+
+        # Metrics
+        self.received = 0
+        self.flushes = 0
+        self.unchanged = 0
+        self.parameters_applied = 0
+        # CPU time of this thread spent applying batches
+        self.cpu_seconds = 0.0
+
+    def submit(self, settings):
+        """Record an update; must be called from the event loop"""
+        self.received += 1
+        self.pending.update(normalize_settings(settings))
+        if self._handle is None:
+            loop = asyncio.get_running_loop()
+            self._pending_since = time.perf_counter()
+            if self.interval > 0:
+                self._handle = loop.call_later(self.interval, self.flush)
+            else:
+                self._handle = loop.call_soon(self.flush)
+
+    def flush(self):
+        """Apply the parameters that differ from the current engine state"""
+        self._handle = None
+        pending, self.pending = self.pending, {}
+        changed = {name: value for name, value in pending.items() if self.applied.get(name) != value}
+        if not changed:
+            self.unchanged += 1
+            return None
+
+        cpu = time.thread_time()
+        self.apply(changed)
+        self.cpu_seconds += time.thread_time() - cpu
+        if self._pending_since is not None:
+            SETTINGS_APPLY_SECONDS.observe(time.perf_counter() - self._pending_since)
+        self.applied.update(changed)
+        self.flushes += 1
+        self.parameters_applied += len(changed)
+        return changed
+
+    def close(self):
+        """Drop any pending update without applying it"""
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        self.pending = {}
+
+    def stats(self):
+        """Return coalescing counters as a JSON-serializable dict"""
+        return {
+            "received": self.received,
+            "applied": self.flushes,
+            "unchanged": self.unchanged,
+            "parameters_applied": self.parameters_applied
+        }
@@ -0,0 +1,152 @@
+import numpy as np
+from multiprocessing import shared_memory
+
+# Header fields (int64). Each one is written by a single side only.
+WRITE_INDEX = 0   # producer: blocks committed so far
+READ_INDEX = 1    # consumer: blocks released so far
+OVERRUNS = 2      # producer: blocks dropped because the ring was full
+UNDERRUNS = 3     # consumer: blocks that were due but had not arrived
+BLOCK_SIZE = 4
+CAPACITY = 5
+BUSY_NS = 6       # producer: CPU nanoseconds spent producing the blocks (e.g. DSP)
+HEADER_FIELDS = 8
+
+class SharedRingBuffer:
+    """Lock-free single-producer/single-consumer ring of PCM blocks in shared memory
+
+    The ring holds capacity float32 blocks of block_size samples. Both
+    processes map the same memory and get NumPy views straight into the
+    slots, so audio never goes through a pipe or pickle. Indices only ever
+    grow; the producer alone writes the write index and the consumer alone
+    writes the read index, and each side publishes its index only after it
+    is done with the slot, so no lock is needed.
+
+    Passing the ring to another process (e.g. over a Pipe) pickles just its
+    name; the receiving side attaches to the existing memory. The creating
+    side owns the memory and must unlink() it.
+    """
+
+    def __init__(self, block_size=256, capacity=32, name=None):
+        if name is None:
+            size = HEADER_FIELDS * 8 + capacity * block_size * 4
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+            self.owner = True
+        else:
+            self.shm = _attach(name)
+            self.owner = False
+
+        self.header = np.ndarray((HEADER_FIELDS,), dtype=np.int64, buffer=self.shm.buf)
+        if self.owner:
+            self.header[:] = 0
+            self.header[BLOCK_SIZE] = block_size
+            self.header[CAPACITY] = capacity
+        self.block_size = int(self.header[BLOCK_SIZE])
+        self.capacity = int(self.header[CAPACITY])
+        self.slots = np.ndarray((self.capacity, self.block_size), dtype=np.float32,
+                                buffer=self.shm.buf, offset=HEADER_FIELDS * 8)
+
+    @property
+    def busy_ns(self):
+        return int(self.header[BUSY_NS])
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def __reduce__(self):
+        # Other processes attach by name instead of copying the buffer
+        return (SharedRingBuffer, (None, None, self.shm.name))
+
+    def __len__(self):
+        """Blocks written but not read yet"""
+        return int(self.header[WRITE_INDEX] - self.header[READ_INDEX])
+
+    # Producer side
+
+    def write_slot(self):
+        """View of the next free slot to fill in place, or None (counted as an overrun) if full"""
+        index = self.header[WRITE_INDEX]
+        if index - self.header[READ_INDEX] >= self.capacity:
+            self.header[OVERRUNS] += 1
+            return None
+        return self.slots[index % self.capacity]
+
+    def commit(self):
+        """Publish the slot returned by write_slot()"""
+        self.header[WRITE_INDEX] += 1
+
+    def add_busy_time(self, nanoseconds):
+        """Account CPU time spent producing blocks, for the consumer to read"""
+        self.header[BUSY_NS] += nanoseconds
+
+    def write(self, block):
+        """Copy one block into the ring; returns False if it was dropped"""
+        slot = self.write_slot()
+        if slot is None:
+            return False
+        slot[:] = block
+        self.commit()
+        return True
+
+    # Consumer side
+
+    def read_slot(self, required=True):
+        """View of the oldest unread slot, or None if the ring is empty
+
+        required says a block was due (e.g. the audio clock needs one), so
+        an empty ring is counted as an underrun; pollers pass False.
+        """
+        index = self.header[READ_INDEX]
+        if index >= self.header[WRITE_INDEX]:
+            if required:
+                self.header[UNDERRUNS] += 1
+            return None
+        return self.slots[index % self.capacity]
+
+    def release(self):
+        """Hand the slot returned by read_slot() back to the producer"""
+        self.header[READ_INDEX] += 1
+
+    def read(self, out, required=True):
+        """Copy the oldest block into out, or fill it with silence; returns False on underrun"""
+        slot = self.read_slot(required)
+        if slot is None:
+            out[:] = 0
+            return False
+        out[:] = slot
+        self.release()
+        return True
+
+    def stats(self):
+        """Return ring counters as a JSON-serializable dict"""
+        return {
+            "block_size": self.block_size,
+            "capacity": self.capacity,
+            "queued": len(self),
+            "written": int(self.header[WRITE_INDEX]),
+            "read": int(self.header[READ_INDEX]),
+            "overruns": int(self.header[OVERRUNS]),
+            "underruns": int(self.header[UNDERRUNS]),
+            "busy_ns": int(self.header[BUSY_NS])
+        }
+
+    def close(self):
+        """Drop this process's mapping; views into the ring must not be used afterwards"""
+        self.header = self.slots = None
+        self.shm.close()
+
+    def unlink(self):
+        """Free the shared memory (owner only, once every side has closed it)"""
+        if self.owner:
+            self.shm.unlink()
+
+
+def _attach(name):
+    """Map an existing segment without giving it to this process's resource tracker"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13 attaching always registers the segment. Worker
+        # processes share the tracker of the process that created it, where
+        # it is already registered, so that is harmless there.
+        return shared_memory.SharedMemory(name=name)
@@ -0,0 +1,16 @@
+import pytest
+
+from audio_engines import normalize_settings
+
+
+def test_settings_are_clamped():
+    assert normalize_settings({"pitch": 240, "speed": 0.0, "echo": "0.5", "volume": 3}) == \
+        {"pitch": 24.0, "speed": 0.25, "echo": 0.5}
+    assert normalize_settings({"pitch": -1e308})["pitch"] == -24.0
+
+
+@pytest.mark.parametrize("value", [float("inf"), float("-inf"), float("nan"), "nan", "inf"])
+@pytest.mark.parametrize("name", ["pitch", "speed", "reverb", "echo", "distortion"])
+def test_non_finite_values_are_rejected(name, value):
+    with pytest.raises(ValueError):
+        normalize_settings({name: value})
@@ -0,0 +1,122 @@
+import multiprocessing
+
+import numpy as np
+import pytest
+
+pytest.importorskip("pyo")
+
+
+def _speed_stage_lifecycle():
+    from enhanced_audio_processor import AudioProcessor
+
+    processor = AudioProcessor(profile="balanced", audio_input="network", stage_idle_time=0.05)
+    processor.initialize()
+    block = (0.1 * np.sin(np.arange(processor.profile.buffer_size) / 5)).astype(np.float32)
+
+    processor.apply_settings({"speed": 0.8})
+    for _ in range(50):
+        processor.process_block(block)
+    assert processor.get_stage_states()["speed"]["allocated"]
+
+    # Back to neutral: the stage is released from the server callback once idle
+    processor.apply_settings({"speed": 1.0})
+    for _ in range(100):
+        processor.process_block(block)
+    assert not processor.get_stage_states()["speed"]["allocated"]
+
+    processor.apply_settings({"speed": 0.8})
+    for _ in range(50):
+        output = processor.process_block(block)
+    # Reboots the server under a live speed stage and an outstanding output view
+    processor.set_profile("ultra-low-latency")
+    assert np.isfinite(output).all()
+
+    block = np.resize(block, processor.profile.buffer_size)
+    for _ in range(50):
+        processor.process_block(block)
+    assert processor.get_stage_states()["speed"]["allocated"]
+    processor.cleanup()
+
+
+def test_speed_stage_release_and_profile_switch():
+    # A use-after-free kills the interpreter, so run the scenario in its own process
+    process = multiprocessing.get_context("spawn").Process(target=_speed_stage_lifecycle)
+    process.start()
+    process.join(120)
+    assert process.exitcode == 0
+
+
+
+def _harmonic_fraction(samples, sr, fundamental):
+    """Share of the energy above 100 Hz that lies within 8 Hz of a harmonic of fundamental"""
+    power = np.abs(np.fft.rfft(samples * np.hanning(samples.size))) ** 2
+    frequencies = np.fft.rfftfreq(samples.size, 1 / sr)
+    audible = frequencies > 100
+    offset = np.abs(frequencies / fundamental - np.round(frequencies / fundamental)) * fundamental
+    return power[audible & (offset < 8)].sum() / power[audible].sum()
+
+
+def test_psola_pitch_mode_transposes():
+    from enhanced_audio_processor import AudioProcessor
+
+    processor = AudioProcessor(profile="balanced", audio_input="network", pitch_mode="psola")
+    processor.initialize()
+    try:
+        sr, bs = processor.profile.sample_rate, processor.profile.buffer_size
+        t = np.arange(sr) / sr
+        voice = sum(np.sin(2 * np.pi * 150 * k * t) / k for k in range(1, 15)).astype(np.float32) * 0.3
+        processor.apply_settings({"pitch": 7})
+        output = np.concatenate([processor.process_block(voice[i:i + bs]).copy()
+                                 for i in range(0, sr - bs + 1, bs)])
+    finally:
+        processor.cleanup()
+    # Tonal input stays tonal, at the shifted pitch (a delay-line shifter smears it)
+    assert _harmonic_fraction(output[sr // 2:sr // 2 + 16384], sr, 150 * 2 ** (7 / 12)) > 0.9
+
+
+def test_stages_are_created_on_their_own_server():
+    from enhanced_audio_processor import AudioProcessor
+    from offline_renderer import OfflineRenderer
+
+    first = AudioProcessor(profile="balanced", audio_input="network")
+    first.initialize()
+    # Newer servers: another pooled engine and a finished offline render
+    second = AudioProcessor(profile="balanced", audio_input="network")
+    second.initialize()
+    try:
+        block = (0.8 * np.sin(np.arange(first.profile.buffer_size) / 5)).astype(np.float32)
+        first.apply_settings({"distortion": 0.5})
+        for _ in range(20):
+            output = first.process_block(block)
+        assert np.sqrt(np.mean(output ** 2)) > 0.1
+
+        OfflineRenderer().render(np.zeros(4410, dtype=np.float32), 44100, {"echo": 0.3})
+        first.apply_settings({"echo": 0.5})
+        for _ in range(20):
+            output = first.process_block(block)
+        assert first.get_stage_states()["echo"]["allocated"]
+        assert np.sqrt(np.mean(output ** 2)) > 0.1
+    finally:
+        second.cleanup()
+        first.cleanup()
+
+
+def test_reported_latency_matches_late_stage():
+    from enhanced_audio_processor import AudioProcessor
+
+    processor = AudioProcessor(profile="balanced", audio_input="network")
+    processor.initialize()
+    try:
+        bs, sr = processor.profile.buffer_size, processor.profile.sample_rate
+        silence = np.zeros(bs, dtype=np.float32)
+        processor.apply_settings({"distortion": 0.2})
+        for _ in range(20):
+            processor.process_block(silence)
+        impulse = silence.copy()
+        impulse[10] = 0.5
+        output = np.concatenate([processor.process_block(impulse).copy()]
+                                + [processor.process_block(silence).copy() for _ in range(3)])
+        measured_ms = (np.argmax(np.abs(output)) - 10) * 1000.0 / sr
+        assert processor.get_latency()["graph_latency_ms"] == pytest.approx(measured_ms)
+    finally:
+        processor.cleanup()
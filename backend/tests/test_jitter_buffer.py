@@ -0,0 +1,68 @@
+import numpy as np
+
+from jitter_buffer import CROSSFADE_SAMPLES, JitterBuffer
+
+BLOCK = 64
+RATE = 44100
+
+
+def packet(sequence):
+    """A block of distinct, recognizable samples"""
+    return (sequence * BLOCK + np.arange(BLOCK, dtype=np.float32)) / 1000.0
+
+
+def push(buffer, *sequences):
+    for sequence in sequences:
+        buffer.push(sequence, packet(sequence), arrival=sequence * BLOCK / RATE)
+
+
+def test_dry_pop_on_block_boundary():
+    buffer = JitterBuffer(BLOCK, 2 * BLOCK, RATE)
+    push(buffer, 0, 1)
+    out = np.empty(BLOCK, dtype=np.float32)
+    assert buffer.pop(out)
+    assert buffer.pop(out)
+    np.testing.assert_array_equal(out, packet(1))
+    assert buffer.depth == 0
+
+    # Nothing left at all: concealed, not an error
+    assert not buffer.pop(out)
+    assert np.isfinite(out).all()
+    assert buffer.underruns == 1
+    assert not buffer.playing
+
+
+def test_partial_underrun():
+    buffer = JitterBuffer(BLOCK, 2 * BLOCK, RATE)
+    push(buffer, 0, 1, 2)
+    target = buffer.target_depth
+    out = np.empty(2 * BLOCK, dtype=np.float32)
+    assert buffer.pop(out)
+
+    assert not buffer.pop(out)
+    # What was buffered plays, only the rest is concealed
+    np.testing.assert_array_equal(out[:BLOCK], packet(2))
+    assert np.isfinite(out[BLOCK:]).all()
+    assert buffer.depth == 0
+    assert buffer.underruns == 1
+    assert buffer.target_depth > target
+
+
+def test_late_packets_are_dropped():
+    buffer = JitterBuffer(BLOCK, 2 * BLOCK, RATE)
+    push(buffer, 0, 1)
+    push(buffer, 1)
+    assert buffer.late == 1
+
+    # Packet 2 never arrives in time: playout gives up on it when 3 is waiting
+    push(buffer, 3)
+    out = np.empty(BLOCK, dtype=np.float32)
+    for _ in range(3):
+        buffer.pop(out)
+    assert buffer.lost == 1
+
+    push(buffer, 2)
+    assert buffer.late == 2
+    # The concealed gap is followed by packet 3, crossfaded in; the late packet is not played
+    assert buffer.pop(out)
+    np.testing.assert_array_equal(out[CROSSFADE_SAMPLES:], packet(3)[CROSSFADE_SAMPLES:])
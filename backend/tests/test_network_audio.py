@@ -0,0 +1,81 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import binary_protocol
+from network_audio import NetworkAudioStream
+
+RATE = 8000
+BLOCK = 80
+PERIOD = BLOCK / RATE
+
+
+class FakeEngine:
+    """Passes blocks through, recording the thread that ran each one"""
+
+    def __init__(self):
+        self.threads = []
+
+    def get_latency(self):
+        return {"sample_rate": RATE, "buffer_size": BLOCK}
+
+    def set_audio_input(self, source):
+        pass
+
+    def process_block(self, block):
+        self.threads.append(threading.current_thread().name)
+        return block
+
+
+def run_stream(scenario):
+    async def main():
+        frames = []
+
+        async def send(frame):
+            frames.append(binary_protocol.unpack_frame(frame))
+
+        engine = FakeEngine()
+        stream = NetworkAudioStream(engine, send, 1, binary_protocol.FORMAT_FLOAT32, latency_ms=20)
+        await stream.start()
+        await scenario(stream)
+        stats = stream.stats()
+        await stream.stop()
+        return engine, frames, stats
+
+    return asyncio.run(main())
+
+
+def test_blocks_do_not_queue_behind_the_default_executor():
+    async def scenario(stream):
+        loop = asyncio.get_running_loop()
+        release = threading.Event()
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=1))
+        busy = loop.run_in_executor(None, release.wait)
+        await asyncio.sleep(20 * PERIOD)
+        release.set()
+        await busy
+
+    engine, frames, stats = run_stream(scenario)
+    assert stats["resyncs"] == 0
+    assert stats["blocks"] >= 15
+    assert all(name.startswith("network-audio") for name in engine.threads)
+
+
+def test_late_tick_takes_every_due_block():
+    async def scenario(stream):
+        await asyncio.sleep(5 * PERIOD)
+        # Stall the event loop for several block periods
+        time.sleep(4.5 * PERIOD)
+        await asyncio.sleep(5 * PERIOD)
+
+    engine, frames, stats = run_stream(scenario)
+    assert stats["resyncs"] == 0
+    # The stalled blocks went out in one tick, not one late tick each
+    assert stats["late_ticks"] <= 2
+    assert stats["blocks"] >= 12
+    sequences = [frame.sequence for frame in frames]
+    assert sequences == list(range(len(frames)))
+    assert all(frame.payload and np.frombuffer(frame.payload, np.float32).size == BLOCK for frame in frames)
@@ -0,0 +1,19 @@
+import time
+
+import numpy as np
+
+from time_domain_pitch import MAX_FACTOR, PsolaPitchShifter
+
+
+def test_extreme_factors_are_clamped():
+    shifter = PsolaPitchShifter(44100, 256)
+    block = np.sin(np.arange(256) / 5).astype(np.float32)
+    out = np.empty_like(block)
+    for factor in (2 ** 20, float("inf"), 2 ** -20, 0.0):
+        shifter.set_factor(factor)
+        assert 1 / MAX_FACTOR <= shifter.factor <= MAX_FACTOR
+        start = time.perf_counter()
+        for _ in range(20):
+            shifter.process(block, out)
+        assert time.perf_counter() - start < 1.0
+        assert np.isfinite(out).all()
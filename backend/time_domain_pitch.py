@@ -0,0 +1,138 @@
+import numpy as np
+
+# Largest transposition either way; grains are period / factor apart, so
+# this also bounds the grains overlap-added per block
+MAX_FACTOR = 4.0
+
+class PsolaPitchShifter:
+    """Streaming time-domain pitch shifter (pitch-synchronous overlap-add)
+
+    The pitch period T of the input is tracked by autocorrelation. Output
+    grains are Hann-windowed slices of the input, two periods long, centred
+    on implicit pitch marks spaced exactly T apart, so consecutive grains are
+    in phase. They are overlap-added at the shifted period T / factor,
+    repeating grains to raise the pitch and skipping grains to lower it.
+
+    Latency is about two pitch periods instead of a whole FFT frame, and a
+    block costs one small autocorrelation plus a few vector adds.
+    """
+
+    def __init__(self, sr=44100, block_size=256, min_frequency=100.0, max_frequency=500.0,
+                 analysis_interval=512):
+        self.sr = sr
+        self.block_size = block_size
+        self.factor = 1.0
+        self.min_lag = int(sr / max_frequency)
+        self.max_lag = int(sr / min_frequency)
+        # Unvoiced input still needs grains; use a typical voice period
+        self.default_period = sr / 150.0
+        self.period = self.default_period
+        self.analysis_interval = analysis_interval
+        self.voicing_threshold = 0.3
+
+        # Input history, newest sample last; holds the autocorrelation window
+        # and every grain that can still be picked
+        self.history = np.zeros(4 * self.max_lag + block_size, dtype=np.float32)
+        # Overlap-add accumulator, first sample is the next output sample
+        self.accum = np.zeros(2 * self.max_lag + 2 * block_size, dtype=np.float32)
+
+        # Pitch detection on a 2x decimated window of two maximum periods
+        self.window_size = 2 * self.max_lag
+        self.fft_size = 1 << int(np.ceil(np.log2(self.window_size)))
+        self._windows = {}
+        self.reset()
+
+    @property
+    def latency(self):
+        """Current delay of a grain centre behind the input, in samples"""
+        return int(2 * self.period)
+
+    def set_factor(self, factor):
+        """Set the transposition ratio, clamped to MAX_FACTOR either way"""
+        self.factor = min(max(float(factor), 1.0 / MAX_FACTOR), MAX_FACTOR)
+
+    def reset(self):
+        """Forget all input history and pending output"""
+        self.history.fill(0)
+        self.accum.fill(0)
+        self.period = self.default_period
+        self.since_analysis = self.analysis_interval
+        # Output time of the next synthesis mark and input time of the last
+        # grain centre, both relative to the current block start
+        self.next_mark = 0.0
+        self.last_centre = -float(self.default_period)
+
+    def _window(self, half):
+        window = self._windows.get(half)
+        if window is None:
+            window = self._windows[half] = np.hanning(2 * half + 2)[1:-1].astype(np.float32)
+        return window
+
+    def _estimate_period(self):
+        """Normalized autocorrelation peak of the latest input, decimated by two"""
+        segment = self.history[-self.window_size:]
+        decimated = segment[0::2] + segment[1::2]
+        decimated = decimated - decimated.mean()
+        energy = np.dot(decimated, decimated)
+        if energy < 1e-6:
+            self.period = self.default_period
+            return
+
+        spectrum = np.fft.rfft(decimated, self.fft_size)
+        correlation = np.fft.irfft(spectrum.real ** 2 + spectrum.imag ** 2, self.fft_size)
+        low, high = self.min_lag // 2, self.max_lag // 2
+        lags = correlation[low:high]
+        peak = int(np.argmax(lags))
+        if lags[peak] < self.voicing_threshold * correlation[0]:
+            self.period = self.default_period
+            return
+
+        # Parabolic interpolation around the peak, back to the full sample rate
+        lag = float(low + peak)
+        if 0 < peak < lags.size - 1:
+            a, b, c = lags[peak - 1], lags[peak], lags[peak + 1]
+            denominator = a - 2 * b + c
+            if denominator != 0:
+                lag += 0.5 * (a - c) / denominator
+        self.period = 2 * lag
+
+    def process(self, block, out):
+        n = block.size
+        self.history[:-n] = self.history[n:]
+        self.history[-n:] = block
+        end = self.history.size
+
+        self.since_analysis += n
+        if self.since_analysis >= self.analysis_interval:
+            self.since_analysis = 0
+            self._estimate_period()
+
+        period = self.period
+        h = int(period)
+        spacing = period / self.factor
+        # Overlapping Hann windows sum to period / spacing; shifting down
+        # leaves gaps between grains instead, which is what lowers the pitch
+        gain = min(1.0, spacing / period)
+
+        # Times are relative to the start of this block; the newest input
+        # sample is at n - 1 and the next output sample is at 0
+        self.last_centre -= n
+        while self.next_mark - h < n:
+            # Latest grain centre in phase with the previous one whose grain is complete
+            steps = np.floor((n - h - self.last_centre) / period)
+            centre = self.last_centre + max(steps, 0) * period
+            centre = min(centre, n - h)
+            self.last_centre = centre
+
+            source = end - n + int(round(centre))
+            target = int(round(self.next_mark))
+            if target - h >= 0:
+                grain = self.history[source - h:source + h] * self._window(h)
+                grain *= gain
+                self.accum[target - h:target + h] += grain
+            self.next_mark += spacing
+
+        out[:] = self.accum[:n]
+        self.accum[:-n] = self.accum[n:]
+        self.accum[-n:] = 0
+        self.next_mark -= n
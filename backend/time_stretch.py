@@ -0,0 +1,157 @@
+import numpy as np
+
+class WsolaTimeStretcher:
+    """Streaming WSOLA time-scale modification (speed changes without pitch changes)
+
+    Hann frames of frame_ms are overlap-added every half frame. The next
+    analysis frame nominally advances by speed times the synthesis hop; within
+    +/- tolerance_ms the position whose content best continues the previous
+    frame (highest cross-correlation with its natural continuation) is used,
+    which keeps the waveform coherent.
+
+    Offline (live=False) all input is available up front and the output is
+    simply len(input) / speed long. Live input arrives in real time, so the
+    stretcher cannot run ahead of it: slowing down (speed < 1) builds a
+    backlog that is capped at max_backlog seconds, after which the stage plays
+    at 1.0 and holds that delay; speeding up (speed > 1) only drains the
+    backlog and falls back to 1.0 once it is empty. Memory is bounded by the
+    backlog cap either way.
+    """
+
+    def __init__(self, sr=44100, frame_ms=20.0, tolerance_ms=5.0, max_backlog=1.0, live=True, block_size=256):
+        self.sr = sr
+        self.live = live
+        self.speed = 1.0
+        self.hop = int(sr * frame_ms / 2000)
+        self.frame = 2 * self.hop
+        self.tolerance = int(sr * tolerance_ms / 1000)
+        self.max_backlog = int(max_backlog * sr)
+
+        # Periodic Hann frames at 50% overlap sum to one
+        self.window = (0.5 - 0.5 * np.cos(2 * np.pi * np.arange(self.frame) / self.frame)).astype(np.float32)
+        self.lookahead = self.frame + self.tolerance
+        self.buffer = np.zeros(self.max_backlog + 4 * self.lookahead + 2 * block_size, dtype=np.float32)
+        self.accum = np.zeros(self.frame, dtype=np.float32)
+        self.ready = np.zeros(self.hop + 2 * block_size, dtype=np.float32)
+        self.reset()
+
+    @property
+    def latency(self):
+        """Lookahead plus the current live backlog, in samples"""
+        return self.lookahead + self.backlog
+
+    @property
+    def backlog(self):
+        """Input samples buffered beyond what the next frame needs"""
+        return max(0, self.fill - int(self.position) - self.lookahead)
+
+    def set_speed(self, speed):
+        self.speed = float(speed)
+
+    def reset(self):
+        """Drop all buffered input and output"""
+        self.buffer.fill(0)
+        self.accum.fill(0)
+        # Start with a silent lookahead so the first frame is available at once
+        self.fill = self.lookahead
+        self.position = float(self.tolerance)
+        self.previous = self.tolerance - self.hop
+        self.ready_count = 0
+
+    def _append(self, samples):
+        n = samples.size
+        self._trim(n)
+        if self.fill + n > self.buffer.size:
+            # Cannot happen with the backlog cap; drop the oldest input rather than grow
+            self._discard(self.fill + n - self.buffer.size)
+        self.buffer[self.fill:self.fill + n] = samples
+        self.fill += n
+
+    def _trim(self, incoming):
+        """Forget input that no frame can reach any more"""
+        keep = min(int(self.position) - self.tolerance, self.previous + self.hop)
+        if keep > 0 and (keep > self.buffer.size // 2 or self.fill + incoming > self.buffer.size):
+            self._discard(keep)
+
+    def _discard(self, count):
+        self.buffer[:self.fill - count] = self.buffer[count:self.fill]
+        self.fill -= count
+        self.position -= count
+        self.previous -= count
+
+    def _best_offset(self, nominal):
+        """Frame start within tolerance of nominal that best continues the previous frame"""
+        low = max(nominal - self.tolerance, 0)
+        high = nominal + self.tolerance
+        natural = self.previous + self.hop
+        if natural < 0:
+            return nominal
+        template = self.buffer[natural:natural + self.hop]
+
+        # Coarse search on every 4th sample, then refine around the winner
+        region = self.buffer[low:high + self.hop]
+        coarse = np.correlate(region[::4], template[::4], mode="valid")
+        best = low + 4 * int(np.argmax(coarse))
+        candidates = range(max(best - 3, low), min(best + 4, high + 1))
+        scores = [np.dot(self.buffer[c:c + self.hop], template) for c in candidates]
+        return candidates[int(np.argmax(scores))]
+
+    def _synthesize_frame(self):
+        start = self._best_offset(int(round(self.position)))
+        self.accum += self.buffer[start:start + self.frame] * self.window
+        self.ready[self.ready_count:self.ready_count + self.hop] = self.accum[:self.hop]
+        self.ready_count += self.hop
+        self.accum[:self.hop] = self.accum[self.hop:]
+        self.accum[self.hop:] = 0
+        self.previous = start
+
+        step = self.hop * self.speed
+        if self.live and self.speed < 1 and self.backlog >= self.max_backlog:
+            # Backlog is full: hold the delay instead of slowing down further
+            step = self.hop
+        self.position += step
+
+    def process(self, block, out):
+        """Live streaming: one block in, one block out"""
+        n = block.size
+        self._append(block)
+        while self.ready_count < n:
+            if int(self.position) + self.lookahead > self.fill:
+                # Ran out of input while speeding up: continue from the newest frame
+                self.position = float(self.fill - self.lookahead)
+            self._synthesize_frame()
+        out[:] = self.ready[:n]
+        self.ready[:self.ready_count - n] = self.ready[n:self.ready_count]
+        self.ready_count -= n
+
+
+def time_stretch(audio, speed, sr=44100, **kwargs):
+    """Offline time-stretch of a whole buffer to round(len(audio) / speed) samples"""
+    audio = np.asarray(audio, dtype=np.float32)
+    if speed == 1.0 or audio.size == 0:
+        return audio.copy()
+
+    stretcher = WsolaTimeStretcher(sr, live=False, max_backlog=0, **kwargs)
+    stretcher.set_speed(speed)
+    # Room for the whole input plus silent lookahead on both sides
+    stretcher.buffer = np.zeros(audio.size + 2 * stretcher.lookahead + stretcher.hop, dtype=np.float32)
+    stretcher.reset()
+    stretcher.buffer[stretcher.fill:stretcher.fill + audio.size] = audio
+    stretcher.fill += audio.size + stretcher.lookahead
+    # Centre the first frame on the first input sample
+    stretcher.position = float(stretcher.lookahead - stretcher.hop)
+    stretcher.previous = int(stretcher.position) - stretcher.hop
+
+    length = int(round(audio.size / speed))
+    pieces = []
+    produced = 0
+    while produced < length + stretcher.tolerance and int(stretcher.position) + stretcher.lookahead <= stretcher.fill:
+        stretcher._synthesize_frame()
+        pieces.append(stretcher.ready[:stretcher.ready_count].copy())
+        produced += stretcher.ready_count
+        stretcher.ready_count = 0
+    result = np.concatenate(pieces) if pieces else np.zeros(0, dtype=np.float32)
+    result = result[stretcher.hop:stretcher.hop + length]
+    if result.size < length:
+        result = np.pad(result, (0, length - result.size))
+    return result
@@ -0,0 +1,203 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+import unicodedata
+import logging
+from collections import OrderedDict
+import numpy as np
+
+logger = logging.getLogger("tts_cache")
+
+# Seconds after which the directory is rescanned anyway, to pick up what
+# other processes sharing it wrote or evicted
+DISK_RESCAN_INTERVAL = 60.0
+
+# Eviction goes down to this fraction of the budget, so a full store is not rescanned on every write
+DISK_LOW_WATER = 0.9
+
+def cache_key(text, voice, pitch, speed, volume):
+    """Hash normalized text plus every voice parameter into a cache key"""
+    normalized = unicodedata.normalize("NFC", " ".join(text.split()))
+    payload = json.dumps([
+        normalized,
+        str(voice),
+        round(float(pitch), 4),
+        round(float(speed), 4),
+        round(float(volume), 4)
+    ], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class DiskStore:
+    """Content-addressed on-disk store: one .npz per key, fanned out by key prefix
+
+    Files are written atomically, so several threads and worker processes
+    can share a directory. The total size is tracked as entries are written
+    and only rescanned once it passes max_bytes (or every
+    DISK_RESCAN_INTERVAL seconds, for other processes' writes); the rescan
+    deletes the least recently used files (by mtime, refreshed on every hit)
+    until the store is back under DISK_LOW_WATER of the budget.
+    """
+
+    def __init__(self, directory, max_bytes=512 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.total_bytes = 0
+        self.scanned_at = 0.0
+        self.enforce_budget()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".npz")
+
+    def get(self, key):
+        """Return (samples, sample rate) or None"""
+        path = self._path(key)
+        try:
+            with np.load(path) as data:
+                result = data["samples"], int(data["sample_rate"])
+            os.utime(path)
+            return result
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Discarding unreadable cache entry {key}: {e}")
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+
+    def put(self, key, samples, sample_rate):
+        """Store an entry, returning how many old entries were evicted"""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # A unique temp file per write: threads and processes may store the same key at once
+        fd, temp_path = tempfile.mkstemp(prefix=key + ".", suffix=".tmp", dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, samples=samples, sample_rate=sample_rate)
+            size = os.path.getsize(temp_path)
+            try:
+                replaced = os.path.getsize(path)
+            except OSError:
+                replaced = 0
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+        with self._lock:
+            self.total_bytes += size - replaced
+            fits = (self.total_bytes <= self.max_bytes
+                    and time.monotonic() - self.scanned_at < DISK_RESCAN_INTERVAL)
+        return 0 if fits else self.enforce_budget()
+
+    def enforce_budget(self):
+        """Rescan the directory and, if it is over max_bytes, delete least recently used entries"""
+        with self._lock:
+            return self._enforce_budget()
+
+    def _enforce_budget(self):
+        entries = []
+        total = 0
+        for prefix in os.scandir(self.directory):
+            if not prefix.is_dir():
+                continue
+            for entry in os.scandir(prefix.path):
+                if entry.name.endswith(".npz"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+
+        evicted = 0
+        entries.sort()
+        target = self.max_bytes * DISK_LOW_WATER if total > self.max_bytes else total
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                evicted += 1
+            except OSError:
+                pass
+        self.total_bytes = total
+        self.scanned_at = time.monotonic()
+        return evicted
+
+
+class TTSCache:
+    """Two-tier TTS result cache: in-memory LRU with a byte budget over a DiskStore
+
+    The memory tier lives in the event-loop process. The disk tier is only
+    described here (directory and budget) because it is read and written by
+    the TTS workers, which may be separate processes; they report back which
+    tier served a request so the counters stay in one place.
+    """
+
+    def __init__(self, max_memory_bytes=64 * 1024 * 1024, disk_dir=None, max_disk_bytes=512 * 1024 * 1024):
+        self.max_memory_bytes = max_memory_bytes
+        self.disk_dir = disk_dir or None
+        self.max_disk_bytes = max_disk_bytes
+        self.entries = OrderedDict()
+        self.memory_bytes = 0
+
+        # Metrics
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.memory_evictions = 0
+        self.disk_evictions = 0
+
+    def get(self, key):
+        """Look up the memory tier, returning (samples, sample rate) or None"""
+        result = self.entries.get(key)
+        if result is not None:
+            self.entries.move_to_end(key)
+            self.memory_hits += 1
+        return result
+
+    def put(self, key, samples, sample_rate):
+        """Insert into the memory tier, evicting least recently used entries"""
+        size = samples.nbytes
+        if size > self.max_memory_bytes:
+            return
+        if key in self.entries:
+            self.memory_bytes -= self.entries.pop(key)[0].nbytes
+        # Entries are shared between clients, so nobody may modify them in place
+        samples.setflags(write=False)
+        self.entries[key] = (samples, sample_rate)
+        self.memory_bytes += size
+        while self.memory_bytes > self.max_memory_bytes:
+            _, (evicted, _) = self.entries.popitem(last=False)
+            self.memory_bytes -= evicted.nbytes
+            self.memory_evictions += 1
+
+    def record(self, source, disk_evictions=0):
+        """Count a lookup that missed memory (source is disk or synth)"""
+        if source == "disk":
+            self.disk_hits += 1
+        else:
+            self.misses += 1
+        self.disk_evictions += disk_evictions
+
+    def stats(self):
+        """Return cache metrics as a JSON-serializable dict"""
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "memory_bytes": self.memory_bytes,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            "memory_evictions": self.memory_evictions,
+            "disk_evictions": self.disk_evictions
+        }
@@ -3,11 +3,39 @@ import time
 import threading
 import base64
 import io
+import re
 import logging
+import numpy as np
 from pyo import *
+from audio_io import wav_bytes
+from time_stretch import time_stretch
 
 logger = logging.getLogger("tts_engine")
 
+# Sentence boundaries, then phrase boundaries for sentences that are still too long
+SENTENCE_BREAK = re.compile(r'(?<=[.!?;:])\s+')
+PHRASE_BREAK = re.compile(r'(?<=[,\u2014-])\s+')
+
+def to_base64_wav(samples, sample_rate):
+    """Encode samples as a base64 WAV string for JSON clients"""
+    return base64.b64encode(wav_bytes(samples, sample_rate)).decode('utf-8')
+
+def split_text(text, max_chars=120):
+    """Split text into sentence/phrase segments of at most max_chars characters"""
+    segments = []
+    for sentence in SENTENCE_BREAK.split(text.strip()):
+        pieces = [sentence] if len(sentence) <= max_chars else PHRASE_BREAK.split(sentence)
+        for piece in pieces:
+            # Fall back to whitespace for run-on phrases
+            while len(piece) > max_chars:
+                cut = piece.rfind(' ', 0, max_chars)
+                cut = cut if cut > 0 else max_chars
+                segments.append(piece[:cut].strip())
+                piece = piece[cut:]
+            if piece.strip():
+                segments.append(piece.strip())
+    return segments
+
 class TTSEngine:
     """Text-to-Speech engine with voice customization"""
     
@@ -39,37 +67,51 @@ class TTSEngine:
     def generate_speech(self, text, voice="default", pitch=0, speed=1.0, volume=1.0):
         """Generate speech from text with customized voice settings and return audio data"""
         try:
-            # For this prototype, we'll simulate TTS by generating a simple audio pattern
-            # In a real implementation, you would use a proper TTS engine
-            
-            # Create a mock audio data (base64 encoded WAV)
-            # This is a placeholder - in a real app, this would be actual audio data
-            mock_audio_data = self._generate_mock_audio(text, voice, pitch, speed, volume)
+            result = self.generate_speech_pcm(text, voice, pitch, speed, volume)
+            if result is None:
+                return None
             
-            logger.info(f"Generated speech for text: '{text[:30]}...' with voice: {voice}")
-            return mock_audio_data
+            # Legacy JSON clients receive a base64 encoded WAV
+            samples, sample_rate = result
+            return to_base64_wav(samples, sample_rate)
             
         except Exception as e:
             logger.error(f"Error generating speech: {e}")
             return None
     
-    def _generate_mock_audio(self, text, voice, pitch, speed, volume):
-        """Generate a mock audio file for demonstration purposes"""
+    def generate_speech_pcm(self, text, voice="default", pitch=0, speed=1.0, volume=1.0):
+        """Generate speech and return (float32 samples, sample rate) without any encoding"""
         try:
-            # In a real implementation, this would use an actual TTS engine
-            # For now, we'll just return a base64 encoded placeholder
-            
-            # This is a very small WAV file (1 second of silence)
-            # In a real app, this would be the actual TTS output
-            mock_wav_data = (
-                b'UklGRjIAAABXQVZFZm10IBIAAAABAAEAQB8AAEAfAAABAAgAZGF0YRAAAAAA'
-                b'AAAAAAAAAAAAAAAAAAAAAA=='
-            )
+            # For this prototype, we'll simulate TTS by generating a simple audio pattern
+            # In a real implementation, you would use a proper TTS engine
+            samples, sample_rate = self._generate_mock_audio(text, voice, pitch, speed, volume)
             
-            logger.info(f"Generated mock audio for voice: {voice}")
-            return mock_wav_data.decode('utf-8')
+            logger.info(f"Generated speech for text: '{text[:30]}...' with voice: {voice}")
+            return samples, sample_rate
             
         except Exception as e:
-            logger.error(f"Error generating mock audio: {e}")
+            logger.error(f"Error generating speech: {e}")
             return None
+    
+    def generate_speech_stream(self, text, voice="default", pitch=0, speed=1.0, volume=1.0, max_chars=120):
+        """Yield (samples, sample rate) per sentence/phrase as soon as each one is synthesized"""
+        segments = split_text(text, max_chars)
+        for index, segment in enumerate(segments):
+            samples, sample_rate = self._generate_mock_audio(segment, voice, pitch, speed, volume)
+            logger.debug(f"Synthesized segment {index + 1}/{len(segments)}: '{segment[:30]}...'")
+            yield samples, sample_rate
+        logger.info(f"Streamed speech for text: '{text[:30]}...' in {len(segments)} segments")
+    
+    def _generate_mock_audio(self, text, voice, pitch, speed, volume):
+        """Generate mock audio samples for demonstration purposes"""
+        # In a real implementation, this would use an actual TTS engine
+        # For now, we'll just return silence at 8 kHz, roughly as long as the text takes to say
+        sample_rate = 8000
+        duration = max(0.25, len(text) * 0.06)
+        samples = np.zeros(int(duration * sample_rate), dtype=np.float32)
+        # Speak at the natural rate, then change the tempo without touching the pitch
+        samples = time_stretch(samples, max(speed, 0.1), sample_rate)
+        
+        logger.info(f"Generated mock audio for voice: {voice}")
+        return samples, sample_rate
 
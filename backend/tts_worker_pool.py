@@ -0,0 +1,212 @@
+import asyncio
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from tts_engine import TTSEngine, split_text
+from tts_cache import DiskStore, cache_key
+
+logger = logging.getLogger("tts_worker_pool")
+
+class TTSQueueFullError(Exception):
+    """Raised when too many TTS requests are already waiting for a worker"""
+
+
+class TTSSynthesisError(Exception):
+    """Raised when a segment of a streamed utterance could not be synthesized"""
+
+
+# One engine per worker thread/process, created on first use
+_worker_state = threading.local()
+
+def _get_engine():
+    engine = getattr(_worker_state, "engine", None)
+    if engine is None:
+        engine = _worker_state.engine = TTSEngine()
+    return engine
+
+# Disk stores are thread-safe, so worker threads share one per directory and its size count
+_disk_stores = {}
+_disk_stores_lock = threading.Lock()
+
+def _get_disk_store(directory, max_bytes):
+    with _disk_stores_lock:
+        if directory not in _disk_stores:
+            _disk_stores[directory] = DiskStore(directory, max_bytes)
+        return _disk_stores[directory]
+
+def _synthesize(key, text, voice, pitch, speed, volume, disk_dir=None, max_disk_bytes=0):
+    """Worker entry point; module level so process pools can pickle it
+
+    Returns (result, source, disk evictions) where source is "disk" when the
+    on-disk cache answered and "synth" when the engine had to run.
+    """
+    store = _get_disk_store(disk_dir, max_disk_bytes) if disk_dir else None
+    if store is not None:
+        cached = store.get(key)
+        if cached is not None:
+            return cached, "disk", 0
+
+    result = _get_engine().generate_speech_pcm(text, voice, pitch, speed, volume)
+    evicted = 0
+    if store is not None and result is not None:
+        try:
+            evicted = store.put(key, *result)
+        except OSError as e:
+            logger.warning(f"Could not write TTS cache entry: {e}")
+    return result, "synth", evicted
+
+
+class TTSWorkerPool:
+    """Runs TTS synthesis in a thread or process pool so it never blocks the event loop
+
+    At most max_pending requests may be queued or running at once; further
+    requests are rejected with TTSQueueFullError. Every request has a
+    timeout, and cancelling the awaiting coroutine (e.g. when the client
+    disconnects) drops work that has not started yet. Work that already
+    started cannot be interrupted, so a request that timed out or was
+    cancelled keeps its place in max_pending until its jobs finish.
+    """
+
+    def __init__(self, mode="thread", max_workers=2, max_pending=16, timeout=30.0, cache=None):
+        if mode == "process":
+            self.executor = ProcessPoolExecutor(max_workers=max_workers)
+        elif mode == "thread":
+            self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tts")
+        else:
+            raise ValueError(f"Unknown TTS executor mode: {mode}")
+        self.mode = mode
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.cache = cache
+        self.pending = 0
+
+        # Metrics
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.cancelled = 0
+        self.failed = 0
+
+    def _acquire(self):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise TTSQueueFullError(f"TTS queue full ({self.max_pending} pending)")
+        self.pending += 1
+
+    def _release(self, jobs):
+        """Give a request's slot back once none of its executor jobs is queued or running"""
+        running = [job for job in jobs if not job.done()]
+        if not running:
+            self.pending -= 1
+            return
+        loop = asyncio.get_running_loop()
+        remaining = [len(running)]
+
+        def job_done():
+            remaining[0] -= 1
+            if remaining[0] == 0:
+                self.pending -= 1
+
+        def on_done(job):
+            # Runs on the worker (or executor management) thread
+            try:
+                loop.call_soon_threadsafe(job_done)
+            except RuntimeError:
+                pass  # The loop is already closed
+
+        for job in running:
+            job.add_done_callback(on_done)
+
+    async def _run(self, deadline, jobs, text, voice, pitch, speed, volume):
+        key = cache_key(text, voice, pitch, speed, volume)
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        disk_dir = self.cache.disk_dir if self.cache is not None else None
+        max_disk_bytes = self.cache.max_disk_bytes if self.cache is not None else 0
+        # The executor's own future, which (unlike an asyncio wrapper) only
+        # completes when the job has actually stopped occupying a worker
+        job = self.executor.submit(_synthesize, key, text, voice, pitch, speed, volume, disk_dir, max_disk_bytes)
+        jobs.append(job)
+        try:
+            result, source, disk_evictions = await asyncio.wait_for(
+                asyncio.wrap_future(job), max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+
+        if self.cache is not None:
+            self.cache.record(source, disk_evictions)
+            if result is not None:
+                self.cache.put(key, *result)
+        return result
+
+    async def synthesize(self, text, voice="default", pitch=0, speed=1.0, volume=1.0):
+        """Synthesize a whole clip off the event loop, returning (samples, sample rate) or None"""
+        self._acquire()
+        jobs = []
+        try:
+            result = await self._run(time.monotonic() + self.timeout, jobs, text, voice, pitch, speed, volume)
+            if result is None:
+                self.failed += 1
+            else:
+                self.completed += 1
+            return result
+        finally:
+            self._release(jobs)
+
+    async def stream(self, text, voice="default", pitch=0, speed=1.0, volume=1.0, max_chars=120):
+        """Async generator yielding (samples, sample rate) per text segment
+
+        The next segment is already being synthesized while the current one
+        is handed to the caller, so workers stay busy while audio is sent.
+        Raises TTSSynthesisError if a segment fails, so a truncated utterance
+        is never mistaken for a complete one.
+        """
+        self._acquire()
+        deadline = time.monotonic() + self.timeout
+        segments = split_text(text, max_chars)
+        jobs = []
+        upcoming = None
+        try:
+            for index, segment in enumerate(segments):
+                current = upcoming or asyncio.ensure_future(
+                    self._run(deadline, jobs, segment, voice, pitch, speed, volume))
+                upcoming = None
+                if index + 1 < len(segments):
+                    upcoming = asyncio.ensure_future(
+                        self._run(deadline, jobs, segments[index + 1], voice, pitch, speed, volume))
+                result = await current
+                if result is None:
+                    self.failed += 1
+                    raise TTSSynthesisError(f"Segment {index + 1} of {len(segments)} could not be synthesized")
+                yield result
+            self.completed += 1
+        finally:
+            if upcoming is not None:
+                upcoming.cancel()
+            self._release(jobs)
+
+    def stats(self):
+        """Return pool metrics as a JSON-serializable dict"""
+        return {
+            "mode": self.mode,
+            "workers": self.max_workers,
+            "pending": self.pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "cancelled": self.cancelled,
+            "failed": self.failed
+        }
+
+    def shutdown(self):
+        """Stop the workers, dropping queued work"""
+        self.executor.shutdown(wait=False, cancel_futures=True)
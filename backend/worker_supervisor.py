@@ -0,0 +1,524 @@
+import os
+import time
+import itertools
+import threading
+import logging
+import multiprocessing
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from audio_engines import normalize_settings, check_pitch_mode
+from lifecycle import AsyncLifecycleMixin
+from log_pipeline import configure_logging
+from shm_ring import SharedRingBuffer
+
+logger = logging.getLogger("worker_supervisor")
+
+# Seconds to wait for a worker to answer a request that returns a value
+CALL_TIMEOUT = 5.0
+
+# Engine methods the front process may invoke in a worker
+REMOTE_METHODS = {
+    "apply_settings", "set_pitch_mode", "set_profile", "set_audio_input", "get_latency", "get_stage_states",
+    "start_processing", "stop_processing", "start_realtime_processing", "stop_realtime_processing"
+}
+
+# Seconds an idle stream pump sleeps before looking at its input ring again
+STREAM_POLL_INTERVAL = 0.001
+
+# Blocks each direction of an audio stream can hold
+STREAM_CAPACITY = 32
+
+# Requests that may block for a while (booting or rebooting a server); they
+# run on a helper thread so the worker keeps serving its other sessions
+SLOW_REQUESTS = {"checkout", "checkin", "set_profile", "set_audio_input"}
+
+# Helper threads per worker, i.e. sessions whose slow requests can run at once
+HELPER_THREADS = 4
+
+class WorkerError(Exception):
+    """Raised when a worker process fails a request or is no longer running"""
+
+
+class StreamPump:
+    """Worker-side thread moving audio blocks from an input ring through an engine to an output ring
+
+    Blocks are processed straight out of the input slot and the result is
+    written into the output slot, so nothing is copied besides that one
+    write. The engine needs the block API of NumpyAudioProcessor
+    (block_size and process_block).
+    """
+
+    def __init__(self, engine, input_ring, output_ring):
+        if not hasattr(engine, "process_block"):
+            raise ValueError(f"{type(engine).__name__} does not process pushed audio blocks")
+        self.engine = engine
+        self.input_ring = input_ring
+        self.output_ring = output_ring
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="stream-pump", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while self.running:
+            block = self.input_ring.read_slot(required=False)
+            if block is None:
+                time.sleep(STREAM_POLL_INTERVAL)
+                continue
+            cpu = time.thread_time_ns()
+            try:
+                result = self.engine.process_block(block)
+            except Exception as e:
+                logger.error(f"Error processing streamed block: {e}")
+                result = block
+            self.output_ring.add_busy_time(time.thread_time_ns() - cpu)
+            # A full output ring is counted as an overrun and the block is dropped
+            self.output_ring.write(result)
+            self.input_ring.release()
+
+    def close(self):
+        self.running = False
+        self.thread.join()
+        self.input_ring.close()
+        self.output_ring.close()
+
+
+def _worker_main(index, conn, pool_options, log_level):
+    """Worker process entry point; module level so spawned processes can import it
+
+    Owns an EnginePool and every engine checked out of it, and executes
+    requests of the form (call_id, command, engine_id, args) from the front
+    process. call_id None means nobody waits for the reply.
+
+    Requests for one engine run in the order they were sent. While a slow
+    request of an engine is pending, that engine's later requests queue up
+    behind it and are run by the same helper thread, so the receive loop
+    never blocks on them and keeps serving the other engines.
+    """
+    # Replaces whatever the re-imported main module configured
+    configure_logging(level=log_level, process_name=f"worker{index}")
+    from engine_pool import EnginePool
+
+    pool = EnginePool(**pool_options)
+    engines = {}
+    streams = {}
+    send_lock = threading.Lock()
+    helpers = ThreadPoolExecutor(max_workers=HELPER_THREADS, thread_name_prefix=f"worker{index}")
+    # engine_id -> requests waiting behind the one a helper thread is running
+    queues = {}
+    queue_lock = threading.Lock()
+
+    def reply(call_id, ok, result):
+        if call_id is None:
+            if not ok:
+                logger.error(f"Request failed: {result}")
+            return
+        try:
+            with send_lock:
+                conn.send((call_id, ok, result))
+        except (OSError, ValueError):
+            pass  # Front process is gone
+
+    def execute(call_id, command, engine_id, args):
+        try:
+            if command == "checkout":
+                engines[engine_id] = pool.checkout()
+                result = None
+            elif command == "open_stream":
+                pump = StreamPump(engines[engine_id], *args)
+                old = streams.pop(engine_id, None)
+                if old is not None:
+                    old.close()
+                streams[engine_id] = pump
+                result = None
+            elif command == "close_stream":
+                pump = streams.pop(engine_id, None)
+                if pump is not None:
+                    pump.close()
+                result = None
+            elif command == "checkin":
+                pump = streams.pop(engine_id, None)
+                if pump is not None:
+                    pump.close()
+                engine = engines.pop(engine_id, None)
+                if engine is not None:
+                    pool.checkin(engine)
+                result = None
+            elif command == "stats":
+                result = dict(pool.stats(), sessions=len(engines))
+            elif command in REMOTE_METHODS:
+                result = getattr(engines[engine_id], command)(*args)
+            else:
+                raise ValueError(f"Unknown worker command: {command}")
+        except Exception as e:
+            reply(call_id, False, f"{type(e).__name__}: {e}")
+        else:
+            reply(call_id, True, result)
+
+    def drain(engine_id):
+        while True:
+            with queue_lock:
+                queue = queues[engine_id]
+                if not queue:
+                    del queues[engine_id]
+                    return
+                request = queue.popleft()
+            execute(*request)
+
+    def dispatch(request):
+        engine_id = request[2]
+        with queue_lock:
+            queue = queues.get(engine_id)
+            if queue is not None:
+                queue.append(request)
+                return
+            slow = engine_id is not None and request[1] in SLOW_REQUESTS
+            if slow:
+                queues[engine_id] = deque([request])
+        if slow:
+            helpers.submit(drain, engine_id)
+        else:
+            execute(*request)
+
+    try:
+        pool.prewarm()
+        logger.info(f"Worker {index} ready (pid {os.getpid()})")
+        while True:
+            try:
+                request = conn.recv()
+            except (EOFError, OSError):
+                break
+            if request is None:
+                break
+            dispatch(request)
+    finally:
+        helpers.shutdown(wait=True)
+        for pump in streams.values():
+            pump.close()
+        for engine in engines.values():
+            pool.checkin(engine)
+        pool.shutdown()
+        logger.info(f"Worker {index} stopped")
+
+
+class WorkerHandle:
+    """Front-process end of one worker process: request sending and reply routing
+
+    A reader thread resolves the Future of every request as its reply
+    arrives. If the process dies, every outstanding request fails with
+    WorkerError and the supervisor is told so it can start a replacement.
+    """
+
+    def __init__(self, index, process, conn, on_exit):
+        self.index = index
+        self.process = process
+        self.conn = conn
+        self.on_exit = on_exit
+        self.alive = True
+        self.sessions = 0
+        self._calls = {}
+        self._call_ids = itertools.count(1)
+        # Separate locks, so a send blocked on a full pipe never stops replies being read
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._reader = threading.Thread(target=self._read_replies, name=f"worker{index}-replies", daemon=True)
+        self._reader.start()
+
+    def _read_replies(self):
+        while True:
+            try:
+                call_id, ok, result = self.conn.recv()
+            except (EOFError, OSError):
+                break
+            with self._lock:
+                future = self._calls.pop(call_id, None)
+            if future is None:
+                continue
+            if ok:
+                future.set_result(result)
+            else:
+                future.set_exception(WorkerError(result))
+
+        with self._lock:
+            self.alive = False
+            calls, self._calls = self._calls, {}
+        for future in calls.values():
+            future.set_exception(WorkerError(f"Worker {self.index} exited"))
+        self.on_exit(self)
+
+    def request(self, command, engine_id=None, args=()):
+        """Send a request and return a Future for its reply"""
+        future = Future()
+        with self._lock:
+            if not self.alive:
+                raise WorkerError(f"Worker {self.index} is not running")
+            call_id = next(self._call_ids)
+            self._calls[call_id] = future
+        try:
+            self._send((call_id, command, engine_id, args))
+        except WorkerError:
+            with self._lock:
+                self._calls.pop(call_id, None)
+            raise
+        return future
+
+    def call(self, command, engine_id=None, args=(), timeout=CALL_TIMEOUT):
+        """Send a request and block until the worker answers"""
+        try:
+            return self.request(command, engine_id, args).result(timeout)
+        except FutureTimeoutError:
+            raise WorkerError(f"Worker {self.index} did not answer {command} within {timeout:.1f}s")
+
+    def send(self, command, engine_id=None, args=()):
+        """Send a request without waiting for (or receiving) a reply"""
+        if not self.alive:
+            raise WorkerError(f"Worker {self.index} is not running")
+        self._send((None, command, engine_id, args))
+
+    def _send(self, message):
+        try:
+            with self._send_lock:
+                self.conn.send(message)
+        except (OSError, ValueError) as e:
+            raise WorkerError(f"Worker {self.index} is not reachable: {e}")
+
+    def close(self, timeout=5.0):
+        """Ask the worker to release its engines and exit, killing it if it hangs"""
+        try:
+            self._send(None)
+        except WorkerError:
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            logger.warning(f"Worker {self.index} did not exit, terminating it")
+            self.process.terminate()
+            self.process.join(timeout)
+        self.conn.close()
+
+
+class RemoteAudioProcessor(AsyncLifecycleMixin):
+    """Stands in for an audio processor that lives in a worker process
+
+    Parameter changes are fire-and-forget messages, so the event loop never
+    waits on the worker for a slider update; calls that return something or
+    start/stop audio wait for the worker's answer. The *_async lifecycle
+    methods come from AsyncLifecycleMixin and run those calls on an
+    executor thread.
+    """
+
+    def __init__(self, worker, engine_id):
+        self.worker = worker
+        self.engine_id = engine_id
+        self.is_initialized = True
+        # (input ring, output ring) while audio is streamed through the engine
+        self.stream = None
+        self._init_lifecycle()
+
+    def _call(self, method, *args):
+        return self.worker.call(method, self.engine_id, args)
+
+    def _send(self, method, *args):
+        self.worker.send(method, self.engine_id, args)
+
+    def apply_settings(self, settings):
+        """Queue a batch of settings in the worker; returns the normalized batch"""
+        batch = normalize_settings(settings)
+        if batch:
+            self._send("apply_settings", batch)
+        return batch
+
+    def set_pitch_mode(self, mode):
+        self._send("set_pitch_mode", check_pitch_mode(mode))
+
+    def set_profile(self, profile):
+        self._call("set_profile", profile)
+
+    def set_audio_input(self, audio_input):
+        self._call("set_audio_input", audio_input)
+
+    def get_latency(self):
+        return self._call("get_latency")
+
+    def get_stage_states(self):
+        return self._call("get_stage_states")
+
+    def start_processing(self):
+        self._call("start_processing")
+
+    def stop_processing(self):
+        self._call("stop_processing")
+
+    def start_realtime_processing(self):
+        self._call("start_realtime_processing")
+
+    def stop_realtime_processing(self):
+        self._call("stop_realtime_processing")
+
+    def open_audio_stream(self, block_size=None, capacity=STREAM_CAPACITY):
+        """Start pushing audio blocks through the worker's engine via shared memory
+
+        Returns (input ring, output ring): write blocks into the first and
+        read processed blocks from the second. block_size defaults to the
+        engine's current buffer size; reopen the stream after a profile
+        switch changes it.
+        """
+        self.close_audio_stream()
+        if block_size is None:
+            block_size = self.get_latency()["buffer_size"]
+        rings = (SharedRingBuffer(block_size, capacity), SharedRingBuffer(block_size, capacity))
+        try:
+            self._call("open_stream", *rings)
+        except Exception:
+            for ring in rings:
+                ring.close()
+                ring.unlink()
+            raise
+        self.stream = rings
+        return rings
+
+    def close_audio_stream(self):
+        """Stop the worker's pump and free the rings"""
+        if self.stream is None:
+            return
+        rings, self.stream = self.stream, None
+        try:
+            if self.worker.alive:
+                self._call("close_stream")
+        except WorkerError as e:
+            logger.error(f"Error closing audio stream: {e}")
+        finally:
+            for ring in rings:
+                ring.close()
+                ring.unlink()
+
+    def stream_stats(self):
+        """Ring counters of the open stream, read straight from shared memory"""
+        if self.stream is None:
+            return None
+        return {"input": self.stream[0].stats(), "output": self.stream[1].stats()}
+
+
+class WorkerSupervisor:
+    """Shards audio engines across worker processes, one per core by default
+
+    Drop-in replacement for EnginePool in SessionManager: checkout() places
+    the new session's engine on the worker with the fewest sessions and
+    returns a RemoteAudioProcessor routed to it over a pipe. Every worker
+    runs its own EnginePool, so DSP for different sessions runs on
+    different cores. A worker that dies is replaced; the sessions it was
+    hosting get WorkerError on their next request.
+    """
+
+    def __init__(self, workers=None, pool_size=2, min_idle=1, max_idle=4):
+        self.num_workers = workers or os.cpu_count() or 1
+        # The configured pool sizes are shared out between the workers
+        share = lambda total: -(-total // self.num_workers)
+        self.pool_options = {"pool_size": share(pool_size), "min_idle": share(min_idle),
+                             "max_idle": share(max_idle)}
+        self.context = multiprocessing.get_context("spawn")
+        self.workers = []
+        self._engine_ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._closing = False
+
+        # Metrics
+        self.restarts = 0
+        self.checkouts = 0
+        self.failed_checkouts = 0
+
+    def _start_worker(self, index):
+        front, back = self.context.Pipe()
+        process = self.context.Process(target=_worker_main, name=f"audio-worker-{index}",
+                                       args=(index, back, self.pool_options, logging.getLogger().level),
+                                       daemon=True)
+        process.start()
+        back.close()
+        logger.info(f"Started audio worker {index} (pid {process.pid})")
+        return WorkerHandle(index, process, front, self._on_worker_exit)
+
+    def _on_worker_exit(self, worker):
+        """Reader thread callback: replace a worker that died unexpectedly"""
+        if self._closing:
+            return
+        logger.error(f"Audio worker {worker.index} (pid {worker.process.pid}) exited "
+                     f"with {worker.sessions} sessions, restarting it")
+        worker.process.join(1.0)
+        with self._lock:
+            if self._closing or self.workers[worker.index] is not worker:
+                return
+            self.workers[worker.index] = self._start_worker(worker.index)
+            self.restarts += 1
+
+    def prewarm(self):
+        """Start every worker process; each boots its share of the engine pool"""
+        with self._lock:
+            while len(self.workers) < self.num_workers:
+                self.workers.append(self._start_worker(len(self.workers)))
+        # Wait until every worker has booted its engines and answers
+        for worker in list(self.workers):
+            worker.call("stats", timeout=60.0)
+        logger.info(f"Worker supervisor ready with {self.num_workers} workers")
+
+    def checkout(self):
+        """Create a session engine on the least loaded worker"""
+        if not self.workers:
+            self.prewarm()
+        with self._lock:
+            worker = min((w for w in self.workers if w.alive), key=lambda w: w.sessions, default=None)
+            if worker is None:
+                self.failed_checkouts += 1
+                raise WorkerError("No audio worker is running")
+            worker.sessions += 1
+            engine_id = next(self._engine_ids)
+
+        try:
+            # Booting an engine on a pool miss can take a while
+            worker.call("checkout", engine_id, timeout=60.0)
+        except Exception:
+            with self._lock:
+                worker.sessions -= 1
+                self.failed_checkouts += 1
+            raise
+        with self._lock:
+            self.checkouts += 1
+        return RemoteAudioProcessor(worker, engine_id)
+
+    def checkin(self, engine):
+        """Return a session engine to its worker's pool"""
+        worker = engine.worker
+        engine.close_audio_stream()
+        with self._lock:
+            worker.sessions -= 1
+        if not worker.alive:
+            return
+        try:
+            worker.call("checkin", engine.engine_id)
+        except WorkerError as e:
+            logger.error(f"Error returning engine to worker {worker.index}: {e}")
+
+    def shutdown(self):
+        """Stop every worker process"""
+        with self._lock:
+            self._closing = True
+            workers, self.workers = self.workers, []
+        for worker in workers:
+            worker.close()
+
+    def stats(self):
+        """Return per-worker and total metrics as a JSON-serializable dict"""
+        workers = []
+        for worker in list(self.workers):
+            entry = {"index": worker.index, "pid": worker.process.pid, "alive": worker.alive,
+                     "sessions": worker.sessions}
+            try:
+                entry["engine_pool"] = worker.call("stats", timeout=1.0)
+            except WorkerError as e:
+                entry["error"] = str(e)
+            workers.append(entry)
+        return {
+            "workers": workers,
+            "alive": sum(1 for worker in workers if worker["alive"]),
+            "sessions": sum(worker["sessions"] for worker in workers),
+            "checkouts": self.checkouts,
+            "failed_checkouts": self.failed_checkouts,
+            "restarts": self.restarts
+        }